@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+价格提醒规则引擎
+规则按SKU建立索引，每个周期只评估价格发生变化的SKU，评估耗时与变化数量成正比，
+与规则总数和商品总数无关。
+
+规则类型（config.json 的 alerts 列表）:
+  below          价格从上方跌破 price
+  above          价格从下方涨破 price
+  drop_from_max  比 window 秒内最高价下跌 percent%
+  rise_from_min  比 window 秒内最低价上涨 percent%
+  all_time_low   创历史新低
+  sustained      相对变化前的价格变化 percent%（负数为下跌）并持续 window 秒
+"""
+
+import heapq, itertools
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+RULE_TYPES = ('below', 'above', 'drop_from_max', 'rise_from_min', 'all_time_low', 'sustained')
+
+def format_duration(seconds):
+    """把秒数格式化为 天/小时/分钟"""
+    for unit, width in (('天', 86400), ('小时', 3600), ('分钟', 60)):
+        if seconds >= width and seconds % width == 0:
+            return f"{seconds // width}{unit}"
+    return f"{seconds}秒"
+
+class Rule:
+    """一条提醒规则"""
+    __slots__ = ('id', 'sku', 'type', 'price', 'percent', 'window', 'subscriber',
+                 'active', 'baseline', 'since')
+
+    def __init__(self, id, sku, type, price=None, percent=None, window=None, subscriber=None):
+        self.id = id
+        self.sku = sku
+        self.type = type
+        self.price = price
+        self.percent = percent
+        self.window = window
+        self.subscriber = subscriber
+        self.active = False    # 条件是否已满足（只在进入满足状态时提醒一次）
+        self.baseline = None   # sustained: 变化前的价格
+        self.since = None      # sustained: 条件开始满足的时间戳
+
+    def describe(self):
+        if self.type == 'below':
+            text = f"低于 ¥{self.price:.2f}"
+        elif self.type == 'above':
+            text = f"高于 ¥{self.price:.2f}"
+        elif self.type == 'drop_from_max':
+            text = f"比 {format_duration(self.window)} 内最高价下跌 {self.percent:g}%"
+        elif self.type == 'rise_from_min':
+            text = f"比 {format_duration(self.window)} 内最低价上涨 {self.percent:g}%"
+        elif self.type == 'all_time_low':
+            text = "创历史新低"
+        else:
+            direction = "下跌" if self.percent < 0 else "上涨"
+            text = f"{direction} {abs(self.percent):g}% 并持续 {format_duration(self.window)}"
+        return f"SKU {self.sku} {text}" + (f"（{self.subscriber}）" if self.subscriber else "")
+
+def parse_rule(data, id):
+    """
+    解析一条规则配置
+
+    Raises:
+        ValueError: 类型未知或缺少参数
+    """
+    kind = data.get('type')
+    if kind not in RULE_TYPES:
+        raise ValueError(f"未知的规则类型: {kind}（可选: {', '.join(RULE_TYPES)}）")
+    if 'sku' not in data:
+        raise ValueError("缺少 sku")
+    rule = Rule(id, str(data['sku']), kind, subscriber=data.get('subscriber'))
+    if kind in ('below', 'above'):
+        if 'price' not in data:
+            raise ValueError(f"{kind} 规则缺少 price")
+        rule.price = float(data['price'])
+    elif kind != 'all_time_low':
+        if 'percent' not in data or 'window' not in data:
+            raise ValueError(f"{kind} 规则缺少 percent 或 window")
+        rule.percent = float(data['percent'])
+        rule.window = int(data['window'])
+        if rule.window <= 0 or not rule.percent:
+            raise ValueError(f"{kind} 规则的 percent 不能为0，window 必须大于0")
+        if kind != 'sustained':
+            rule.percent = abs(rule.percent)
+    return rule
+
+class RollingWindow:
+    """
+    单个商品在最近 width 秒内的滚动最高/最低价
+    价格是阶梯函数，只在变化时记录；用单调队列维护窗口内的最大/最小值，
+    before 是窗口起点时仍然有效的价格（最后一个被移出窗口的变化），也计入最大/最小值。
+    每次变化摊销 O(1)。
+    """
+    __slots__ = ('width', 'samples', 'maxq', 'minq', 'before')
+
+    def __init__(self, width):
+        self.width = width
+        self.samples = deque()
+        self.maxq = deque()
+        self.minq = deque()
+        self.before = None
+
+    def add(self, ts, price):
+        self.samples.append((ts, price))
+        while self.maxq and self.maxq[-1][1] <= price:
+            self.maxq.pop()
+        self.maxq.append((ts, price))
+        while self.minq and self.minq[-1][1] >= price:
+            self.minq.pop()
+        self.minq.append((ts, price))
+        self.evict(ts)
+
+    def evict(self, now):
+        start = now - self.width
+        while self.samples and self.samples[0][0] < start:
+            self.before = self.samples.popleft()[1]
+        while self.maxq and self.maxq[0][0] < start:
+            self.maxq.popleft()
+        while self.minq and self.minq[0][0] < start:
+            self.minq.popleft()
+
+    def max(self):
+        values = [v for v in (self.maxq[0][1] if self.maxq else None, self.before) if v is not None]
+        return max(values) if values else None
+
+    def min(self):
+        values = [v for v in (self.minq[0][1] if self.minq else None, self.before) if v is not None]
+        return min(values) if values else None
+
+class SkuRules:
+    """单个商品的规则索引和增量状态"""
+    __slots__ = ('below', 'below_prices', 'above', 'above_prices', 'windowed', 'windows',
+                 'all_time_low', 'sustained', 'last', 'low')
+
+    def __init__(self):
+        self.below = []          # 按阈值排序的 below 规则
+        self.below_prices = []
+        self.above = []          # 按阈值排序的 above 规则
+        self.above_prices = []
+        self.windowed = []       # drop_from_max / rise_from_min
+        self.windows = {}        # 窗口宽度 -> RollingWindow（同宽度的规则共用）
+        self.all_time_low = []
+        self.sustained = []
+        self.last = None         # 最近一次价格
+        self.low = None          # 历史最低价
+
+    def add(self, rule):
+        if rule.type in ('below', 'above'):
+            rules, prices = ((self.below, self.below_prices) if rule.type == 'below'
+                             else (self.above, self.above_prices))
+            i = bisect_right(prices, rule.price)
+            prices.insert(i, rule.price)
+            rules.insert(i, rule)
+        elif rule.type in ('drop_from_max', 'rise_from_min'):
+            self.windowed.append(rule)
+            if rule.window not in self.windows:
+                self.windows[rule.window] = RollingWindow(rule.window)
+        elif rule.type == 'all_time_low':
+            self.all_time_low.append(rule)
+        else:
+            self.sustained.append(rule)
+
+class AlertEngine:
+    """
+    提醒规则引擎
+
+    用法:
+        engine = AlertEngine.from_config(config.get('alerts', []))
+        engine.seed(price_history)              # 用已有历史初始化窗口和历史最低价
+        alerts = engine.evaluate(changes, now)  # 每个周期传入价格变化
+    """
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self.by_sku = {}
+        self.timers = []          # sustained 规则的到期检查 (时间戳, 序号, 规则)
+        self.seq = itertools.count()
+        for rule in self.rules:
+            self.by_sku.setdefault(rule.sku, SkuRules()).add(rule)
+
+    @classmethod
+    def from_config(cls, items):
+        """
+        从配置列表创建，跳过无效规则
+
+        Returns:
+            (engine, errors)，errors 为 [(序号, 错误信息)]
+        """
+        rules, errors = [], []
+        for i, data in enumerate(items or [], 1):
+            try:
+                rules.append(parse_rule(data, i))
+            except (ValueError, TypeError) as e:
+                errors.append((i, str(e)))
+        return cls(rules), errors
+
+    def seed(self, price_history):
+        """用内存历史初始化有规则的商品（不产生提醒）"""
+        for sku, state in self.by_sku.items():
+            entry = price_history.get(sku)
+            if not entry:
+                continue
+            for ts, price in entry['history']:
+                self._update(state, ts, price)
+            for rollup in (entry['rollups'] or {}).values():
+                for row in rollup:
+                    if state.low is None or row[1] < state.low:
+                        state.low = row[1]
+
+    def _update(self, state, ts, price):
+        """更新窗口和历史最低价，返回此前的历史最低价"""
+        if price == state.last:
+            return state.low
+        for window in state.windows.values():
+            window.add(ts, price)
+        low = state.low
+        if state.low is None or price < state.low:
+            state.low = price
+        for rule in state.sustained:
+            self._step_sustained(rule, ts, price)
+        state.last = price
+        return low
+
+    def _step_sustained(self, rule, ts, price):
+        if rule.baseline is None:
+            rule.baseline = price
+            return
+        change = (price - rule.baseline) / rule.baseline * 100
+        if change <= rule.percent if rule.percent < 0 else change >= rule.percent:
+            if rule.since is None:
+                rule.since = ts
+                heapq.heappush(self.timers, (ts + rule.window, next(self.seq), rule))
+        else:
+            rule.baseline = price
+            rule.since = None
+            rule.active = False
+
+    def evaluate(self, changes, now):
+        """
+        评估本周期的价格变化
+
+        Args:
+            changes: [(SKU_ID, 商品名, 原价, 现价, 变化百分比)]
+            now: 本周期的时间戳（秒）
+
+        Returns:
+            [{'sku', 'name', 'rule', 'price', 'message', 'subscriber'}]
+        """
+        alerts = []
+        names = {}
+        for sku, name, old, new, _ in changes:
+            sku = str(sku)
+            names[sku] = name
+            state = self.by_sku.get(sku)
+            if state is None:
+                continue
+            if state.last is None:
+                self._update(state, now - 1, old)
+            old = state.last
+            low = self._update(state, now, new)
+            self._check_thresholds(state, old, new, name, alerts)
+            self._check_windows(state, new, name, alerts)
+            if low is not None and new < low:
+                for rule in state.all_time_low:
+                    alerts.append(self._alert(rule, name, new, f"{name} 创历史新低 ¥{new:.2f}"
+                                                              f"（此前最低 ¥{low:.2f}）"))
+
+        while self.timers and self.timers[0][0] <= now:
+            _, _, rule = heapq.heappop(self.timers)
+            if rule.since is None or rule.active or now - rule.since < rule.window:
+                continue  # 条件已被打断或已提醒过
+            rule.active = True
+            state = self.by_sku[rule.sku]
+            name = names.get(rule.sku, f"SKU {rule.sku}")
+            change = (state.last - rule.baseline) / rule.baseline * 100
+            direction = "下跌" if change < 0 else "上涨"
+            alerts.append(self._alert(
+                rule, name, state.last,
+                f"{name} 较 ¥{rule.baseline:.2f} {direction} {abs(change):.1f}% "
+                f"并已持续 {format_duration(rule.window)}（现价 ¥{state.last:.2f}）"))
+        return alerts
+
+    def _check_thresholds(self, state, old, new, name, alerts):
+        """阈值规则已排序，用二分查找取出被穿越的区间 O(log n + k)"""
+        if old is None:
+            return
+        if new < old:
+            # 跌破: new <= 阈值 < old
+            lo = bisect_left(state.below_prices, new)
+            hi = bisect_left(state.below_prices, old)
+            for rule in state.below[lo:hi]:
+                alerts.append(self._alert(rule, name, new, f"{name} 降到 ¥{new:.2f}，"
+                                                           f"低于 ¥{rule.price:.2f}"))
+        elif new > old:
+            # 涨破: old < 阈值 <= new
+            lo = bisect_right(state.above_prices, old)
+            hi = bisect_right(state.above_prices, new)
+            for rule in state.above[lo:hi]:
+                alerts.append(self._alert(rule, name, new, f"{name} 涨到 ¥{new:.2f}，"
+                                                           f"高于 ¥{rule.price:.2f}"))
+
+    def _check_windows(self, state, new, name, alerts):
+        for rule in state.windowed:
+            window = state.windows[rule.window]
+            if rule.type == 'drop_from_max':
+                ref = window.max()
+                change = (ref - new) / ref * 100 if ref else 0
+            else:
+                ref = window.min()
+                change = (new - ref) / ref * 100 if ref else 0
+            hit = change >= rule.percent
+            if hit and not rule.active:
+                label = "最高价" if rule.type == 'drop_from_max' else "最低价"
+                direction = "下跌" if rule.type == 'drop_from_max' else "上涨"
+                alerts.append(self._alert(
+                    rule, name, new,
+                    f"{name} 比 {format_duration(rule.window)} 内{label} ¥{ref:.2f} "
+                    f"{direction} {change:.1f}%（现价 ¥{new:.2f}）"))
+            rule.active = hit
+
+    @staticmethod
+    def _alert(rule, name, price, message):
+        return {'sku': rule.sku, 'name': name, 'rule': rule, 'price': price, 'message': message,
+                'subscriber': rule.subscriber}
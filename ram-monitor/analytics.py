@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+价格历史分析
+把历史导出为列式二进制文件，再通过内存映射（mmap）零拷贝读取并计算统计量：
+
+  price_history.columns/
+  ├── times.i64     所有样本的秒级时间戳（int64），同一商品的样本连续存放且按时间排序
+  ├── prices.f64    与 times.i64 一一对应的价格（float64）
+  └── index.json    每个商品的 SKU、名称、起始偏移和样本数
+
+安装了 numpy 时用 numpy.memmap 按商品分块做向量化计算，
+否则用标准库 mmap + memoryview 逐个商品计算（结果相同，速度较慢）。
+"""
+
+import itertools, json, math, mmap, os, sys, time
+from array import array
+
+from history_store import BACKEND_PATHS, SQLiteHistoryStore, open_history_store
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 列式导出目录
+COLUMNS_DIR = "price_history.columns"
+# 向量化计算时每块最多处理的样本数（控制临时数组占用的内存）
+CHUNK_SAMPLES = 1 << 19
+
+# ============ 导出 ============
+
+def source_mtime(backend, root=None):
+    """历史存储最近的修改时间，用于判断导出是否过期"""
+    path = BACKEND_PATHS[backend]
+    if root:
+        path = os.path.join(root, path)
+    latest = 0
+    paths = [path, path + "-wal"]
+    if os.path.isdir(path):
+        paths = [os.path.join(path, fn) for fn in os.listdir(path)]
+    for p in paths:
+        try:
+            latest = max(latest, os.path.getmtime(p))
+        except OSError:
+            pass
+    return latest
+
+def iter_series(store):
+    """按商品逐个返回 (SKU, 名称, 时间戳 array('q'), 价格 array('d'))"""
+    if isinstance(store, SQLiteHistoryStore):
+        # 主键 (sku, ts) 聚簇存放，按主键顺序流式读取，不必整体加载到内存
+        names = dict(store.db.execute("SELECT sku, name FROM products"))
+        rows = store.db.execute("SELECT sku, ts, price FROM prices ORDER BY sku, ts")
+        for sku, group in itertools.groupby(rows, key=lambda r: r[0]):
+            times, prices = array('q'), array('d')
+            for _, ts, price in group:
+                times.append(ts)
+                prices.append(price)
+            yield sku, names.get(sku, ''), times, prices
+        return
+    for sku, entry in store.load().items():
+        samples = sorted(entry['history'])
+        yield (sku, entry['name'], array('q', (ts for ts, _ in samples)),
+               array('d', (price for _, price in samples)))
+
+def export_columns(backend='jsonl', path=COLUMNS_DIR):
+    """
+    把全部原始样本导出为列式文件（先写临时目录再替换）
+
+    Returns:
+        导出的样本数
+    """
+    store = open_history_store(backend, max_history=None)
+    tmp = f"{path}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    index = []
+    offset = 0
+    with open(os.path.join(tmp, 'times.i64'), 'wb') as tf, open(os.path.join(tmp, 'prices.f64'), 'wb') as pf:
+        for sku, name, times, prices in iter_series(store):
+            if not times:
+                continue
+            times.tofile(tf)
+            prices.tofile(pf)
+            index.append({'sku': sku, 'name': name, 'offset': offset, 'count': len(times)})
+            offset += len(times)
+    store.close()
+    with open(os.path.join(tmp, 'index.json'), 'w') as f:
+        json.dump({'backend': backend, 'exported': time.time(), 'byteorder': sys.byteorder,
+                   'samples': offset, 'skus': index}, f, ensure_ascii=False)
+    if os.path.isdir(path):
+        for fn in os.listdir(path):
+            os.remove(os.path.join(path, fn))
+        os.rmdir(path)
+    os.replace(tmp, path)
+    return offset
+
+def ensure_columns(backend='jsonl', path=COLUMNS_DIR, rebuild=False):
+    """导出不存在、已过期或来自其他后端时重新导出，返回是否重新导出"""
+    index_file = os.path.join(path, 'index.json')
+    if not rebuild and os.path.exists(index_file):
+        with open(index_file) as f:
+            exported = json.load(f)
+        if exported.get('backend') == backend and exported['exported'] >= source_mtime(backend):
+            return False
+    export_columns(backend, path)
+    return True
+
+# ============ 读取 ============
+
+class ColumnStore:
+    """
+    列式历史的只读视图
+    times / prices 是整个文件的零拷贝映射（numpy.memmap 或 memoryview）
+    """
+    def __init__(self, path=COLUMNS_DIR):
+        with open(os.path.join(path, 'index.json')) as f:
+            meta = json.load(f)
+        if meta['byteorder'] != sys.byteorder:
+            raise ValueError(f"导出文件的字节序 ({meta['byteorder']}) 与本机不同，请使用 --rebuild 重新导出")
+        self.path = path
+        self.index = meta['skus']
+        self.samples = meta['samples']
+        self.by_sku = {item['sku']: item for item in self.index}
+        self._maps = []
+        if not self.samples:
+            self.times = self.prices = []
+        elif np is not None:
+            self.times = np.memmap(os.path.join(path, 'times.i64'), dtype=np.int64, mode='r')
+            self.prices = np.memmap(os.path.join(path, 'prices.f64'), dtype=np.float64, mode='r')
+        else:
+            self.times = self._map(os.path.join(path, 'times.i64')).cast('q')
+            self.prices = self._map(os.path.join(path, 'prices.f64')).cast('d')
+
+    def _map(self, path):
+        with open(path, 'rb') as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(m)
+        return memoryview(m)
+
+    def series(self, sku):
+        """单个商品的 (时间戳, 价格) 切片（不复制）"""
+        item = self.by_sku[sku]
+        start, end = item['offset'], item['offset'] + item['count']
+        return self.times[start:end], self.prices[start:end]
+
+    def window(self, start, end):
+        """
+        样本区间 [start, end) 的 (时间戳, 价格)
+        numpy 下为该区间单独建立映射，用完释放后其页面不再计入进程内存
+        """
+        if np is None:
+            return self.times[start:end], self.prices[start:end]
+        return (np.memmap(os.path.join(self.path, 'times.i64'), dtype=np.int64, mode='r',
+                          offset=start * 8, shape=(end - start,)),
+                np.memmap(os.path.join(self.path, 'prices.f64'), dtype=np.float64, mode='r',
+                          offset=start * 8, shape=(end - start,)))
+
+    def close(self):
+        self.times = self.prices = None
+        for m in self._maps:
+            try:
+                m.close()
+            except BufferError:
+                pass  # 仍有切片引用，由垃圾回收释放
+
+# ============ 统计 ============
+
+def _chunks(index, limit=None):
+    """把连续的商品分组，每组样本总数不超过 limit（单个商品超过时单独成组）"""
+    limit = limit or CHUNK_SAMPLES
+    group, total = [], 0
+    for item in index:
+        if group and total + item['count'] > limit:
+            yield group
+            group, total = [], 0
+        group.append(item)
+        total += item['count']
+    if group:
+        yield group
+
+def _stats_numpy(columns, since, ma):
+    """按商品分块向量化计算，每块内用 reduceat 做分段归约"""
+    results = []
+    for group in _chunks(columns.index):
+        start = group[0]['offset']
+        end = group[-1]['offset'] + group[-1]['count']
+        times, prices = columns.window(start, end)
+        bounds = np.array([item['offset'] - start for item in group] + [end - start])
+
+        # 每个商品只保留 since 之后的样本（各商品内部按时间排序，保留的是每段的后缀）
+        if since:
+            keep = times >= since
+            counts = np.add.reduceat(keep.astype(np.int64), bounds[:-1])
+            prices = prices[keep]
+        else:
+            counts = np.diff(bounds)
+        seg = np.repeat(np.arange(len(group)), counts)
+
+        present = counts > 0
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        idx = offsets[present]
+        if not len(idx):
+            continue
+        first = prices[idx]
+        last = prices[offsets[present] + counts[present] - 1]
+        mins = np.minimum.reduceat(prices, idx)
+        maxs = np.maximum.reduceat(prices, idx)
+        means = np.add.reduceat(prices, idx) / counts[present]
+
+        # 对数收益率的标准差；每个商品第一个样本与上一个商品之间的差值置零
+        returns = np.zeros(len(prices))
+        returns[1:] = np.diff(np.log(prices))
+        returns[idx] = 0
+        n_returns = np.maximum(counts[present] - 1, 1)
+        r_sum = np.add.reduceat(returns, idx)
+        r_sq = np.add.reduceat(returns * returns, idx)
+        volatility = np.sqrt(np.maximum(r_sq / n_returns - (r_sum / n_returns) ** 2, 0))
+
+        # 最大回撤：分段累计最大值（给每段加上递增的偏移量，使累计最大值在段边界处重置）
+        shift = seg * (float(prices.max()) * 2 + 1)
+        running_max = np.maximum.accumulate(prices + shift) - shift
+        drawdown = np.maximum.reduceat(1 - prices / running_max, idx)
+
+        # 最近 ma 个样本的移动平均
+        csum = np.cumsum(prices)
+        end_pos = offsets[present] + counts[present] - 1
+        window = np.minimum(counts[present], ma)
+        head = end_pos - window
+        moving = (csum[end_pos] - np.where(head >= 0, csum[np.maximum(head, 0)], 0)) / window
+
+        items = [item for item, p in zip(group, present) if p]
+        for i, item in enumerate(items):
+            results.append(_result(item, int(counts[present][i]), first[i], last[i], mins[i], maxs[i],
+                                   means[i], volatility[i], drawdown[i], moving[i]))
+    return results
+
+def _stats_python(columns, since, ma):
+    """无 numpy 时逐个商品计算"""
+    from bisect import bisect_left
+    results = []
+    for item in columns.index:
+        times, prices = columns.series(item['sku'])
+        if since:
+            prices = prices[bisect_left(times, since):]
+        n = len(prices)
+        if not n:
+            continue
+        total = peak = 0.0
+        worst = r_sum = r_sq = 0.0
+        prev = None
+        for p in prices:
+            total += p
+            peak = max(peak, p)
+            worst = max(worst, 1 - p / peak)
+            if prev is not None:
+                r = math.log(p / prev)
+                r_sum += r
+                r_sq += r * r
+            prev = p
+        k = max(n - 1, 1)
+        volatility = math.sqrt(max(r_sq / k - (r_sum / k) ** 2, 0))
+        tail = prices[-min(n, ma):]
+        results.append(_result(item, n, prices[0], prices[-1], min(prices), max(prices), total / n,
+                               volatility, worst, sum(tail) / len(tail)))
+    return results
+
+def _result(item, count, first, last, mn, mx, mean, volatility, drawdown, moving):
+    return {'sku': item['sku'], 'name': item['name'], 'count': count,
+            'first': float(first), 'last': float(last), 'min': float(mn), 'max': float(mx),
+            'mean': float(mean), 'change_pct': (float(last) / float(first) - 1) * 100,
+            'volatility': float(volatility), 'max_drop_pct': float(drawdown) * 100,
+            'moving_avg': float(moving), 'ma_gap_pct': (float(last) / float(moving) - 1) * 100}
+
+def price_stats(columns, since=None, ma=20):
+    """
+    计算每个商品的统计量
+
+    Args:
+        since: 只统计该时间戳之后的样本
+        ma: 移动平均的样本数
+
+    Returns:
+        [{'sku', 'name', 'count', 'first', 'last', 'min', 'max', 'mean', 'change_pct',
+          'volatility'（对数收益率标准差）, 'max_drop_pct'（最大回撤%）, 'moving_avg',
+          'ma_gap_pct'（现价相对移动平均%）}]
+    """
+    if not columns.samples:
+        return []
+    return (_stats_numpy if np is not None else _stats_python)(columns, since, ma)
+
+def _bucket_last(times, prices, width):
+    """按 width 秒分桶，取每个桶最后一个价格，返回 {桶: 价格}"""
+    if np is not None:
+        buckets = np.asarray(times) // width
+        # 桶号非递减，每个桶的最后一个样本位于下一个桶开始之前
+        last = np.flatnonzero(np.diff(buckets, append=buckets[-1] + 1))
+        return dict(zip(buckets[last].tolist(), np.asarray(prices)[last].tolist()))
+    return {ts // width: p for ts, p in zip(times, prices)}
+
+def correlation(columns, skus, since=None, bucket=3600):
+    """
+    商品之间价格收益率的相关系数
+    各商品按 bucket 秒对齐（取桶内最后一个价格），在共同的桶上计算相邻桶收益率的 Pearson 相关系数
+
+    Returns:
+        {(SKU_A, SKU_B): 相关系数或 None（共同样本不足或价格无变化）}
+    """
+    from bisect import bisect_left
+    series = {}
+    for sku in skus:
+        times, prices = columns.series(sku)
+        start = bisect_left(times, since) if since else 0
+        series[sku] = _bucket_last(times[start:], prices[start:], bucket) if len(times) > start else {}
+
+    result = {}
+    for a, b in itertools.combinations(skus, 2):
+        common = sorted(set(series[a]) & set(series[b]))
+        xa = [series[a][k] for k in common]
+        xb = [series[b][k] for k in common]
+        result[(a, b)] = _pearson_returns(xa, xb)
+    return result
+
+def _pearson_returns(xa, xb):
+    if len(xa) < 3:
+        return None
+    if np is not None:
+        ra = np.diff(np.log(xa))
+        rb = np.diff(np.log(xb))
+        if not ra.std() or not rb.std():
+            return None
+        return float(np.corrcoef(ra, rb)[0, 1])
+    ra = [math.log(y / x) for x, y in zip(xa, xa[1:])]
+    rb = [math.log(y / x) for x, y in zip(xb, xb[1:])]
+    ma, mb = sum(ra) / len(ra), sum(rb) / len(rb)
+    cov = sum((x - ma) * (y - mb) for x, y in zip(ra, rb))
+    va = sum((x - ma) ** 2 for x in ra)
+    vb = sum((y - mb) ** 2 for y in rb)
+    if not va or not vb:
+        return None
+    return cov / math.sqrt(va * vb)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+analyze 命令的性能测试
+直接生成列式历史（随机游走价格），测试统计计算的耗时和峰值内存
+
+用法:
+  python3 benchmarks/bench_analyze.py [--skus 10000] [--samples 100000] [--days 0] [--dir <目录>]
+
+10k 商品 × 100k 样本的导出文件约 16GB，默认在临时目录中生成 1000 × 10000；
+--keep 保留生成的文件，下次用同一 --dir 时跳过生成。结果以 JSON 输出。
+"""
+
+import json, os, resource, shutil, sys, tempfile, time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import analytics
+from ram_monitor import pop_option
+
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def generate(path, skus, samples, interval=300):
+    """每个商品生成 samples 个价格（对数随机游走），所有商品共用同一组时间戳"""
+    import random
+    os.makedirs(path, exist_ok=True)
+    rng = random.Random(0)
+    start = int(time.time()) - samples * interval
+    times = array('q', range(start, start + samples * interval, interval))
+    index = []
+    with open(os.path.join(path, 'times.i64'), 'wb') as tf, open(os.path.join(path, 'prices.f64'), 'wb') as pf:
+        for s in range(skus):
+            if analytics.np is not None:
+                np = analytics.np
+                steps = np.random.default_rng(s).normal(0, 0.01, samples)
+                prices = (200 + s % 800) * np.exp(np.cumsum(steps))
+                prices.tofile(pf)
+            else:
+                price = 200.0 + s % 800
+                prices = array('d')
+                for _ in range(samples):
+                    price *= 1 + rng.gauss(0, 0.01)
+                    prices.append(price)
+                prices.tofile(pf)
+            times.tofile(tf)
+            index.append({'sku': str(s + 1), 'name': f"商品{s + 1}", 'offset': s * samples, 'count': samples})
+    with open(os.path.join(path, 'index.json'), 'w') as f:
+        json.dump({'backend': 'bench', 'exported': time.time(), 'byteorder': sys.byteorder,
+                   'samples': skus * samples, 'skus': index}, f, ensure_ascii=False)
+
+def main():
+    args = sys.argv[1:]
+    skus = pop_option(args, '--skus', 1000, int)
+    samples = pop_option(args, '--samples', 10000, int)
+    days = pop_option(args, '--days', 0, int)
+    path = pop_option(args, '--dir')
+    keep = '--keep' in args
+
+    workdir = path or tempfile.mkdtemp(prefix='ram-analyze-')
+    t0 = time.perf_counter()
+    if not os.path.exists(os.path.join(workdir, 'index.json')):
+        generate(workdir, skus, samples)
+    generate_seconds = time.perf_counter() - t0
+    rss_before = peak_rss()
+
+    t0 = time.perf_counter()
+    columns = analytics.ColumnStore(workdir)
+    since = int(time.time()) - days * 86400 if days else None
+    stats = analytics.price_stats(columns, since=since)
+    stats_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    analytics.correlation(columns, [item['sku'] for item in columns.index[:10]], since)
+    corr_seconds = time.perf_counter() - t0
+    total = columns.samples
+    columns.close()
+
+    if not keep and not path:
+        shutil.rmtree(workdir)
+    print(json.dumps({
+        'engine': 'numpy' if analytics.np is not None else 'stdlib',
+        'skus': len(stats),
+        'samples': total,
+        'generate_seconds': round(generate_seconds, 2),
+        'stats_seconds': round(stats_seconds, 3),
+        'samples_per_second': round(total / stats_seconds),
+        'correlation_10_skus_seconds': round(corr_seconds, 3),
+        'peak_rss_bytes_before': rss_before,
+        'peak_rss_bytes': peak_rss(),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
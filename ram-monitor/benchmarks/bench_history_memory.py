@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+内存历史结构的内存占用对比
+比较旧版 [{'time': str, 'price': float}] 字典列表与 PriceSeries 环形缓冲区
+
+用法:
+  python3 benchmarks/bench_history_memory.py [--skus 10000] [--samples 10000] [--measure-skus 50]
+
+10k 商品 × 10k 样本的字典列表需要几十GB内存，因此默认只实际构建 --measure-skus 个商品，
+再按商品数线性外推（同一周期的时间字符串在所有商品间共享，单独计入一次）。
+使用 --full 可以实际构建全部数据。结果以 JSON 输出。
+"""
+
+import json, os, sys, time, tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from history_store import PriceSeries, TIME_FORMAT
+from ram_monitor import pop_option
+
+def make_timestamps(samples, interval=300):
+    """生成每个周期的时间（字符串和时间戳），模拟 monitor_price 每周期共用一个时间字符串"""
+    start = int(time.time()) - samples * interval
+    epochs = [start + i * interval for i in range(samples)]
+    strings = [datetime.fromtimestamp(e).strftime(TIME_FORMAT) for e in epochs]
+    return epochs, strings
+
+def build_dict_lists(skus, strings):
+    """旧版结构：每个样本一个字典"""
+    history = {}
+    for s in range(skus):
+        points = []
+        for i, ts in enumerate(strings):
+            points.append({'time': ts, 'price': 100.0 + s + i * 0.01})
+        history[str(s)] = points
+    return history
+
+def build_series(skus, epochs, capacity):
+    """新版结构：每个商品一个 PriceSeries"""
+    history = {}
+    for s in range(skus):
+        series = PriceSeries(capacity)
+        for i, ts in enumerate(epochs):
+            series.append(ts, 100.0 + s + i * 0.01)
+        history[str(s)] = series
+    return history
+
+def measure(build, *args):
+    """返回 (构建期间新增的内存字节数, 耗时秒)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    data = build(*args)
+    elapsed = time.perf_counter() - t0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size, elapsed
+
+def main():
+    args = sys.argv[1:]
+    skus = pop_option(args, '--skus', 10000, int)
+    samples = pop_option(args, '--samples', 10000, int)
+    measure_skus = pop_option(args, '--measure-skus', 50, int)
+    if '--full' in args:
+        measure_skus = skus
+
+    epochs, strings = make_timestamps(samples)
+    shared_strings = sum(sys.getsizeof(s) for s in strings)
+    scale = skus / measure_skus
+
+    dict_bytes, dict_time = measure(build_dict_lists, measure_skus, strings)
+    series_bytes, series_time = measure(build_series, measure_skus, epochs, samples)
+
+    # 环形缓冲区写满后的稳态追加耗时
+    series = build_series(1, epochs, samples)[str(0)]
+    t0 = time.perf_counter()
+    for i in range(samples):
+        series.append(epochs[-1] + i, 1.0)
+    append_ns = (time.perf_counter() - t0) / samples * 1e9
+
+    dict_total = dict_bytes * scale + shared_strings
+    series_total = series_bytes * scale
+    total_samples = skus * samples
+    print(json.dumps({
+        'skus': skus,
+        'samples_per_sku': samples,
+        'measured_skus': measure_skus,
+        'extrapolated': measure_skus != skus,
+        'dict_list': {
+            'bytes': int(dict_total),
+            'bytes_per_sample': round(dict_total / total_samples, 2),
+            'build_seconds_traced': round(dict_time * scale, 2),
+        },
+        'price_series': {
+            'bytes': int(series_total),
+            'bytes_per_sample': round(series_total / total_samples, 2),
+            'build_seconds_traced': round(series_time * scale, 2),
+            'full_buffer_append_ns': round(append_ns, 1),
+        },
+        'ratio': round(dict_total / series_total, 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
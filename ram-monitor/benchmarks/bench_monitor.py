@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+ram_monitor 离线性能测试
+启动本地京东价格接口替身（jd_stub.py），在不同商品规模下测试 check、monitor 周期
+和历史存储读写，结果以 JSON 输出，便于不同版本之间对比。
+
+用法:
+  python3 benchmarks/bench_monitor.py [选项]
+
+选项:
+  --sizes <列表>       商品规模，默认 100,1000,10000
+  --scenarios <列表>   测试场景，默认 check,monitor,history
+  --cycles <N>         每个场景运行的周期数（默认5）
+  --backend <类型>     monitor/history 场景使用的存储后端（默认 jsonl）
+  --workers <N>        并发抓取线程数（默认8）
+  --rate <N>           对替身服务的限速（次/秒），0 表示不限（默认0）
+  --latency <毫秒>     替身服务每个请求的延迟（默认20）
+  --error-rate <比例>  替身服务返回错误的概率（默认0）
+  --throttle <N>       替身服务每秒最多处理的请求数（默认0，不限）
+  --output <文件>      结果写入文件（默认输出到标准输出）
+
+每个场景在独立子进程中运行，peak_rss_bytes 互不影响。
+check / monitor 的结果包含 failed_skus（所有周期中没有取到价格的SKU数），以及
+fallback_requests / fallback_prices（批量结果缺失时逐个回退的请求数、其中取到价格的次数）；
+有回退但 fallback_prices 为 0 说明备用接口的解析失效，结果中的回退耗时没有意义。
+"""
+
+import contextlib, io, json, os, random, resource, subprocess, sys, tempfile, threading, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from ram_monitor import pop_option
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for fn in files:
+            total += os.path.getsize(os.path.join(root, fn))
+    return total
+
+def peak_rss():
+    # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+# ============ 场景（在子进程中运行） ============
+
+def setup_monitor(base_url, rate):
+    """
+    把 ram_monitor 指向替身服务，记录每个SKU的获取耗时，
+    以及逐个回退（get_jd_price）的次数和其中取到价格的次数
+    """
+    import ram_monitor
+    ram_monitor.JD_MGETS_URL = f"{base_url}/prices/mgets"
+    ram_monitor.JD_BACKUP_URL = f"{base_url}/"
+    ram_monitor.set_rate_limits({'127.0.0.1': rate} if rate else {})
+
+    latencies = {}
+    fallback = {'requests': 0, 'prices': 0}
+    lock = threading.Lock()
+    fetch_chunk, fetch_one = ram_monitor.fetch_mgets_chunk, ram_monitor.get_jd_price
+
+    def timed_chunk(chunk):
+        start = time.perf_counter()
+        result = fetch_chunk(chunk)
+        elapsed = time.perf_counter() - start
+        with lock:
+            for sku in chunk:
+                latencies[sku] = latencies.get(sku, 0) + elapsed
+        return result
+
+    def timed_one(sku_id):
+        start = time.perf_counter()
+        result = fetch_one(sku_id)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[sku_id] = latencies.get(sku_id, 0) + elapsed
+            fallback['requests'] += 1
+            fallback['prices'] += result is not None
+        return result
+
+    ram_monitor.fetch_mgets_chunk = timed_chunk
+    ram_monitor.get_jd_price = timed_one
+    return ram_monitor, latencies, fallback
+
+def scenario_check(size, cycles, base_url, workers, rate, backend):
+    rm, latencies, fallback = setup_monitor(base_url, rate)
+    products = {f"商品{i}": str(i) for i in range(1, size + 1)}
+    per_sku = []
+    failed = 0
+    start = time.perf_counter()
+    for _ in range(cycles):
+        latencies.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            prices = rm.get_jd_prices(products.values(), workers=workers)
+        per_sku.extend(latencies.values())
+        failed += sum(1 for p in prices.values() if not p)
+    elapsed = time.perf_counter() - start
+    return {'cycles_per_sec': cycles / elapsed, 'cycle_seconds': elapsed / cycles,
+            'per_sku_latency': per_sku, 'failed_skus': failed,
+            'fallback_requests': fallback['requests'], 'fallback_prices': fallback['prices']}
+
+def scenario_monitor(size, cycles, base_url, workers, rate, backend):
+    rm, latencies, fallback = setup_monitor(base_url, rate)
+    from history_store import open_history_store
+    items = [(f"商品{i}", str(i)) for i in range(1, size + 1)]
+    store = open_history_store(backend)
+    price_history = store.load()
+    per_sku = []
+    written = 0
+    failed = 0
+    start = time.perf_counter()
+    for _ in range(cycles):
+        latencies.clear()
+        before = dir_bytes('.')
+        with contextlib.redirect_stdout(io.StringIO()):
+            prices, _ = rm.run_cycle(items, price_history, store, workers=workers)
+        failed += sum(1 for _, sku in items if not prices.get(sku))
+        written += max(0, dir_bytes('.') - before)
+        per_sku.extend(latencies.values())
+    elapsed = time.perf_counter() - start
+    store.close()
+    return {'cycles_per_sec': cycles / elapsed, 'cycle_seconds': elapsed / cycles,
+            'per_sku_latency': per_sku, 'bytes_written_per_cycle': written / cycles, 'failed_skus': failed,
+            'fallback_requests': fallback['requests'], 'fallback_prices': fallback['prices']}
+
+def scenario_history(size, cycles, base_url, workers, rate, backend):
+    from history_store import open_history_store, new_entry, record_sample, TIME_FORMAT
+    from datetime import datetime
+    store = open_history_store(backend)
+    price_history = store.load()
+    write_times = []
+    written = 0
+    t0 = int(time.time()) - cycles * 300
+    for c in range(cycles):
+        ts = t0 + c * 300
+        timestamp = datetime.fromtimestamp(ts).strftime(TIME_FORMAT)
+        records = []
+        for i in range(1, size + 1):
+            sku = str(i)
+            entry = price_history.get(sku)
+            if entry is None:
+                entry = price_history[sku] = new_entry(f"商品{i}")
+            price = 199.0 + i % 800 + c % 3
+            record_sample(entry, ts, price)
+            records.append((sku, entry['name'], timestamp, price))
+        before = dir_bytes('.')
+        start = time.perf_counter()
+        store.append(records)
+        store.maybe_compact()
+        write_times.append(time.perf_counter() - start)
+        written += max(0, dir_bytes('.') - before)
+    store.close()
+
+    start = time.perf_counter()
+    store = open_history_store(backend)
+    store.load()
+    load_seconds = time.perf_counter() - start
+
+    query_times = []
+    rng = random.Random(0)
+    for _ in range(100):
+        sku = str(rng.randint(1, size))
+        start = time.perf_counter()
+        store.query(sku=sku, limit=10)
+        query_times.append(time.perf_counter() - start)
+    store.close()
+    return {'cycles_per_sec': cycles / sum(write_times), 'bytes_written_per_cycle': written / cycles,
+            'write_p50_seconds': percentile(write_times, 0.5), 'load_seconds': load_seconds,
+            'query_p50_seconds': percentile(query_times, 0.5),
+            'query_p99_seconds': percentile(query_times, 0.99)}
+
+SCENARIOS = {
+    'check': scenario_check,
+    'monitor': scenario_monitor,
+    'history': scenario_history,
+}
+
+def run_scenario(name, size, cycles, base_url, workers, rate, backend):
+    """在临时目录中运行一个场景，返回结果字典"""
+    workdir = tempfile.mkdtemp(prefix='ram-bench-')
+    os.chdir(workdir)
+    result = SCENARIOS[name](size, cycles, base_url, workers, rate, backend)
+    latencies = result.pop('per_sku_latency', None)
+    if latencies is not None:
+        result['per_sku_p50_ms'] = percentile(latencies, 0.5) * 1000 if latencies else None
+        result['per_sku_p99_ms'] = percentile(latencies, 0.99) * 1000 if latencies else None
+    result.update({'scenario': name, 'skus': size, 'cycles': cycles, 'backend': backend,
+                   'peak_rss_bytes': peak_rss()})
+    subprocess.run(['rm', '-rf', workdir])
+    return result
+
+# ============ 主流程 ============
+
+def main():
+    args = sys.argv[1:]
+    if '--run' in args:
+        # 子进程: --run <场景> <规模> <周期数> <替身地址> <线程数> <限速> <后端>
+        i = args.index('--run')
+        name, size, cycles, base_url, workers, rate, backend = args[i + 1:i + 8]
+        result = run_scenario(name, int(size), int(cycles), base_url, int(workers), float(rate), backend)
+        print(json.dumps(result))
+        return
+
+    sizes = [int(x) for x in pop_option(args, '--sizes', '100,1000,10000').split(',')]
+    scenarios = pop_option(args, '--scenarios', 'check,monitor,history').split(',')
+    cycles = pop_option(args, '--cycles', 5, int)
+    backend = pop_option(args, '--backend', 'jsonl')
+    workers = pop_option(args, '--workers', 8, int)
+    rate = pop_option(args, '--rate', 0, float)
+    latency = pop_option(args, '--latency', 20, float)
+    error_rate = pop_option(args, '--error-rate', 0, float)
+    throttle = pop_option(args, '--throttle', 0, int)
+    output = pop_option(args, '--output', None)
+
+    for name in scenarios:
+        if name not in SCENARIOS:
+            print(f"❌ 未知场景: {name}（可选: {', '.join(SCENARIOS)}）")
+            sys.exit(1)
+
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'jd_stub.py'), '--port', '0',
+         '--catalog', str(max(sizes)), '--latency', str(latency),
+         '--error-rate', str(error_rate), '--throttle', str(throttle), '--volatility', '0.05'],
+        stdout=subprocess.PIPE, text=True)
+    base_url = stub.stdout.readline().strip()
+
+    results = []
+    try:
+        for name in scenarios:
+            for size in sizes:
+                proc = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--run', name, str(size), str(cycles),
+                     base_url, str(workers), str(rate), backend],
+                    capture_output=True, text=True)
+                if proc.returncode != 0:
+                    results.append({'scenario': name, 'skus': size, 'error': proc.stderr.strip()[-500:]})
+                    continue
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+                results.append(result)
+                print(f"  {name} × {size}: 完成", file=sys.stderr)
+                if result.get('fallback_requests') and not result.get('fallback_prices'):
+                    print(f"  ⚠️ {name} × {size}: {result['fallback_requests']} 次回退都没有取到价格",
+                          file=sys.stderr)
+    finally:
+        stub.terminate()
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': sys.version.split()[0],
+        'stub': {'latency_ms': latency, 'error_rate': error_rate, 'throttle': throttle},
+        'workers': workers,
+        'rate': rate,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+京东价格接口的本地替身
+模拟 p.3.cn/prices/mgets 和 api.m.jd.com 备用接口，用于离线性能测试
+
+用法:
+  python3 benchmarks/jd_stub.py [--port 18080] [--catalog 10000] [--latency 20]
+                                [--error-rate 0.01] [--throttle 200] [--volatility 0.05]
+
+选项:
+  --port <N>          监听端口，0 表示随机端口（启动后第一行输出实际地址）
+  --catalog <N>       商品数量，SKU_ID 为 1..N，其他SKU在 mgets 结果中缺失
+  --latency <毫秒>    每个请求的固定延迟
+  --jitter <毫秒>     额外的随机延迟上限
+  --error-rate <比例> 返回 HTTP 500 的概率
+  --throttle <N>      每秒最多处理的请求数，超过返回 HTTP 429（0 表示不限）
+  --volatility <比例> 每次查询时价格变化的概率
+"""
+
+import gzip, json, os, random, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ram_monitor import pop_option
+
+class StubState:
+    """替身服务的配置、价格表和请求统计"""
+    def __init__(self, catalog=10000, latency=0.0, jitter=0.0, error_rate=0.0, throttle=0,
+                 volatility=0.0, seed=0):
+        self.catalog = catalog
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle = throttle
+        self.volatility = volatility
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.prices = {}
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.stats = {'requests': 0, 'errors': 0, 'throttled': 0, 'skus': 0}
+
+    def price(self, sku):
+        """返回SKU当前价格，目录外的SKU返回 None"""
+        if not sku.isdigit() or not 0 < int(sku) <= self.catalog:
+            return None
+        with self.lock:
+            p = self.prices.get(sku)
+            if p is None:
+                p = self.prices[sku] = 199.0 + int(sku) % 800
+            elif self.random.random() < self.volatility:
+                p = self.prices[sku] = round(p * self.random.uniform(0.9, 1.1), 2)
+        return p
+
+    def admit(self):
+        """返回本次请求的处理结果: ok / throttled / error"""
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.throttle:
+                now = time.monotonic()
+                if now - self.window_start >= 1:
+                    self.window_start, self.window_count = now, 0
+                self.window_count += 1
+                if self.window_count > self.throttle:
+                    self.stats['throttled'] += 1
+                    return 'throttled'
+            if self.random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 'error'
+        return 'ok'
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server.state
+        delay = state.latency + (random.uniform(0, state.jitter) if state.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        verdict = state.admit()
+        if verdict == 'throttled':
+            return self._send(429, b'{"error": "too many requests"}')
+        if verdict == 'error':
+            return self._send(500, b'{"error": "internal error"}')
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/prices/mgets':
+            ids = query.get('skuIds', [''])[0].split(',')
+            items = []
+            for sku_id in ids:
+                sku = sku_id[2:] if sku_id.startswith('J_') else sku_id
+                p = state.price(sku)
+                if p is not None:
+                    items.append({'id': f"J_{sku}", 'p': f"{p:.2f}", 'm': f"{p * 1.2:.2f}", 'op': f"{p:.2f}"})
+            with state.lock:
+                state.stats['skus'] += len(ids)
+            return self._send(200, json.dumps(items).encode())
+
+        if url.path == '/' and query.get('functionId') == ['getCatalogProduct']:
+            sku = query.get('skuId', [''])[0]
+            p = state.price(sku)
+            with state.lock:
+                state.stats['skus'] += 1
+            body = {'code': 0, 'price': {'p': f"{p:.2f}"}} if p is not None else {'code': 0}
+            return self._send(200, json.dumps(body).encode())
+
+        self._send(404, b'{"error": "not found"}')
+
+    def _send(self, status, body):
+        encoding = None
+        if 'gzip' in self.headers.get('Accept-Encoding', '') and len(body) > 512:
+            body = gzip.compress(body)
+            encoding = 'gzip'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_stub(port=0, **options):
+    """
+    在后台线程启动替身服务
+
+    Returns:
+        (server, base_url)，server.state 为 StubState
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    args = sys.argv[1:]
+    port = pop_option(args, '--port', 18080, int)
+    options = {
+        'catalog': pop_option(args, '--catalog', 10000, int),
+        'latency': pop_option(args, '--latency', 0, float) / 1000,
+        'jitter': pop_option(args, '--jitter', 0, float) / 1000,
+        'error_rate': pop_option(args, '--error-rate', 0, float),
+        'throttle': pop_option(args, '--throttle', 0, int),
+        'volatility': pop_option(args, '--volatility', 0, float),
+    }
+    server, base_url = start_stub(port, **options)
+    print(base_url, flush=True)
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        print(json.dumps(server.state.stats))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,862 @@
+#!/usr/bin/env python3
+"""
+价格历史存储
+提供追加写入的 JSON Lines 分段日志存储、带索引的 SQLite 存储，
+以及兼容旧版的整文件 JSON 存储
+"""
+
+import json, os, time, sqlite3
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# ============ 配置 ============
+HISTORY_FILE = "price_history.json"
+HISTORY_DIR = "price_history.d"
+HISTORY_DB = "price_history.db"
+
+# 历史记录中的时间格式（按字符串排序即按时间排序）
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 当前分段超过该大小（字节）时切换到新分段
+SEGMENT_BYTES = 4 * 1024 * 1024
+
+# 已封存分段达到该数量时触发压缩
+COMPACT_SEGMENTS = 8
+
+# 汇总粒度: 名称 -> (时间桶宽度秒数, 保留的桶数)
+ROLLUPS = {
+    'hour': (3600, 24 * 30),
+    'day': (86400, 400),
+}
+
+# 原始样本在 SQLite 中保留的时长（秒），更早的数据只保留汇总
+RAW_RETENTION = 7 * 86400
+
+# ============ 内存历史结构 ============
+
+# 同一周期内所有商品共用一个时间戳，缓存转换结果
+@lru_cache(maxsize=4096)
+def to_epoch(ts):
+    """时间字符串转为秒级时间戳"""
+    return int(datetime.strptime(ts, TIME_FORMAT).timestamp())
+
+@lru_cache(maxsize=4096)
+def from_epoch(epoch):
+    """秒级时间戳转为时间字符串"""
+    return datetime.fromtimestamp(epoch).strftime(TIME_FORMAT)
+
+class PriceSeries:
+    """
+    单个商品的价格序列（定长环形缓冲区）
+    价格存放在 array('d')，秒级时间戳存放在 array('q')，每个样本占 16 字节；
+    写满 capacity 后新样本覆盖最旧的样本，追加和淘汰都是 O(1)。
+    capacity 为 None 时不限长度。
+    """
+    __slots__ = ('capacity', 'times', 'prices', 'start')
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.times = array('q')
+        self.prices = array('d')
+        self.start = 0  # 写满后最旧样本的位置
+
+    def __len__(self):
+        return len(self.prices)
+
+    def append(self, ts, price):
+        """追加一个样本 (秒级时间戳, 价格)"""
+        if self.capacity is None or len(self.prices) < self.capacity:
+            self.times.append(ts)
+            self.prices.append(price)
+        else:
+            self.times[self.start] = ts
+            self.prices[self.start] = price
+            self.start = (self.start + 1) % self.capacity
+
+    def __iter__(self):
+        """按时间从旧到新返回 (时间戳, 价格)"""
+        n = len(self.prices)
+        for i in range(n):
+            j = (self.start + i) % n
+            yield self.times[j], self.prices[j]
+
+    def last(self):
+        """最新的样本 (时间戳, 价格)，为空时返回 None"""
+        if not self.prices:
+            return None
+        j = (self.start - 1) % len(self.prices)
+        return self.times[j], self.prices[j]
+
+    def to_records(self):
+        """转为旧版 JSON 格式 [{'time': str, 'price': float}]"""
+        return [{'time': from_epoch(ts), 'price': price} for ts, price in self]
+
+    @classmethod
+    def from_records(cls, records, capacity=100):
+        """从旧版 JSON 格式创建，跳过时间无法解析的记录"""
+        series = cls(capacity)
+        for r in records:
+            try:
+                series.append(to_epoch(r['time']), float(r['price']))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return series
+
+# 同一周期内所有商品共用一个时间戳，缓存对齐结果
+@lru_cache(maxsize=4096)
+def bucket_start(ts, width):
+    """
+    样本所在时间桶的起始时间戳（按样本时刻的本地时间对齐）
+    时区偏移按每个时间戳单独计算，夏令时切换前后的桶各自对齐到本地整点；
+    按天（及更长）汇总时以本地零点为界，切换当天的桶为 23 或 25 小时。
+    """
+    if width >= 86400:
+        day = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+        day -= timedelta(days=day.toordinal() % (width // 86400))
+        return int(day.timestamp())
+    offset = time.localtime(ts).tm_gmtoff
+    return (ts + offset) // width * width - offset
+
+class RollupSeries:
+    """
+    单个商品某一粒度的汇总序列
+    每个时间桶记录 最低/最高/总和/次数/最后价格，新样本到达时只更新所在的桶，
+    超过 retention 个桶后淘汰最旧的桶。
+    """
+    __slots__ = ('width', 'retention', 'starts', 'mins', 'maxs', 'sums', 'counts', 'lasts')
+
+    def __init__(self, width, retention):
+        self.width = width
+        self.retention = retention
+        self.starts = array('q')
+        self.mins = array('d')
+        self.maxs = array('d')
+        self.sums = array('d')
+        self.counts = array('q')
+        self.lasts = array('d')
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, ts, price):
+        """累加一个样本"""
+        self.merge(bucket_start(ts, self.width), price, price, price, 1, price)
+
+    def merge(self, start, mn, mx, total, count, last):
+        """合并一个桶的汇总值（用于样本累加和从存储加载）"""
+        starts = self.starts
+        if starts and start == starts[-1]:
+            i = len(starts) - 1
+        elif not starts or start > starts[-1]:
+            self._insert(len(starts), start, mn, mx, total, count, last)
+            return
+        else:
+            # 乱序到达的旧样本
+            i = bisect_left(starts, start)
+            if i == len(starts) or starts[i] != start:
+                self._insert(i, start, mn, mx, total, count, last)
+                return
+        self.mins[i] = min(self.mins[i], mn)
+        self.maxs[i] = max(self.maxs[i], mx)
+        self.sums[i] += total
+        self.counts[i] += count
+        self.lasts[i] = last
+
+    def _insert(self, i, start, mn, mx, total, count, last):
+        for arr, value in zip(self._arrays(), (start, mn, mx, total, count, last)):
+            arr.insert(i, value)
+        # 超出保留数量一成后再批量淘汰，摊销删除开销
+        excess = len(self.starts) - self.retention
+        if excess > max(1, self.retention // 10):
+            for arr in self._arrays():
+                del arr[:excess]
+
+    def _arrays(self):
+        return (self.starts, self.mins, self.maxs, self.sums, self.counts, self.lasts)
+
+    def __iter__(self):
+        """按时间返回 (桶起始时间戳, 最低, 最高, 总和, 次数, 最后价格)"""
+        floor = self.starts[-1] - (self.retention - 1) * self.width if self.starts else 0
+        for row in zip(*self._arrays()):
+            if row[0] >= floor:
+                yield row
+
+def new_rollups():
+    """创建各粒度的空汇总序列"""
+    return {res: RollupSeries(width, keep) for res, (width, keep) in ROLLUPS.items()}
+
+def new_entry(name, capacity=100, rollups=True):
+    """
+    创建一个商品的内存历史结构
+    rollups 为 False 时不在内存中维护汇总（由存储后端自行汇总）
+    """
+    return {'name': name, 'history': PriceSeries(capacity), 'current': None,
+            'rollups': new_rollups() if rollups else None}
+
+def record_sample(entry, ts, price):
+    """记录一个新样本：写入原始序列并增量更新各粒度汇总"""
+    entry['history'].append(ts, price)
+    if entry['rollups']:
+        for rollup in entry['rollups'].values():
+            rollup.add(ts, price)
+    entry['current'] = price
+
+def history_memory(price_history):
+    """
+    统计内存历史的规模
+
+    Returns:
+        (原始样本数, 汇总桶数, 数组占用字节数)
+    """
+    samples = buckets = nbytes = 0
+    for entry in price_history.values():
+        series = entry['history']
+        samples += len(series)
+        nbytes += series.times.buffer_info()[1] * 8 + series.prices.buffer_info()[1] * 8
+        for rollup in (entry['rollups'] or {}).values():
+            buckets += len(rollup)
+            nbytes += len(rollup) * 48
+    return samples, buckets, nbytes
+
+def entry_from_json(data, capacity=100):
+    """从旧版 JSON 结构 {'name', 'history': [...], 'current'} 创建"""
+    entry = new_entry(data.get('name', ''), capacity)
+    entry['history'] = PriceSeries.from_records(data.get('history', []), capacity)
+    if 'rollups' in data:
+        for res, rows in data['rollups'].items():
+            if res in entry['rollups']:
+                for row in rows:
+                    entry['rollups'][res].merge(*row)
+    else:
+        # 旧版数据没有汇总，从原始样本重建
+        for ts, price in entry['history']:
+            for rollup in entry['rollups'].values():
+                rollup.add(ts, price)
+    last = entry['history'].last()
+    entry['current'] = data.get('current', last[1] if last else None)
+    return entry
+
+def entry_to_json(entry):
+    """转为旧版 JSON 结构（附带汇总数据）"""
+    data = {'name': entry['name'], 'history': entry['history'].to_records(),
+            'current': entry['current']}
+    if entry['rollups']:
+        data['rollups'] = {res: [list(row) for row in rollup]
+                           for res, rollup in entry['rollups'].items()}
+    return data
+
+def rollup_record(start, mn, mx, total, count, last):
+    """汇总桶转为查询结果格式"""
+    return {'time': from_epoch(start), 'min': mn, 'max': mx,
+            'avg': total / count if count else None, 'last': last, 'count': count}
+
+def iter_records(price_history):
+    """把内存历史展开为 (SKU_ID, 商品名, 时间, 价格) 记录"""
+    for sku, data in price_history.items():
+        for ts, price in data['history']:
+            yield (sku, data.get('name', sku), from_epoch(ts), price)
+
+def filter_history(price_history, sku=None, name=None, since=None, until=None, limit=10,
+                   resolution='raw'):
+    """
+    在内存历史中查询
+
+    Args:
+        resolution: raw（原始样本）或 ROLLUPS 中的汇总粒度
+
+    Returns:
+        [{'sku', 'name', 'history': 最近 limit 条记录, 'total': 区间内记录数}]
+        汇总粒度的记录为 {'time', 'min', 'max', 'avg', 'last', 'count'}
+    """
+    results = []
+    if sku:
+        items = [(sku, price_history[sku])] if sku in price_history else []
+    else:
+        items = price_history.items()
+    for pid, data in items:
+        if name and data.get('name') != name:
+            continue
+        lo = to_epoch(since) if since else None
+        hi = to_epoch(until) if until else None
+        if resolution == 'raw':
+            points = [(ts, price) for ts, price in data['history']
+                      if (lo is None or ts >= lo) and (hi is None or ts <= hi)]
+            shown = [{'time': from_epoch(ts), 'price': price}
+                     for ts, price in (points[-limit:] if limit else points)]
+        else:
+            points = [row for row in data['rollups'][resolution]
+                      if (lo is None or row[0] >= lo) and (hi is None or row[0] <= hi)]
+            shown = [rollup_record(*row) for row in (points[-limit:] if limit else points)]
+        results.append({'sku': pid, 'name': data.get('name', pid), 'total': len(points),
+                        'history': shown})
+    return results
+
+# ============ 存储后端 ============
+
+class JSONHistoryStore:
+    """
+    旧版整文件 JSON 存储
+    每个周期整体重写 price_history.json（先写临时文件再原子替换）
+    """
+    def __init__(self, path=HISTORY_FILE, max_history=100):
+        self.path = path
+        self.max_history = max_history
+        self.price_history = {}
+
+    def load(self):
+        """加载全部历史，返回 {SKU_ID: {'name', 'history', 'current'}}"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                self.price_history = {sku: entry_from_json(d, self.max_history) for sku, d in data.items()}
+            except ValueError as e:
+                # 文件损坏时保留现场，不覆盖原有数据
+                backup = f"{self.path}.corrupt-{int(time.time())}"
+                os.replace(self.path, backup)
+                print(f"⚠️ 历史文件损坏 ({e})，已备份到 {backup}")
+        return self.price_history
+
+    def append(self, records):
+        """记录本周期的观测值（整体重写文件），返回写入的字节数"""
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({sku: entry_to_json(e) for sku, e in self.price_history.items()},
+                      f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+            written = f.tell()
+        os.replace(tmp, self.path)
+        return written
+
+    def query(self, sku=None, name=None, since=None, until=None, limit=10, resolution='raw'):
+        """按SKU、名称、时间范围和粒度查询历史"""
+        if not self.price_history:
+            self.load()
+        return filter_history(self.price_history, sku, name, since, until, limit, resolution)
+
+    def maybe_compact(self):
+        pass
+
+    def close(self):
+        pass
+
+class JSONLHistoryStore:
+    """
+    追加写入的价格历史存储（JSON Lines 分段日志）
+
+    目录结构:
+      price_history.d/
+        00000001.jsonl   已封存的分段
+        00000002.jsonl   当前写入的分段
+
+    每行一条观测记录 {"sku", "name", "time", "price"}，每个周期只追加本周期的观测。
+    分段超过 segment_bytes 后切换新分段；封存分段达到 compact_segments 个时，
+    把内存中保留的历史（每个商品最多 max_history 条）和各粒度汇总写成一个快照分段，
+    快照首行为 {"snapshot": true}，加载时忽略快照之前的所有分段，
+    因此压缩过程中任何时刻崩溃都不会丢失或重复数据。
+    汇总记录格式为 {"sku", "rollup": 粒度, "v": [桶起始, 最低, 最高, 总和, 次数, 最后价格]}；
+    快照中的原始样本已计入快照汇总，只有快照之后的样本才会在加载时累加到汇总。
+    """
+    def __init__(self, path=HISTORY_DIR, max_history=100, segment_bytes=SEGMENT_BYTES,
+                 compact_segments=COMPACT_SEGMENTS, legacy_file=HISTORY_FILE):
+        self.path = path
+        self.max_history = max_history
+        self.segment_bytes = segment_bytes
+        self.compact_segments = compact_segments
+        self.legacy_file = legacy_file
+        self.price_history = {}
+        self.active = None  # 当前分段文件对象
+        self.active_seq = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def _segments(self):
+        """按序号返回所有分段 [(序号, 路径)]"""
+        segments = []
+        for fn in os.listdir(self.path):
+            if fn.endswith('.jsonl') and fn[:-6].isdigit():
+                segments.append((int(fn[:-6]), os.path.join(self.path, fn)))
+        return sorted(segments)
+
+    def _segment_path(self, seq):
+        return os.path.join(self.path, f"{seq:08d}.jsonl")
+
+    def load(self):
+        """从分段日志重建内存历史，返回 {SKU_ID: {'name', 'history', 'current'}}"""
+        segments = self._segments()
+        if not segments and self.legacy_file and os.path.exists(self.legacy_file):
+            self._migrate_legacy()
+            segments = self._segments()
+
+        # 只需要从最新的快照开始回放
+        start = 0
+        for i, (_, path) in enumerate(segments):
+            if self._is_snapshot(path):
+                start = i
+
+        self.price_history = {}
+        bad = 0
+        for n, (_, path) in enumerate(segments[start:]):
+            in_snapshot = n == 0 and self._is_snapshot(path)
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        sku = rec['sku']
+                        entry = self.price_history.get(sku)
+                        if entry is None:
+                            entry = self.price_history[sku] = new_entry(sku, self.max_history)
+                        if 'rollup' in rec:
+                            entry['rollups'][rec['rollup']].merge(*rec['v'])
+                            continue
+                        ts, price = to_epoch(rec['time']), float(rec['price'])
+                    except (ValueError, KeyError, TypeError):
+                        # 跳过崩溃时写了一半的行和快照标记
+                        if not line.startswith('{"snapshot"'):
+                            bad += 1
+                        continue
+                    if in_snapshot:
+                        entry['history'].append(ts, price)
+                        entry['current'] = price
+                    else:
+                        record_sample(entry, ts, price)
+                    entry['name'] = rec.get('name', entry['name'])
+        if bad:
+            print(f"⚠️ 跳过 {bad} 条损坏的历史记录")
+
+        # 继续写入最后一个分段；快照分段写完后不再追加
+        self.active_seq = segments[-1][0] if segments else 1
+        if segments and self._is_snapshot(segments[-1][1]):
+            self.active_seq += 1
+        return self.price_history
+
+    @staticmethod
+    def _is_snapshot(path):
+        with open(path, 'r') as f:
+            return f.readline().startswith('{"snapshot"')
+
+    @staticmethod
+    def _repair_tail(path):
+        """截掉崩溃时写了一半的末行，避免后续追加的记录接在残行后面"""
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _migrate_legacy(self):
+        """把旧版 price_history.json 导入为第一个快照分段"""
+        try:
+            with open(self.legacy_file, 'r') as f:
+                legacy = json.load(f)
+        except ValueError as e:
+            print(f"⚠️ 旧版历史文件无法解析，跳过迁移: {e}")
+            return
+        self._write_snapshot(1, {sku: entry_from_json(d, self.max_history) for sku, d in legacy.items()})
+        print(f"✅ 已将 {self.legacy_file} 迁移到 {self.path}/")
+
+    def _write_snapshot(self, seq, price_history):
+        """原子地写入快照分段"""
+        path = self._segment_path(seq)
+        tmp = path + ".tmp"
+        with open(tmp, 'w') as f:
+            f.write('{"snapshot": true}\n')
+            for record in iter_records(price_history):
+                f.write(self._encode(*record))
+            for sku, entry in price_history.items():
+                for res, rollup in (entry['rollups'] or {}).items():
+                    for row in rollup:
+                        f.write(json.dumps({'sku': sku, 'rollup': res, 'v': list(row)}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _encode(sku, name, ts, price):
+        return json.dumps({'sku': sku, 'name': name, 'time': ts, 'price': price},
+                          ensure_ascii=False) + "\n"
+
+    def append(self, records):
+        """
+        追加本周期的观测值
+
+        Args:
+            records: [(SKU_ID, 商品名, 时间, 价格)]
+
+        Returns:
+            写入的字节数
+        """
+        if not records:
+            return 0
+        if self.active is None:
+            path = self._segment_path(self.active_seq)
+            if os.path.exists(path):
+                self._repair_tail(path)
+            self.active = open(path, 'a')
+        start = self.active.tell()
+        self.active.write("".join(self._encode(*r) for r in records))
+        self.active.flush()
+        os.fsync(self.active.fileno())
+        end = self.active.tell()
+
+        if end >= self.segment_bytes:
+            self._rotate()
+        return end - start
+
+    def _rotate(self):
+        """封存当前分段，之后的写入进入新分段"""
+        if self.active is not None:
+            self.active.close()
+            self.active = None
+        self.active_seq += 1
+
+    def query(self, sku=None, name=None, since=None, until=None, limit=10, resolution='raw'):
+        """按SKU、名称、时间范围和粒度查询历史"""
+        if not self.price_history:
+            self.load()
+        return filter_history(self.price_history, sku, name, since, until, limit, resolution)
+
+    def maybe_compact(self):
+        """封存分段过多时压缩"""
+        sealed = [s for s in self._segments() if s[0] < self.active_seq]
+        if len(sealed) >= self.compact_segments:
+            self.compact()
+
+    def compact(self):
+        """把内存中保留的历史写成快照分段，并删除之前的分段"""
+        self._rotate()
+        snapshot_seq = self.active_seq
+        self._write_snapshot(snapshot_seq, self.price_history)
+        self.active_seq += 1
+        for seq, path in self._segments():
+            if seq < snapshot_seq:
+                os.remove(path)
+
+    def close(self):
+        if self.active is not None:
+            self.active.close()
+            self.active = None
+
+class SQLiteHistoryStore:
+    """
+    SQLite 时间序列存储
+    prices 表以 (sku, ts) 为主键（WITHOUT ROWID，数据按主键聚簇存放），
+    单个商品的时间范围查询直接走索引；WAL 模式下查询不会阻塞监控写入。
+    原始样本保留 raw_retention 秒，rollups 表按 ROLLUPS 保存各粒度汇总，
+    写入样本时在同一事务中用 UPSERT 增量更新所在的汇总桶。
+    内存中每个商品只保留最近 max_history 条原始样本。
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS products (
+            sku  TEXT PRIMARY KEY,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS prices (
+            sku   TEXT    NOT NULL,
+            ts    INTEGER NOT NULL,
+            price REAL    NOT NULL,
+            PRIMARY KEY (sku, ts)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS rollups (
+            sku        TEXT    NOT NULL,
+            resolution TEXT    NOT NULL,
+            bucket     INTEGER NOT NULL,
+            min        REAL    NOT NULL,
+            max        REAL    NOT NULL,
+            sum        REAL    NOT NULL,
+            count      INTEGER NOT NULL,
+            last       REAL    NOT NULL,
+            PRIMARY KEY (sku, resolution, bucket)
+        ) WITHOUT ROWID;
+    """
+
+    UPSERT_ROLLUP = """
+        INSERT INTO rollups (sku, resolution, bucket, min, max, sum, count, last)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(sku, resolution, bucket) DO UPDATE SET
+            min = min(rollups.min, excluded.min),
+            max = max(rollups.max, excluded.max),
+            sum = rollups.sum + excluded.sum,
+            count = rollups.count + excluded.count,
+            last = excluded.last
+    """
+
+    # 两次清理过期数据的最小间隔（秒）
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, path=HISTORY_DB, max_history=100, legacy_file=HISTORY_FILE,
+                 raw_retention=RAW_RETENTION):
+        self.path = path
+        self.max_history = max_history
+        self.legacy_file = legacy_file
+        self.raw_retention = raw_retention
+        self.last_prune = 0
+        self.price_history = {}
+        is_new = not os.path.exists(path)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        # 写入前用于去重的本批样本（仅本连接可见）
+        self.db.execute("CREATE TEMP TABLE incoming (sku TEXT, ts INTEGER, price REAL)")
+        if is_new and legacy_file and os.path.exists(legacy_file):
+            try:
+                with open(legacy_file, 'r') as f:
+                    self.import_history(json.load(f))
+                print(f"✅ 已将 {legacy_file} 迁移到 {path}")
+            except ValueError as e:
+                print(f"⚠️ 旧版历史文件无法解析，跳过迁移: {e}")
+
+    def load(self):
+        """加载每个商品最近 max_history 条记录到内存"""
+        self.price_history = {}
+        for sku, name in self.db.execute("SELECT sku, name FROM products"):
+            rows = self.db.execute(
+                "SELECT ts, price FROM prices WHERE sku = ? ORDER BY ts DESC LIMIT ?",
+                (sku, self.max_history or -1)).fetchall()
+            entry = new_entry(name, self.max_history, rollups=False)
+            for ts, price in reversed(rows):
+                entry['history'].append(ts, price)
+            entry['current'] = rows[0][1] if rows else None
+            self.price_history[sku] = entry
+        return self.price_history
+
+    def append(self, records):
+        """
+        在一个事务中批量写入本周期的观测值
+        同一 (SKU, 时间) 只保留第一次写入的样本（重复写入不会重复计入汇总），
+        商品名取该SKU时间最新的样本的名称
+
+        Args:
+            records: [(SKU_ID, 商品名, 时间, 价格)]
+
+        Returns:
+            数据库文件（含 WAL）增长的字节数；WAL 检查点后文件被复用时偏小
+        """
+        samples = {}
+        names = {}
+        for sku, name, ts, price in records:
+            try:
+                epoch = to_epoch(ts)
+            except (TypeError, ValueError):
+                continue  # 旧数据中无法解析的时间
+            sku = str(sku)
+            samples.setdefault((sku, epoch), price)
+            if sku not in names or epoch >= names[sku][0]:
+                names[sku] = (epoch, name)
+        if not samples:
+            return 0
+        before = self._file_bytes()
+
+        with self.db:
+            rows = self._new_samples(samples)
+            # 导入比已有数据更早的样本时不覆盖商品名
+            self.db.executemany(
+                "INSERT INTO products (sku, name) VALUES (?, ?) "
+                "ON CONFLICT(sku) DO UPDATE SET name = excluded.name "
+                "WHERE ? >= COALESCE((SELECT max(ts) FROM prices WHERE sku = excluded.sku), 0)",
+                [(sku, name, epoch) for sku, (epoch, name) in names.items()])
+            self.db.executemany("INSERT INTO prices (sku, ts, price) VALUES (?, ?, ?)", rows)
+            self.db.executemany(self.UPSERT_ROLLUP, self._rollup_rows(rows))
+        return max(0, self._file_bytes() - before)
+
+    def _new_samples(self, samples):
+        """
+        去掉数据库中已有的样本（本批先写入临时表，再按主键与 prices 比对）
+
+        Args:
+            samples: {(SKU_ID, 时间戳): 价格}
+
+        Returns:
+            [(SKU_ID, 时间戳, 价格)]
+        """
+        self.db.execute("DELETE FROM incoming")
+        self.db.executemany("INSERT INTO incoming (sku, ts, price) VALUES (?, ?, ?)",
+                            [key + (price,) for key, price in samples.items()])
+        return self.db.execute(
+            "SELECT sku, ts, price FROM incoming WHERE NOT EXISTS "
+            "(SELECT 1 FROM prices WHERE prices.sku = incoming.sku AND prices.ts = incoming.ts)"
+        ).fetchall()
+
+    @staticmethod
+    def _rollup_rows(rows):
+        """在内存中按 (SKU, 粒度, 桶) 合并样本，每个桶只 UPSERT 一次"""
+        buckets = {}
+        for sku, ts, price in sorted(rows, key=lambda r: r[1]):
+            for res, (width, _) in ROLLUPS.items():
+                key = (sku, res, bucket_start(ts, width))
+                b = buckets.get(key)
+                if b is None:
+                    buckets[key] = [price, price, price, 1, price]
+                else:
+                    b[0] = min(b[0], price)
+                    b[1] = max(b[1], price)
+                    b[2] += price
+                    b[3] += 1
+                    b[4] = price
+        return [k + tuple(v) for k, v in buckets.items()]
+
+    def _file_bytes(self):
+        total = 0
+        for path in (self.path, self.path + "-wal"):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def replace_rollups(self, sku, resolution, rows):
+        """用给定的汇总桶覆盖已有数据（迁移时使用）"""
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO rollups (sku, resolution, bucket, min, max, sum, count, last) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(sku, resolution) + tuple(row) for row in rows])
+
+    def load_rollups(self):
+        """把数据库中的汇总加载到内存历史（迁移时使用）"""
+        for sku, entry in self.price_history.items():
+            entry['rollups'] = new_rollups()
+            for res, rollup in entry['rollups'].items():
+                for row in self.db.execute(
+                        "SELECT bucket, min, max, sum, count, last FROM rollups "
+                        "WHERE sku = ? AND resolution = ? ORDER BY bucket", (sku, res)):
+                    rollup.merge(*row)
+
+    def import_history(self, legacy):
+        """导入旧版 JSON 格式 {SKU_ID: {'name', 'history': [...]}} 的历史数据"""
+        self.append([(sku, d.get('name', sku), r.get('time'), r.get('price'))
+                     for sku, d in legacy.items() for r in d.get('history', [])])
+
+    def query(self, sku=None, name=None, since=None, until=None, limit=10, resolution='raw'):
+        """按SKU、名称、时间范围和粒度查询历史，条件下推到主键索引"""
+        if resolution == 'raw':
+            table, col, columns, key = "prices", "ts", "ts, price", "sku = ?"
+        else:
+            table, col, columns, key = ("rollups", "bucket", "bucket, min, max, sum, count, last",
+                                        "sku = ? AND resolution = ?")
+        cond, params = [], []
+        if since:
+            cond.append(f"{col} >= ?")
+            params.append(to_epoch(since))
+        if until:
+            cond.append(f"{col} <= ?")
+            params.append(to_epoch(until))
+        where = "".join(f" AND {c}" for c in cond)
+
+        if sku:
+            products = self.db.execute("SELECT sku, name FROM products WHERE sku = ?", (sku,)).fetchall()
+        elif name:
+            products = self.db.execute("SELECT sku, name FROM products WHERE name = ?", (name,)).fetchall()
+        else:
+            products = self.db.execute("SELECT sku, name FROM products ORDER BY sku").fetchall()
+
+        results = []
+        for pid, pname in products:
+            keys = [pid] if resolution == 'raw' else [pid, resolution]
+            total = self.db.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE {key}{where}", keys + params).fetchone()[0]
+            rows = self.db.execute(
+                f"SELECT {columns} FROM {table} WHERE {key}{where} ORDER BY {col} DESC LIMIT ?",
+                keys + params + [limit if limit else -1]).fetchall()
+            if resolution == 'raw':
+                history = [{'time': from_epoch(ts), 'price': p} for ts, p in reversed(rows)]
+            else:
+                history = [rollup_record(*row) for row in reversed(rows)]
+            results.append({'sku': pid, 'name': pname, 'total': total, 'history': history})
+        return results
+
+    def maybe_compact(self):
+        """定期删除超出保留期的原始样本和汇总桶（按SKU走主键范围删除）"""
+        now = int(time.time())
+        if now - self.last_prune < self.PRUNE_INTERVAL:
+            return
+        self.last_prune = now
+        skus = [row[0] for row in self.db.execute("SELECT sku FROM products")]
+        with self.db:
+            self.db.executemany("DELETE FROM prices WHERE sku = ? AND ts < ?",
+                                [(sku, now - self.raw_retention) for sku in skus])
+            for res, (width, keep) in ROLLUPS.items():
+                self.db.executemany(
+                    "DELETE FROM rollups WHERE sku = ? AND resolution = ? AND bucket < ?",
+                    [(sku, res, now - keep * width) for sku in skus])
+
+    def close(self):
+        self.db.close()
+
+BACKENDS = {
+    'jsonl': JSONLHistoryStore,
+    'json': JSONHistoryStore,
+    'sqlite': SQLiteHistoryStore,
+}
+
+# 各后端的默认数据文件名
+BACKEND_PATHS = {
+    'jsonl': HISTORY_DIR,
+    'json': HISTORY_FILE,
+    'sqlite': HISTORY_DB,
+}
+
+def open_history_store(backend='jsonl', max_history=100, root=None, legacy=True):
+    """
+    按名称创建历史存储后端
+    root 指定时数据文件放在该目录下（分片模式），且不迁移当前目录的旧版历史文件；
+    legacy 为 False 时新建的存储不自动导入旧版 JSON 历史文件
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的历史存储后端: {backend}（可选: {', '.join(BACKENDS)}）")
+    options = {'max_history': max_history}
+    if root is not None:
+        os.makedirs(root, exist_ok=True)
+        options['path'] = os.path.join(root, BACKEND_PATHS[backend])
+        if backend != 'json':
+            options['legacy_file'] = os.path.join(root, HISTORY_FILE)
+    if backend != 'json' and not legacy:
+        options['legacy_file'] = None
+    return BACKENDS[backend](**options)
+
+def migrate_history(source, target):
+    """
+    把 source 后端的全部历史导入 target 后端
+
+    Returns:
+        导入的记录数
+    """
+    src = open_history_store(source, max_history=None)
+    src_history = src.load()
+    if isinstance(src, SQLiteHistoryStore):
+        src.load_rollups()
+    records = list(iter_records(src_history))
+    src.close()
+
+    # 源数据已包含旧版 JSON 历史（或就是它），目标不再自动导入，避免样本重复
+    dst = open_history_store(target, max_history=None, legacy=False)
+    price_history = dst.load()
+    for sku, name, ts, price in records:
+        entry = price_history.get(sku)
+        if entry is None:
+            entry = price_history[sku] = new_entry(name, None)
+        entry['history'].append(to_epoch(ts), price)
+        entry['current'] = price
+    dst.append(records)
+
+    # 原始样本可能已过保留期，汇总直接复制源数据
+    for sku, src_entry in src_history.items():
+        for res, rollup in (src_entry['rollups'] or {}).items():
+            if isinstance(dst, SQLiteHistoryStore):
+                dst.replace_rollups(sku, res, list(rollup))
+            else:
+                dst_rollup = RollupSeries(rollup.width, rollup.retention)
+                for row in rollup:
+                    dst_rollup.merge(*row)
+                entry = price_history.get(sku)
+                if entry is None:
+                    entry = price_history[sku] = new_entry(src_entry['name'], None)
+                entry['rollups'][res] = dst_rollup
+    if isinstance(dst, JSONLHistoryStore):
+        dst.compact()
+    elif isinstance(dst, JSONHistoryStore):
+        dst.append([])
+    dst.close()
+    return len(records)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+价格监控的运行指标
+提供 Prometheus 文本格式的计数器/仪表/直方图、本地 /metrics 服务、
+textfile collector 输出，以及按周期采集的 cProfile/tracemalloc 剖析
+"""
+
+import os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 耗时直方图的默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+def _format_labels(key, extra=None):
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"' for k, v in items)
+    return "{" + body + "}"
+
+class Metrics:
+    """
+    指标注册表（线程安全）
+    同名指标按标签区分，render() 输出 Prometheus 文本格式
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}
+        self.types = {}
+        self.values = {}      # name -> {labels_key: value}
+        self.histograms = {}  # name -> {labels_key: [bucket_counts, sum, count]}
+        self.buckets = {}
+
+    def _declare(self, name, kind, help_text):
+        if name not in self.types:
+            self.types[name] = kind
+            self.help[name] = help_text
+
+    def inc(self, name, value=1, help_text="", **labels):
+        """计数器累加"""
+        with self.lock:
+            self._declare(name, 'counter', help_text)
+            series = self.values.setdefault(name, {})
+            key = _labels_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, help_text="", **labels):
+        """设置仪表值"""
+        with self.lock:
+            self._declare(name, 'gauge', help_text)
+            self.values.setdefault(name, {})[_labels_key(labels)] = value
+
+    def observe(self, name, value, help_text="", buckets=DEFAULT_BUCKETS, **labels):
+        """直方图记录一个观测值"""
+        with self.lock:
+            self._declare(name, 'histogram', help_text)
+            self.buckets.setdefault(name, buckets)
+            series = self.histograms.setdefault(name, {})
+            key = _labels_key(labels)
+            h = series.get(key)
+            if h is None:
+                h = series[key] = [[0] * len(self.buckets[name]), 0.0, 0]
+            for i, bound in enumerate(self.buckets[name]):
+                if value <= bound:
+                    h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    def timer(self, name, help_text="", **labels):
+        """用 with 语句记录一段代码的耗时"""
+        return _Timer(self, name, help_text, labels)
+
+    def get(self, name, **labels):
+        """读取计数器或仪表的当前值"""
+        with self.lock:
+            return self.values.get(name, {}).get(_labels_key(labels), 0)
+
+    def render(self):
+        """输出 Prometheus 文本格式"""
+        lines = []
+        with self.lock:
+            for name in sorted(self.types):
+                kind = self.types[name]
+                if self.help[name]:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == 'histogram':
+                    for key, (counts, total, count) in sorted(self.histograms[name].items()):
+                        for bound, c in zip(self.buckets[name], counts):
+                            lines.append(f"{name}_bucket{_format_labels(key, {'le': bound})} {c}")
+                        lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {count}")
+                        lines.append(f"{name}_sum{_format_labels(key)} {total}")
+                        lines.append(f"{name}_count{_format_labels(key)} {count}")
+                else:
+                    for key, value in sorted(self.values[name].items()):
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+class _Timer:
+    def __init__(self, metrics, name, help_text, labels):
+        self.metrics = metrics
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.metrics.observe(self.name, self.elapsed, self.help_text, **self.labels)
+        return False
+
+# 全局指标注册表
+METRICS = Metrics()
+
+# ============ 输出 ============
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """在后台线程启动 /metrics 服务，默认只监听本机"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def write_textfile(path):
+    """写入 node_exporter textfile collector 格式文件（原子替换）"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(METRICS.render())
+    os.replace(tmp, path)
+
+# ============ 剖析 ============
+
+class CycleProfiler:
+    """
+    采集前 cycles 个检查周期的 cProfile 和 tracemalloc 数据
+    结束后写入 <prefix>.prof（可用 python3 -m pstats 查看），
+    并打印耗时最多的函数和内存分配最多的代码行
+    """
+    def __init__(self, cycles, prefix=None, top=15):
+        import cProfile, tracemalloc
+        self.cycles = cycles
+        self.prefix = prefix or time.strftime("profile-%Y%m%d-%H%M%S")
+        self.top = top
+        self.done = 0
+        self.tracemalloc = tracemalloc
+        self.profiler = cProfile.Profile()
+        tracemalloc.start(10)
+        self.profiler.enable()
+
+    @property
+    def active(self):
+        return self.done < self.cycles
+
+    def cycle_done(self):
+        """每个周期结束时调用，达到周期数后停止采集并输出报告"""
+        if not self.active:
+            return
+        self.done += 1
+        if self.done < self.cycles:
+            return
+        import io, pstats
+        self.profiler.disable()
+        snapshot = self.tracemalloc.take_snapshot()
+        current, peak = self.tracemalloc.get_traced_memory()
+        self.tracemalloc.stop()
+
+        prof_file = f"{self.prefix}.prof"
+        self.profiler.dump_stats(prof_file)
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+
+        print("\n" + "=" * 60)
+        print(f"🔬 剖析结果（{self.cycles} 个周期）: {prof_file}")
+        print("=" * 60)
+        print(out.getvalue())
+        print(f"🧠 内存: 当前 {current / 1024 / 1024:.1f}MB, 峰值 {peak / 1024 / 1024:.1f}MB")
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            print(f"  {stat}")
+        with open(f"{self.prefix}.tracemalloc.txt", 'w') as f:
+            for stat in snapshot.statistics('traceback')[:self.top * 2]:
+                f.write(f"{stat}\n")
+                for line in stat.traceback.format():
+                    f.write(f"  {line}\n")
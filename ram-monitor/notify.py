@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+飞书价格通知
+价格变化和提醒先放入有界队列，由后台线程按群聊合并：每个群聊从收到第一条消息起等待
+window 秒，期间的所有变化合并为一条汇总消息（同一商品多次变化只保留首尾价格）。
+发送失败时按指数退避重试（令牌失效时先刷新令牌）；队列已满时丢弃新消息，监控循环永远不会因为通知而阻塞。
+
+飞书接口和鉴权复用 skills/feishu-task/feishu_task.py，应用凭证读取自 ~/.openclaw/openclaw.json。
+"""
+
+import os, queue, random, sys, threading, time
+
+from metrics import METRICS
+
+# feishu-task 技能目录（可用环境变量 FEISHU_TASK_DIR 覆盖）
+FEISHU_TASK_DIR = os.environ.get(
+    'FEISHU_TASK_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'skills', 'feishu-task'))
+
+# 合并窗口（秒）
+NOTIFY_WINDOW = 60
+# 队列容量，超过后丢弃新消息
+NOTIFY_QUEUE_SIZE = 10000
+# 每条汇总消息最多列出的行数
+NOTIFY_MAX_LINES = 50
+# 发送失败的最大重试次数
+NOTIFY_RETRIES = 5
+# 退避的初始和最长等待（秒）
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# 可重试的飞书错误码：频率限制
+RETRY_CODES = {99991400, 230020}
+
+def load_feishu():
+    """导入 feishu-task 技能的飞书接口"""
+    path = os.path.abspath(FEISHU_TASK_DIR)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    import feishu_task
+    return feishu_task
+
+class Notifier:
+    """
+    飞书通知发送器
+
+    用法:
+        notifier = Notifier(chat_id, chats={'张三': 'oc_xxx'})
+        notifier.notify_changes(changes)   # 不阻塞
+        notifier.notify_alerts(alerts)
+        notifier.close()                   # 发送剩余消息后退出
+    """
+    def __init__(self, chat_id, chats=None, window=NOTIFY_WINDOW, queue_size=NOTIFY_QUEUE_SIZE,
+                 retries=NOTIFY_RETRIES, max_lines=NOTIFY_MAX_LINES, feishu=None):
+        self.chat_id = chat_id
+        self.chats = chats or {}
+        self.window = window
+        self.retries = retries
+        self.max_lines = max_lines
+        self.feishu = feishu or load_feishu()
+        self.queue = queue.Queue(queue_size)
+        self.pending = {}        # 群聊ID -> (第一条消息的时间, {键: 消息})
+        self.token = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name='notifier', daemon=True)
+        self.thread.start()
+
+    # ============ 提交（监控线程） ============
+
+    def _put(self, chat_id, key, item):
+        if not chat_id:
+            return
+        try:
+            self.queue.put_nowait((chat_id, key, item))
+        except queue.Full:
+            self.dropped += 1
+            METRICS.inc('ram_monitor_notify_dropped_total', help_text="队列已满被丢弃的通知数")
+
+    def notify_changes(self, changes):
+        """提交本周期的价格变化 [(SKU_ID, 商品名, 原价, 现价, 变化百分比)]"""
+        for sku, name, old, new, _ in changes:
+            self._put(self.chat_id, ('change', str(sku)), (name, old, new))
+
+    def notify_alerts(self, alerts):
+        """提交触发的提醒，有订阅者且配置了对应群聊时发往该群聊"""
+        for alert in alerts:
+            chat_id = self.chats.get(alert.get('subscriber'), self.chat_id)
+            self._put(chat_id, ('alert', alert['sku'], alert['rule'].id), alert['message'])
+
+    def send_now(self, text):
+        """同步发送一条消息（用于测试配置），返回 (是否成功, 错误信息)"""
+        result = self._send(self.chat_id, text)
+        return result.get('success'), result.get('error')
+
+    # ============ 合并与发送（后台线程） ============
+
+    def _merge(self, chat_id, key, item):
+        if chat_id is None:
+            return  # close() 的唤醒标记
+        first, items = self.pending.setdefault(chat_id, (time.monotonic(), {}))
+        if key[0] == 'change' and key in items:
+            # 同一商品在窗口内多次变化：保留最早的原价和最新的现价
+            item = (item[0], items[key][1], item[2])
+        items[key] = item
+
+    def _run(self):
+        while True:
+            if self.pending:
+                deadline = min(first for first, _ in self.pending.values()) + self.window
+                timeout = max(0, deadline - time.monotonic())
+            else:
+                timeout = None
+            try:
+                self._merge(*self.queue.get(timeout=timeout))
+                # 一次取完已在队列中的消息，减少唤醒次数
+                while True:
+                    self._merge(*self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            METRICS.set('ram_monitor_notify_queue_depth', self.queue.qsize(), "通知队列中等待合并的消息数")
+            now = time.monotonic()
+            for chat_id in [c for c, (first, _) in self.pending.items()
+                            if self.stopping or now - first >= self.window]:
+                _, items = self.pending.pop(chat_id)
+                self._deliver(chat_id, self.digest(items))
+            if self.stopping and self.queue.empty() and not self.pending:
+                return
+
+    def digest(self, items):
+        """把一个窗口内的消息合并为一条文本"""
+        alerts = [msg for key, msg in items.items() if key[0] == 'alert']
+        changes = [msg for key, msg in items.items() if key[0] == 'change']
+        lines = []
+        if alerts:
+            lines.append(f"🔔 价格提醒 ({len(alerts)} 条)")
+            lines.extend(alerts)
+        if changes:
+            if lines:
+                lines.append("")
+            drops = sum(1 for _, old, new in changes if new < old)
+            lines.append(f"📊 价格变化 ({len(changes)} 个商品，📉 {drops} / 📈 {len(changes) - drops})")
+            # 变化幅度大的排在前面
+            changes.sort(key=lambda c: -(abs(c[2] - c[1]) / c[1] if c[1] else 0))
+            for name, old, new in changes:
+                pct = (new - old) / old * 100 if old else 0
+                sign = "📈" if new > old else "📉"
+                lines.append(f"{sign} {name}: ¥{old:.2f} → ¥{new:.2f} ({pct:+.2f}%)")
+        if len(lines) > self.max_lines:
+            lines = lines[:self.max_lines] + [f"……还有 {len(lines) - self.max_lines} 条"]
+        return "\n".join(lines)
+
+    def _get_token(self, refresh=False):
+        """访问令牌由 feishu_task 缓存在磁盘上，与 /task 命令共用"""
+        config = self.feishu.load_config()
+        if not config.get('appId') or not config.get('appSecret'):
+            raise LookupError("未配置飞书应用")
+        if refresh and self.token:
+            self.feishu.invalidate_token(config['appId'], self.token)
+        self.token = self.feishu.get_token(config['appId'], config['appSecret'])
+        return self.token
+
+    def _send(self, chat_id, text, refresh=False):
+        try:
+            token = self._get_token(refresh)
+        except LookupError as e:
+            return {"success": False, "error": str(e), "fatal": True}
+        except Exception as e:
+            return {"success": False, "error": f"获取访问令牌失败: {e}"}
+        return self.feishu.send_message(token, chat_id, text)
+
+    def _deliver(self, chat_id, text):
+        """发送一条汇总消息，可重试的错误按指数退避（带随机抖动）重试"""
+        refresh = False
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            result = self._send(chat_id, text, refresh)
+            METRICS.observe('ram_monitor_notify_seconds', time.perf_counter() - start, "通知发送耗时")
+            if result.get('success'):
+                self.sent += 1
+                METRICS.inc('ram_monitor_notify_total', help_text="通知发送结果", result='success')
+                return True
+            code, status = result.get('code'), result.get('status')
+            refresh = code in self.feishu.INVALID_TOKEN_CODES
+            retryable = not result.get('fatal') and (
+                refresh or code in RETRY_CODES or status == 429 or (status or 0) >= 500
+                or (code is None and status is None))
+            # 退出时不再等待重试
+            if not retryable or attempt == self.retries or self.stopping:
+                break
+            METRICS.inc('ram_monitor_notify_total', help_text="通知发送结果", result='retry')
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+            time.sleep(0 if refresh and attempt == 0 else random.uniform(delay / 2, delay))
+        self.failed += 1
+        METRICS.inc('ram_monitor_notify_total', help_text="通知发送结果", result='failure')
+        print(f"⚠️ 飞书通知发送失败 ({chat_id}): {result.get('error')}")
+        return False
+
+    def close(self, timeout=30):
+        """立即发送所有未发送的消息并停止后台线程"""
+        self.stopping = True
+        try:
+            # 唤醒等待中的后台线程
+            self.queue.put_nowait((None, None, None))
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+
+    def summary(self):
+        return f"📨 飞书通知: 已发送 {self.sent}，失败 {self.failed}，丢弃 {self.dropped}"
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+价格观测缓存
+最近获取的价格保存在 price_cache.db（SQLite, WAL 模式），同一目录下的多个 ram_monitor.py
+进程（如运行中的 monitor 和临时执行的 check）共用；条目超过 ttl 秒视为过期，
+数量超过 max_entries 时按最近访问时间淘汰（LRU）。
+InFlight 合并同一进程内对同一SKU的并发请求。
+"""
+
+import os, sqlite3, threading, time
+
+CACHE_FILE = "price_cache.db"
+# 缓存的默认有效期（秒）
+CACHE_TTL = 60
+# 缓存的最大条目数
+CACHE_SIZE = 100000
+
+class PriceCache:
+    """
+    磁盘价格缓存（线程安全，可多进程共用）
+    hits / misses 为本进程的命中统计，累计统计保存在数据库的 stats 表中
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache (
+            sku      TEXT PRIMARY KEY,
+            price    REAL NOT NULL,
+            fetched  REAL NOT NULL,
+            accessed REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+        CREATE TABLE IF NOT EXISTS stats (
+            key   TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+    # 单条 SQL 中的参数个数上限
+    BATCH = 500
+
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, max_entries=CACHE_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+
+    def get_many(self, sku_ids, max_age=None):
+        """
+        查询未过期的缓存价格
+
+        Args:
+            max_age: 可接受的最大缓存时长（秒），默认为 ttl
+
+        Returns:
+            {SKU_ID: (价格, 获取时间戳)}
+        """
+        max_age = self.ttl if max_age is None else max_age
+        sku_ids = list(sku_ids)
+        if max_age <= 0 or not sku_ids:
+            return {}
+        now = time.time()
+        found = {}
+        with self.lock:
+            for i in range(0, len(sku_ids), self.BATCH):
+                batch = sku_ids[i:i + self.BATCH]
+                marks = ",".join("?" * len(batch))
+                for sku, price, fetched in self.db.execute(
+                        f"SELECT sku, price, fetched FROM cache WHERE sku IN ({marks}) AND fetched >= ?",
+                        batch + [now - max_age]):
+                    found[sku] = (price, fetched)
+            hits, misses = len(found), len(sku_ids) - len(found)
+            self.hits += hits
+            self.misses += misses
+            with self.db:
+                self.db.executemany("UPDATE cache SET accessed = ? WHERE sku = ?",
+                                    [(now, sku) for sku in found])
+                self._count('hits', hits)
+                self._count('misses', misses)
+        return found
+
+    def put_many(self, prices, fetched=None):
+        """写入新获取的价格（None 不缓存），超出容量时淘汰最久未访问的条目"""
+        now = time.time()
+        fetched = fetched or now
+        rows = [(sku, price, fetched, now) for sku, price in prices.items() if price]
+        if not rows:
+            return
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT INTO cache (sku, price, fetched, accessed) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(sku) DO UPDATE SET price = excluded.price, fetched = excluded.fetched, "
+                "accessed = excluded.accessed", rows)
+            excess = self.db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.db.execute(
+                    "DELETE FROM cache WHERE sku IN "
+                    "(SELECT sku FROM cache ORDER BY accessed LIMIT ?)", (excess,))
+
+    def _count(self, key, n):
+        if n:
+            self.db.execute(
+                "INSERT INTO stats (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value", (key, n))
+
+    def summary(self):
+        """累计统计: {'entries', 'fresh', 'hits', 'misses', 'bytes'}"""
+        with self.lock:
+            entries, fresh = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(fetched >= ?), 0) FROM cache",
+                (time.time() - self.ttl,)).fetchone()
+            stats = dict(self.db.execute("SELECT key, value FROM stats"))
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        return {'entries': entries, 'fresh': fresh, 'hits': stats.get('hits', 0),
+                'misses': stats.get('misses', 0), 'bytes': size}
+
+    def clear(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM cache")
+            self.db.execute("DELETE FROM stats")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class _Slot:
+    __slots__ = ('event', 'price')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.price = None
+
+class InFlight:
+    """
+    合并并发请求
+    同一SKU同一时刻只由一个线程请求，其他线程等待该请求的结果
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def claim(self, sku_ids):
+        """
+        Returns:
+            (owned, waiting)
+            owned: 由调用方负责请求的SKU列表
+            waiting: {SKU_ID: slot}，已有其他线程在请求，用 wait() 取结果
+        """
+        owned, waiting = [], {}
+        with self.lock:
+            for sku in sku_ids:
+                slot = self.pending.get(sku)
+                if slot is None:
+                    self.pending[sku] = _Slot()
+                    owned.append(sku)
+                else:
+                    waiting[sku] = slot
+        return owned, waiting
+
+    def resolve(self, owned, prices):
+        """发布请求结果并唤醒等待的线程（请求失败时也必须调用）"""
+        with self.lock:
+            slots = [(self.pending.pop(sku), prices.get(sku)) for sku in owned]
+        for slot, price in slots:
+            slot.price = price
+            slot.event.set()
+
+    @staticmethod
+    def wait(waiting):
+        """等待其他线程的请求结果，返回 {SKU_ID: 价格}"""
+        result = {}
+        for sku, slot in waiting.items():
+            slot.event.wait()
+            result[sku] = slot.price
+        return result
@@ -4,11 +4,23 @@
 监控京东商城内存条价格，支持定时检查和降价提醒
 """
 
-import json, time, os, sys
+import json, math, time, os, sys, threading, gzip, itertools, heapq, random, subprocess
+import http.client
 import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from urllib.parse import urlparse
 
+from history_store import (BACKENDS, ROLLUPS, TIME_FORMAT, open_history_store, migrate_history,
+                           new_entry, record_sample, history_memory)
+from metrics import METRICS, CycleProfiler, start_metrics_server, write_textfile
+from alerts import AlertEngine, parse_rule
+from price_cache import CACHE_FILE, CACHE_SIZE, CACHE_TTL, InFlight, PriceCache
+from notify import NOTIFY_WINDOW, Notifier
+from sharding import (SHARD_ROOT, HashRing, ShardBusy, ShardMember, live_members, shard_names,
+                      merged_history, latest_prices)
+
 # ============ 配置 ============
 CONFIG_FILE = "config.json"
 
@@ -37,6 +49,421 @@ def save_config(config):
     with open(CONFIG_FILE, 'w') as f:
         json.dump(config, f, ensure_ascii=False, indent=2)
 
+# 京东价格接口
+JD_MGETS_URL = "https://p.3.cn/prices/mgets"
+JD_BACKUP_URL = "https://api.m.jd.com/"
+JD_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# 每个 mgets 请求合并的SKU数量
+MGETS_BATCH_SIZE = 100
+
+# 并发抓取的默认线程数
+DEFAULT_WORKERS = 8
+
+# 每个域名保持的长连接数上限
+DEFAULT_POOL_SIZE = 8
+
+# 空闲超过该时长（秒）的连接不再复用，避免使用已被服务端关闭的连接
+POOL_IDLE_TIMEOUT = 60
+
+# 每个域名的限速（请求数/秒），可在 config.json 的 rate_limits 中覆盖
+HOST_RATE_LIMITS = {
+    "p.3.cn": 10.0,
+    "api.m.jd.com": 5.0,
+}
+
+class TokenBucket:
+    """
+    令牌桶限速器（线程安全）
+    以 rate 个/秒的速度补充令牌，最多积累 capacity 个
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """取走一个令牌，不足时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def set_rate_limits(limits):
+    """设置各域名的限速 {域名: 请求数/秒}"""
+    with _rate_limiters_lock:
+        for host, rate in limits.items():
+            HOST_RATE_LIMITS[host] = float(rate)
+            _rate_limiters.pop(host, None)
+
+def get_rate_limiter(host):
+    """获取域名对应的令牌桶，未配置限速的域名返回 None"""
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            rate = HOST_RATE_LIMITS.get(host)
+            _rate_limiters[host] = TokenBucket(rate) if rate else None
+        return _rate_limiters[host]
+
+class HTTPStatusError(Exception):
+    """HTTP 响应状态码异常"""
+    def __init__(self, status, reason=""):
+        super().__init__(f"HTTP {status} {reason}".strip())
+        self.status = status
+
+class PooledConnection:
+    """连接池中的一个长连接"""
+    _ids = itertools.count(1)
+    
+    def __init__(self, conn, host):
+        self.conn = conn
+        self.host = host
+        self.id = next(PooledConnection._ids)
+        self.uses = 0
+        self.last_used = time.monotonic()
+
+class HTTPPool:
+    """
+    基于 http.client 的 keep-alive 连接池（线程安全）
+    每个域名最多保持 size 个连接，在不同SKU和检查周期之间复用；
+    复用的连接失效时自动重连，响应支持 gzip 压缩
+    """
+    # 复用连接时这些异常说明连接已被服务端关闭，可以换新连接重试
+    STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                    ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+    
+    def __init__(self, size=DEFAULT_POOL_SIZE, idle_timeout=POOL_IDLE_TIMEOUT):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle = {}       # (scheme, host, port) -> [PooledConnection]
+        self.slots = {}      # (scheme, host, port) -> Semaphore
+        self.connections = {}  # id -> PooledConnection，用于统计
+        self.reconnects = 0
+    
+    def _new_connection(self, scheme, host, port, timeout):
+        proxy = urllib.request.getproxies().get(scheme)
+        if proxy:
+            p = urlparse(proxy)
+            conn_cls = http.client.HTTPSConnection if p.scheme == 'https' else http.client.HTTPConnection
+            conn = conn_cls(p.hostname, p.port, timeout=timeout)
+            conn.set_tunnel(host, port)
+        elif scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        pooled = PooledConnection(conn, host)
+        with self.lock:
+            self.connections[pooled.id] = pooled
+        return pooled
+    
+    def _discard(self, pooled):
+        pooled.conn.close()
+        with self.lock:
+            self.connections.pop(pooled.id, None)
+    
+    def _checkout(self, key, timeout):
+        """取出一个空闲连接，没有则新建"""
+        now = time.monotonic()
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            while idle:
+                pooled = idle.pop()
+                if now - pooled.last_used < self.idle_timeout:
+                    break
+                self.connections.pop(pooled.id, None)
+                pooled.conn.close()
+            else:
+                pooled = None
+        if pooled is None:
+            pooled = self._new_connection(*key, timeout)
+        elif pooled.conn.sock is not None:
+            pooled.conn.sock.settimeout(timeout)
+        pooled.conn.timeout = timeout
+        return pooled
+    
+    def _checkin(self, key, pooled):
+        pooled.last_used = time.monotonic()
+        with self.lock:
+            self.idle.setdefault(key, []).append(pooled)
+    
+    def request(self, url, headers=None, timeout=10):
+        """发送GET请求，返回响应内容 (bytes)"""
+        u = urlparse(url)
+        scheme = u.scheme or 'https'
+        port = u.port or (443 if scheme == 'https' else 80)
+        key = (scheme, u.hostname, port)
+        path = u.path or '/'
+        if u.query:
+            path += '?' + u.query
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip')
+        
+        with self.lock:
+            slot = self.slots.setdefault(key, threading.BoundedSemaphore(self.size))
+        with slot:
+            pooled = self._checkout(key, timeout)
+            try:
+                try:
+                    resp = self._send(pooled, path, headers)
+                except self.STALE_ERRORS:
+                    if pooled.uses == 0:
+                        raise
+                    # 复用的连接已失效，换新连接重试一次
+                    self._discard(pooled)
+                    with self.lock:
+                        self.reconnects += 1
+                    pooled = self._new_connection(*key, timeout)
+                    resp = self._send(pooled, path, headers)
+                body = resp.read()
+            except Exception:
+                self._discard(pooled)
+                raise
+            
+            pooled.uses += 1
+            if resp.will_close:
+                self._discard(pooled)
+            else:
+                self._checkin(key, pooled)
+        
+        if resp.getheader('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        if resp.status >= 400:
+            raise HTTPStatusError(resp.status, resp.reason)
+        return body
+    
+    def _send(self, pooled, path, headers):
+        pooled.conn.request('GET', path, headers=headers)
+        return pooled.conn.getresponse()
+    
+    def stats(self):
+        """返回每个连接的复用统计 [{id, host, uses}]"""
+        with self.lock:
+            return [{'id': c.id, 'host': c.host, 'uses': c.uses}
+                    for c in sorted(self.connections.values(), key=lambda c: c.id)]
+    
+    def close(self):
+        """关闭所有空闲连接"""
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for conns in idle.values():
+            for pooled in conns:
+                self._discard(pooled)
+
+http_pool = HTTPPool()
+
+def configure_pool(size):
+    """设置每个域名的连接数上限（会关闭现有连接）"""
+    global http_pool
+    http_pool.close()
+    http_pool = HTTPPool(size=size)
+
+def print_pool_stats():
+    """打印连接池中各连接的复用次数"""
+    stats = http_pool.stats()
+    if not stats:
+        return
+    total = sum(c['uses'] for c in stats)
+    print(f"🔌 连接池: {len(stats)} 个连接, 共 {total} 次请求, 重连 {http_pool.reconnects} 次")
+    for c in stats:
+        print(f"    #{c['id']} {c['host']}: 使用 {c['uses']} 次")
+
+def print_cache_stats(detail=False):
+    """打印本次运行的缓存命中情况（detail 时打印累计统计）"""
+    if not price_cache:
+        if detail:
+            print("💾 价格缓存未启用")
+        return
+    total = price_cache.hits + price_cache.misses
+    if total:
+        print(f"💾 缓存: 命中 {price_cache.hits}/{total} ({price_cache.hits / total * 100:.0f}%)")
+    if detail:
+        info = price_cache.summary()
+        lookups = info['hits'] + info['misses']
+        rate = f"{info['hits'] / lookups * 100:.1f}%" if lookups else "无查询"
+        print(f"💾 价格缓存 ({price_cache.path}): {info['entries']} 个条目, "
+              f"{info['fresh']} 个未过期（有效期 {price_cache.ttl} 秒）, {info['bytes'] / 1024:.0f}KB")
+        print(f"   累计命中率: {rate}（命中 {info['hits']}, 未命中 {info['misses']}）")
+
+class EndpointUnavailable(Exception):
+    """接口处于熔断状态，本次请求被跳过"""
+
+class EndpointHealth:
+    """
+    接口健康状态与熔断器（线程安全）
+    记录最近 WINDOW 次请求的成功率和耗时：
+      closed    正常放行；连续失败 FAILURE_STREAK 次，或失败率超过 FAILURE_RATE 时熔断
+      open      熔断中，直接跳过该接口；OPEN_SECONDS 秒后进入半开
+      half_open 只放行 HALF_OPEN_PROBES 个试探请求，成功则恢复，失败则重新熔断
+    请求超时按最近耗时的 p95 自适应调整，限制在 [MIN_TIMEOUT, MAX_TIMEOUT] 内。
+    """
+    WINDOW = 50
+    MIN_SAMPLES = 10
+    FAILURE_RATE = 0.5
+    FAILURE_STREAK = 5
+    OPEN_SECONDS = 30
+    HALF_OPEN_PROBES = 1
+    MIN_TIMEOUT = 2.0
+    MAX_TIMEOUT = 10.0
+    TIMEOUT_FACTOR = 3
+    
+    def __init__(self, name, host):
+        self.name = name
+        self.host = host
+        self.lock = threading.Lock()
+        self.results = deque(maxlen=self.WINDOW)    # 最近请求是否成功
+        self.latencies = deque(maxlen=self.WINDOW)  # 最近成功请求的耗时（秒）
+        self.state = 'closed'
+        self.streak = 0
+        self.opened_at = 0
+        self.probes = 0
+        self.transitions = []  # 尚未报告的状态变化 [(时间, 原状态, 新状态)]
+    
+    def _set_state(self, state):
+        if state != self.state:
+            self.transitions.append((datetime.now().strftime(TIME_FORMAT), self.state, state))
+            self.state = state
+    
+    def allow(self):
+        """是否放行一次请求；半开状态下放行的请求占用一个试探名额"""
+        with self.lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.OPEN_SECONDS:
+                    return False
+                self._set_state('half_open')
+                self.probes = 0
+            if self.state == 'half_open':
+                if self.probes >= self.HALF_OPEN_PROBES:
+                    return False
+                self.probes += 1
+            return True
+    
+    def record(self, ok, latency=None):
+        """记录一次请求结果"""
+        with self.lock:
+            self.results.append(ok)
+            if ok:
+                self.latencies.append(latency)
+                self.streak = 0
+                if self.state == 'half_open':
+                    # 试探成功，之前的失败记录不再参与判断
+                    self.results.clear()
+                    self.results.append(True)
+                    self._set_state('closed')
+                return
+            self.streak += 1
+            failures = self.results.count(False)
+            if (self.state == 'half_open' or self.streak >= self.FAILURE_STREAK or
+                    (len(self.results) >= self.MIN_SAMPLES and failures / len(self.results) >= self.FAILURE_RATE)):
+                self.opened_at = time.monotonic()
+                self._set_state('open')
+    
+    def percentile(self, q):
+        """最近成功请求耗时的分位数（秒）"""
+        with self.lock:
+            data = sorted(self.latencies)
+        if not data:
+            return None
+        return data[min(len(data) - 1, int(q * len(data)))]
+    
+    def timeout(self):
+        """根据最近耗时计算的请求超时（秒）"""
+        if len(self.latencies) < self.MIN_SAMPLES:
+            return self.MAX_TIMEOUT
+        return min(self.MAX_TIMEOUT, max(self.MIN_TIMEOUT, self.percentile(0.95) * self.TIMEOUT_FACTOR))
+    
+    def success_rate(self):
+        with self.lock:
+            return self.results.count(True) / len(self.results) if self.results else None
+    
+    def pop_transitions(self):
+        with self.lock:
+            transitions, self.transitions = self.transitions, []
+        return transitions
+
+ENDPOINTS = {
+    'mgets': EndpointHealth('比价API', 'p.3.cn'),
+    'backup': EndpointHealth('备用API', 'api.m.jd.com'),
+}
+
+STATE_LABELS = {'closed': '✅ 正常', 'open': '⛔ 熔断', 'half_open': '🔶 半开'}
+ENDPOINT_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def print_endpoint_health(transitions_only=False):
+    """打印各接口的健康状态和熔断状态变化"""
+    for health in ENDPOINTS.values():
+        for ts, old, new in health.pop_transitions():
+            print(f"⚡ [{ts}] {health.name}: {STATE_LABELS[old]} → {STATE_LABELS[new]}")
+    if transitions_only:
+        return
+    for health in ENDPOINTS.values():
+        rate = health.success_rate()
+        if rate is None:
+            continue
+        p50, p95 = health.percentile(0.5), health.percentile(0.95)
+        latency = f"p50 {p50 * 1000:.0f}ms / p95 {p95 * 1000:.0f}ms" if p50 is not None else "无成功请求"
+        print(f"🩺 {health.name} ({health.host}): {STATE_LABELS[health.state]}, "
+              f"成功率 {rate * 100:.0f}%, {latency}, 超时 {health.timeout():.1f}s")
+
+def http_get_json(url, referer=None, timeout=None, endpoint=None, parse=None):
+    """
+    发送GET请求并解析JSON响应（按域名限速，复用连接池）
+    指定 endpoint 时经过该接口的熔断器，超时取自适应值，并记录成功率和耗时
+    指定 parse 时返回 parse(响应)；parse 返回 None（响应中没有有效数据）时按失败记录并返回 None
+    """
+    health = ENDPOINTS.get(endpoint)
+    label = endpoint or urlparse(url).hostname
+    if health and not health.allow():
+        METRICS.inc('ram_monitor_requests_total', help_text="接口请求数", endpoint=label,
+                    result='rejected')
+        raise EndpointUnavailable(endpoint)
+    if timeout is None:
+        timeout = health.timeout() if health else 10
+    limiter = get_rate_limiter(urlparse(url).hostname)
+    if limiter:
+        limiter.acquire()
+    headers = {'User-Agent': JD_USER_AGENT}
+    if referer:
+        headers['Referer'] = referer
+    start = time.monotonic()
+    try:
+        body = http_pool.request(url, headers, timeout=timeout)
+        fetched = time.monotonic()
+        data = json.loads(body.decode())
+        if parse is not None:
+            data = parse(data)
+    except Exception:
+        if health:
+            health.record(False)
+        METRICS.inc('ram_monitor_requests_total', help_text="接口请求数", endpoint=label,
+                    result='failure')
+        raise
+    latency = fetched - start
+    if data is None and parse is not None:
+        if health:
+            health.record(False)
+        METRICS.inc('ram_monitor_requests_total', help_text="接口请求数", endpoint=label,
+                    result='invalid')
+        return None
+    if health:
+        health.record(True, latency)
+    METRICS.inc('ram_monitor_requests_total', help_text="接口请求数", endpoint=label, result='success')
+    METRICS.observe('ram_monitor_request_seconds', latency, "接口请求耗时（不含解析）", endpoint=label)
+    METRICS.observe('ram_monitor_parse_seconds', time.monotonic() - fetched, "响应JSON解析耗时",
+                    endpoint=label)
+    METRICS.inc('ram_monitor_response_bytes_total', len(body), "接口响应字节数", endpoint=label)
+    return data
+
 def get_jd_price(sku_id):
     """
     获取京东商品价格
@@ -44,45 +471,380 @@ def get_jd_price(sku_id):
     """
     try:
         # 方法1: 使用京东比价API
-        url = f"https://p.3.cn/prices/mgets?skuIds=J_{sku_id}"
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-        req.add_header('Referer', 'https://www.jd.com/')
-        
-        resp = urllib.request.urlopen(req, timeout=10)
-        data = json.loads(resp.read().decode())
-        
-        if data and len(data) > 0:
-            price = data[0].get('p', 0)
-            return float(price)
+        url = f"{JD_MGETS_URL}?skuIds=J_{sku_id}"
+        # 格式异常的响应（验证码、限流）按失败记录，持续出现时熔断
+        found = http_get_json(url, referer='https://www.jd.com/', endpoint='mgets',
+                              parse=parse_mgets_response)
+        if found and str(sku_id) in found:
+            return found[str(sku_id)]
+    except EndpointUnavailable:
+        pass
     except Exception as e:
         print(f"⚠️ API方式失败: {e}")
     
     try:
         # 方法2: 备用接口
-        url = f"https://api.m.jd.com/?functionId=getCatalogProduct&skuId={sku_id}"
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-        
-        resp = urllib.request.urlopen(req, timeout=10)
-        data = json.loads(resp.read().decode())
-        
-        # 解析返回数据
-        if 'price' in str(data):
-            price_match = str(data).split('"p":"')[1].split('"')[0] if '"p":"' in str(data) else 0
-            return float(price_match)
+        url = f"{JD_BACKUP_URL}?functionId=getCatalogProduct&skuId={sku_id}"
+        # 没有价格的响应按失败记录，持续无效时备用接口也会熔断
+        return http_get_json(url, endpoint='backup', parse=parse_backup_response)
+    except EndpointUnavailable:
+        pass
     except Exception as e:
         print(f"⚠️ 备用API失败: {e}")
     
     return None
 
+def parse_backup_response(data):
+    """解析备用接口返回数据 {"price": {"p": "价格"}}，没有有效价格时返回 None"""
+    try:
+        price = float(data.get('price', {}).get('p'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return price if math.isfinite(price) else None
+
+def parse_mgets_response(data):
+    """
+    解析 mgets 返回数据 [{"id": "J_SKU", "p": "价格"}, ...]
+
+    Returns:
+        {SKU_ID: 价格}；响应不是列表（如验证码、限流返回的 {"error": ...}）
+        或列表中没有任何对象时返回 None
+    """
+    if not isinstance(data, list):
+        return None
+    rows = [item for item in data if isinstance(item, dict)]
+    if data and not rows:
+        return None
+    prices = {}
+    for item in rows:
+        sku_id = str(item.get('id', ''))
+        if sku_id.startswith('J_'):
+            sku_id = sku_id[2:]
+        try:
+            prices[sku_id] = float(item['p'])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return prices
+
+def fetch_mgets_chunk(chunk):
+    """用一次 mgets 请求获取一批SKU的价格"""
+    url = f"{JD_MGETS_URL}?skuIds=" + ",".join(f"J_{s}" for s in chunk)
+    # 任何异常只影响本批，本批的SKU逐个回退，不中断整个检查周期
+    try:
+        found = http_get_json(url, referer='https://www.jd.com/', endpoint='mgets',
+                              parse=parse_mgets_response)
+    except EndpointUnavailable:
+        return {}
+    except Exception as e:
+        print(f"⚠️ 批量API失败 ({len(chunk)} 个商品): {e}")
+        return {}
+    if found is None:
+        # 已按失败记入接口健康状态
+        print(f"⚠️ 批量API返回格式异常 ({len(chunk)} 个商品)")
+        return {}
+    return {s: found[s] for s in chunk if s in found}
+
+# 价格缓存（由 configure_cache 启用），以及进程内合并并发请求
+price_cache = None
+in_flight = InFlight()
+
+def configure_cache(ttl=CACHE_TTL, size=CACHE_SIZE, path=CACHE_FILE):
+    """启用磁盘价格缓存，ttl 为 0 时关闭"""
+    global price_cache
+    if price_cache:
+        price_cache.close()
+    price_cache = PriceCache(path, ttl, size) if ttl > 0 else None
+
+def get_jd_prices(sku_ids, batch_size=MGETS_BATCH_SIZE, workers=DEFAULT_WORKERS, max_age=None):
+    """
+    批量获取京东商品价格
+    启用缓存时先取缓存中不超过 max_age 秒（默认为缓存有效期，0 表示不读缓存）的价格，
+    其余SKU若已有其他线程在请求则等待其结果，否则由本线程请求，新获取的价格写入缓存。
+
+    Returns:
+        {SKU_ID: 价格}，获取失败的SKU对应 None
+    """
+    # 同一SKU可能配置在多个名称下，只请求一次
+    unique_ids = list(dict.fromkeys(str(s) for s in sku_ids))
+    prices = {}
+    if price_cache:
+        cached = price_cache.get_many(unique_ids, max_age)
+        prices.update((sku, price) for sku, (price, _) in cached.items())
+        if max_age != 0:
+            METRICS.inc('ram_monitor_cache_requests_total', len(cached), "价格缓存查询数", result='hit')
+            METRICS.inc('ram_monitor_cache_requests_total', len(unique_ids) - len(cached),
+                        "价格缓存查询数", result='miss')
+    
+    owned, waiting = in_flight.claim([s for s in unique_ids if s not in prices])
+    fetched = {}
+    try:
+        fetched = fetch_prices(owned, batch_size, workers)
+    finally:
+        in_flight.resolve(owned, fetched)
+    if price_cache:
+        price_cache.put_many(fetched)
+    prices.update(fetched)
+    prices.update(in_flight.wait(waiting))
+    return prices
+
+def fetch_prices(unique_ids, batch_size=MGETS_BATCH_SIZE, workers=DEFAULT_WORKERS):
+    """
+    从京东接口获取一组（不重复的）SKU价格
+    将SKU按 batch_size 分块，每块合并为一次 mgets 请求，并按返回的 id 字段映射回SKU。
+    只有批量结果中缺失的SKU才逐个回退到 get_jd_price。
+    各请求由 workers 个线程并发执行，请求速率由各域名的令牌桶控制。
+    """
+    if not unique_ids:
+        return {}
+    chunks = [unique_ids[i:i + batch_size] for i in range(0, len(unique_ids), batch_size)]
+    prices = {}
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for found in pool.map(fetch_mgets_chunk, chunks):
+            prices.update(found)
+        
+        # 批量结果缺失的SKU逐个回退
+        missing = [s for s in unique_ids if s not in prices]
+        for sku_id, price in zip(missing, pool.map(get_jd_price, missing)):
+            prices[sku_id] = price
+    
+    return prices
+
 def format_price(price):
     """格式化价格显示"""
     if price:
         return f"¥{price:.2f}"
     return "N/A"
 
-def monitor_price(products, interval=300, max_history=100):
+class AdaptiveScheduler:
+    """
+    自适应轮询调度器
+    用最小堆按下次到期时间排列SKU。每个SKU的间隔由近期价格变化频率决定：
+    变化频率（指数加权平均）越高间隔越接近 min_interval，越稳定越接近 max_interval；
+    连续获取失败时按 2^失败次数 退避（最长 max_interval 的 BACKOFF_LIMIT 倍）。
+    初始到期时间在一个间隔内均匀错开，之后每次加入随机抖动，使请求均匀分布而不是集中爆发。
+    """
+    # 变化频率的平滑系数
+    ALPHA = 0.3
+    # 到期时间的随机抖动比例
+    JITTER = 0.1
+    # 失败退避的上限（max_interval 的倍数）
+    BACKOFF_LIMIT = 4
+    
+    def __init__(self, sku_ids, min_interval=60, max_interval=1800, window=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # 合并到期时间相近的SKU，一起批量请求
+        self.window = window if window is not None else min(5, min_interval / 10)
+        self.change_rate = {}
+        self.failures = {}
+        self.interval = {}
+        self.heap = []
+        self.seq = itertools.count()
+        
+        now = time.time()
+        sku_ids = list(dict.fromkeys(str(s) for s in sku_ids))
+        for i, sku in enumerate(sku_ids):
+            self.change_rate[sku] = 0.5
+            self.failures[sku] = 0
+            self.interval[sku] = self._interval_for(0.5)
+            # 首轮在一个最小间隔内均匀错开
+            self._push(now + min_interval * i / max(1, len(sku_ids)), sku)
+    
+    def _interval_for(self, rate):
+        """变化频率 0~1 映射到 [max_interval, min_interval]（对数插值）"""
+        ratio = self.max_interval / self.min_interval
+        return self.min_interval * ratio ** (1 - rate)
+    
+    def _push(self, due, sku):
+        heapq.heappush(self.heap, (due, next(self.seq), sku))
+    
+    def next_due(self):
+        """最早到期的时间戳"""
+        return self.heap[0][0] if self.heap else None
+    
+    def wait(self):
+        """睡眠到下一个SKU到期；没有待检查的SKU时睡眠 max_interval"""
+        due = self.next_due()
+        delay = self.max_interval if due is None else due - time.time()
+        if delay > 0:
+            time.sleep(delay)
+    
+    def pop_due(self):
+        """取出已到期（以及 window 秒内即将到期）的SKU"""
+        limit = time.time() + self.window
+        due = []
+        while self.heap and self.heap[0][0] <= limit:
+            due.append(heapq.heappop(self.heap)[2])
+        return due
+    
+    def report(self, sku, changed=False, failed=False):
+        """根据本次结果调整该SKU的间隔并重新排期"""
+        if failed:
+            self.failures[sku] += 1
+            delay = min(self.interval[sku] * 2 ** self.failures[sku],
+                        self.max_interval * self.BACKOFF_LIMIT)
+        else:
+            self.failures[sku] = 0
+            rate = (1 - self.ALPHA) * self.change_rate[sku] + self.ALPHA * (1.0 if changed else 0.0)
+            self.change_rate[sku] = rate
+            self.interval[sku] = delay = self._interval_for(rate)
+        delay *= 1 + random.uniform(-self.JITTER, self.JITTER)
+        self._push(time.time() + delay, sku)
+    
+    def skip(self, sku):
+        """本轮不检查该SKU（如已归其他分片），按当前间隔重新排期"""
+        self._push(time.time() + self.interval[sku], sku)
+    
+    def requests_per_minute(self):
+        """按当前间隔估算的每分钟请求SKU数"""
+        return sum(60.0 / i for i in self.interval.values())
+    
+    def summary(self):
+        if not self.interval:
+            return "📅 调度: 无商品"
+        avg = sum(self.interval.values()) / len(self.interval)
+        failing = sum(1 for f in self.failures.values() if f)
+        return (f"📅 调度: 平均间隔 {avg:.0f}秒, 预计 {self.requests_per_minute():.1f} 个SKU/分钟, "
+                f"退避中 {failing} 个")
+
+def record_prices(items, prices, price_history, max_history, now):
+    """
+    记录一批商品的价格并打印结果
+    
+    Args:
+        items: [(商品名, SKU_ID)]
+        prices: get_jd_prices 返回的 {SKU_ID: 价格}
+        now: 本次检查时间 (datetime)
+    
+    Returns:
+        (records, changes)
+        records: 需要写入存储的 [(SKU_ID, 商品名, 时间, 价格)]
+        changes: 价格变化 [(SKU_ID, 商品名, 原价, 现价, 变化百分比)]
+    """
+    timestamp = now.strftime(TIME_FORMAT)
+    epoch = int(now.timestamp())
+    records = []
+    changes = []
+    for name, sku_id in items:
+        print(f"  📦 {name}...", end=" ", flush=True)
+        
+        # 获取当前价格
+        current_price = prices.get(str(sku_id))
+        
+        if current_price:
+            old_price = price_history.get(sku_id, {}).get('current')
+            
+            # 记录价格
+            if sku_id not in price_history:
+                price_history[sku_id] = new_entry(name, max_history)
+            
+            # 添加到历史（环形缓冲区，超过 max_history 自动淘汰最旧记录），
+            # 同时增量更新按小时/天的汇总，并更新当前价格
+            record_sample(price_history[sku_id], epoch, current_price)
+            records.append((sku_id, name, timestamp, current_price))
+            
+            # 检测价格变化
+            if old_price and old_price != current_price:
+                change = current_price - old_price
+                change_pct = (change / old_price) * 100
+                sign = "📈" if change > 0 else "📉"
+                print(f"{sign} {format_price(old_price)} → {format_price(current_price)} ({change_pct:+.2f}%)")
+                changes.append((sku_id, name, old_price, current_price, change_pct))
+            else:
+                print(f"💰 {format_price(current_price)}")
+        else:
+            print("❌ 获取失败")
+    return records, changes
+
+def print_alerts(alerts):
+    """打印触发的提醒"""
+    for alert in alerts:
+        print(f"🔔 {alert['message']}")
+        METRICS.inc('ram_monitor_alerts_total', help_text="触发的提醒数", type=alert['rule'].type)
+
+def print_changes(changes):
+    """打印价格变化汇总"""
+    if not changes:
+        return
+    print("\n" + "=" * 60)
+    print("📊 价格变化汇总:")
+    print("=" * 60)
+    for _, name, old_price, new_price, change_pct in changes:
+        print(f"  {name}: {format_price(old_price)} → {format_price(new_price)} ({change_pct:+.2f}%)")
+
+def update_runtime_metrics(price_history=None):
+    """刷新接口熔断状态、连接池和内存历史规模等仪表值"""
+    for name, health in ENDPOINTS.items():
+        METRICS.set('ram_monitor_endpoint_state', ENDPOINT_STATE_VALUES[health.state],
+                    "接口熔断状态（0 正常, 1 半开, 2 熔断）", endpoint=name)
+        rate = health.success_rate()
+        if rate is not None:
+            METRICS.set('ram_monitor_endpoint_success_ratio', rate, "接口近期成功率", endpoint=name)
+    METRICS.set('ram_monitor_pool_connections', len(http_pool.stats()), "连接池中的连接数")
+    METRICS.set('ram_monitor_pool_reconnects', http_pool.reconnects, "连接池累计重连次数")
+    if price_history is not None:
+        samples, buckets, nbytes = history_memory(price_history)
+        METRICS.set('ram_monitor_history_skus', len(price_history), "内存历史中的商品数")
+        METRICS.set('ram_monitor_history_samples', samples, "内存历史中的原始样本数")
+        METRICS.set('ram_monitor_history_rollup_buckets', buckets, "内存历史中的汇总桶数")
+        METRICS.set('ram_monitor_history_bytes', nbytes, "内存历史数组占用的字节数")
+
+def run_cycle(items, price_history, store, max_history=100, workers=DEFAULT_WORKERS):
+    """
+    执行一次检查：批量获取价格、记录历史并追加到存储
+    各阶段耗时、写入字节数和内存历史规模记录到 METRICS
+    
+    Args:
+        items: 本次检查的 [(商品名, SKU_ID)]
+    
+    Returns:
+        (prices, changes)
+    """
+    now = datetime.now()
+    print(f"\n[{now.strftime(TIME_FORMAT)}] 🔍 检查价格 ({len(items)} 个商品)...")
+    
+    cycle_start = time.perf_counter()
+    with METRICS.timer('ram_monitor_stage_seconds', "检查周期各阶段耗时", stage='fetch'):
+        # 监控总是请求最新价格（max_age=0），结果写入缓存供 check 使用
+        prices = get_jd_prices([sku_id for _, sku_id in items], workers=workers, max_age=0)
+    with METRICS.timer('ram_monitor_stage_seconds', "检查周期各阶段耗时", stage='record'):
+        records, changes = record_prices(items, prices, price_history, max_history, now)
+    
+    # 保存历史数据（只追加本周期的观测）
+    with METRICS.timer('ram_monitor_stage_seconds', "检查周期各阶段耗时", stage='persist'):
+        with METRICS.timer('ram_monitor_history_write_seconds', "历史存储写入耗时"):
+            written = store.append(records) or 0
+        store.maybe_compact()
+    elapsed = time.perf_counter() - cycle_start
+    
+    METRICS.inc('ram_monitor_history_write_bytes_total', written, "历史存储写入字节数")
+    METRICS.observe('ram_monitor_cycle_seconds', elapsed, "检查周期耗时")
+    METRICS.inc('ram_monitor_cycles_total', help_text="检查周期数")
+    METRICS.inc('ram_monitor_skus_total', len(records), "检查的商品数", result='success')
+    METRICS.inc('ram_monitor_skus_total', len(items) - len(records), "检查的商品数", result='failure')
+    METRICS.inc('ram_monitor_price_changes_total', len(changes), "检测到的价格变化数")
+    METRICS.set('ram_monitor_skus_per_second', len(items) / elapsed if elapsed else 0,
+                "最近一个周期每秒检查的商品数")
+    METRICS.set('ram_monitor_last_cycle_timestamp', time.time(), "最近一个周期结束的时间戳")
+    update_runtime_metrics(price_history)
+    
+    print_changes(changes)
+    return prices, changes
+
+# 自适应模式下打印连接池和调度统计的间隔（秒）
+STATS_INTERVAL = 600
+
+def sync_shard(shard, products):
+    """刷新分片成员，成员变化时打印本分片负责的商品数"""
+    if shard.refresh():
+        skus = set(str(s) for s in products.values())
+        owned = sum(1 for sku in skus if shard.owns(sku))
+        print(f"🧩 分片成员: {', '.join(shard.members)}，{shard.name} 负责 {owned}/{len(skus)} 个商品")
+
+def monitor_price(products, interval=300, max_history=100, workers=DEFAULT_WORKERS,
+                  backend='jsonl', adaptive=None, metrics_file=None, profile=0, shard=None, alerts=None,
+                  notifier=None):
     """
     监控商品价格
     
@@ -90,94 +852,130 @@ def monitor_price(products, interval=300, max_history=100):
         products: 商品字典 {商品名: SKU_ID}
         interval: 检查间隔（秒），默认5分钟
         max_history: 每个商品保留的历史记录数
+        workers: 并发抓取线程数
+        backend: 历史存储后端 (jsonl/sqlite/json)
+        adaptive: (最短间隔, 最长间隔)，设置后按SKU自适应调度，忽略 interval
+        metrics_file: 每个周期结束后把指标写入该文件（textfile collector 格式）
+        profile: 对前 N 个周期做 cProfile/tracemalloc 剖析
+        shard: ShardMember，设置后只检查哈希环上归本分片的商品，历史写入分片目录
+        alerts: AlertEngine，每个周期对发生变化的商品评估提醒规则
+        notifier: Notifier，价格变化和提醒合并后推送到飞书（后台发送，不阻塞检查）
     """
     print("=" * 60)
     print("🖥️  内存条价格监控器")
     print("=" * 60)
     print(f"📦 监控商品数: {len(products)}")
-    print(f"⏰ 检查间隔: {interval}秒")
+    if adaptive:
+        print(f"⏰ 自适应间隔: {adaptive[0]}~{adaptive[1]}秒")
+    else:
+        print(f"⏰ 检查间隔: {interval}秒")
+    print(f"🧵 并发线程: {workers}")
+    if shard:
+        print(f"🧩 分片: {shard.name}（数据目录 {shard.path}/）")
+    if alerts and alerts.rules:
+        print(f"🔔 提醒规则: {len(alerts.rules)} 条")
+    if notifier:
+        print(f"📨 飞书通知: {notifier.chat_id}（每 {notifier.window} 秒合并发送）")
     print(f"🕐 启动时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 60)
     print()
     
     # 加载历史数据
-    history_file = "price_history.json"
-    price_history = {}
-    if os.path.exists(history_file):
-        try:
-            with open(history_file, 'r') as f:
-                price_history = json.load(f)
-        except:
-            pass
+    store = open_history_store(backend, max_history, root=shard.path if shard else None)
+    price_history = store.load()
+    if alerts:
+        alerts.seed(price_history)
     
-    while True:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"\n[{timestamp}] 🔍 检查价格...")
-        
-        changes = []
-        for name, sku_id in products.items():
-            print(f"  📦 {name}...", end=" ", flush=True)
+    scheduler = AdaptiveScheduler(products.values(), *adaptive) if adaptive else None
+    profiler = None
+    if profile:
+        prefix = time.strftime("profile-%Y%m%d-%H%M%S")
+        profiler = CycleProfiler(profile, prefix=os.path.join(shard.path, prefix) if shard else prefix)
+    last_stats = time.time()
+    cycles = 0
+    
+    try:
+        while True:
+            if shard:
+                sync_shard(shard, products)
+            if scheduler:
+                scheduler.wait()
+                due = set(scheduler.pop_due())
+                if shard:
+                    for sku in [s for s in due if not shard.owns(s)]:
+                        due.discard(sku)
+                        scheduler.skip(sku)
+                if not due:
+                    continue
+                items = [(name, sku_id) for name, sku_id in products.items() if str(sku_id) in due]
+            else:
+                items = list(products.items())
+                if shard:
+                    items = [(name, sku_id) for name, sku_id in items if shard.owns(sku_id)]
             
-            # 获取当前价格
-            current_price = get_jd_price(sku_id)
+            prices, changes = run_cycle(items, price_history, store, max_history, workers)
+            triggered = []
+            if alerts:
+                with METRICS.timer('ram_monitor_stage_seconds', "检查周期各阶段耗时", stage='alerts'):
+                    triggered = alerts.evaluate(changes, time.time())
+                print_alerts(triggered)
+            if notifier:
+                notifier.notify_alerts(triggered)
+                notifier.notify_changes(changes)
+            if metrics_file:
+                write_textfile(metrics_file)
+            if profiler:
+                profiler.cycle_done()
+            cycles += 1
+            if shard:
+                shard.stats = {'skus': len(items), 'cycles': cycles, 'last_cycle': time.time()}
+                shard.heartbeat()
             
-            if current_price:
-                old_price = price_history.get(sku_id, {}).get('current')
-                
-                # 记录价格
-                if sku_id not in price_history:
-                    price_history[sku_id] = {'name': name, 'history': [], 'current': None}
-                
-                # 添加到历史
-                price_history[sku_id]['history'].append({
-                    'time': timestamp,
-                    'price': current_price
-                })
-                
-                # 保持历史记录数量
-                if len(price_history[sku_id]['history']) > max_history:
-                    price_history[sku_id]['history'] = price_history[sku_id]['history'][-max_history:]
-                
-                # 更新当前价格
-                price_history[sku_id]['current'] = current_price
-                
-                # 检测价格变化
-                if old_price and old_price != current_price:
-                    change = current_price - old_price
-                    change_pct = (change / old_price) * 100
-                    sign = "📈" if change > 0 else "📉"
-                    print(f"{sign} {format_price(old_price)} → {format_price(current_price)} ({change_pct:+.2f}%)")
-                    changes.append((name, old_price, current_price, change_pct))
+            if scheduler:
+                changed = {str(c[0]) for c in changes}
+                for sku in due:
+                    scheduler.report(sku, changed=sku in changed, failed=not prices.get(sku))
+                if time.time() - last_stats >= STATS_INTERVAL:
+                    last_stats = time.time()
+                    print()
+                    print(scheduler.summary())
+                    print_pool_stats()
+                    print_endpoint_health()
                 else:
-                    print(f"💰 {format_price(current_price)}")
+                    print_endpoint_health(transitions_only=True)
+                next_due = scheduler.next_due()
+                if next_due is not None:
+                    print(f"💤 下次检查: {max(0, next_due - time.time()):.0f} 秒后")
             else:
-                print("❌ 获取失败")
-        
-        # 保存历史数据
-        with open(history_file, 'w') as f:
-            json.dump(price_history, f, ensure_ascii=False, indent=2)
-        
-        # 打印价格变化汇总
-        if changes:
-            print("\n" + "=" * 60)
-            print("📊 价格变化汇总:")
-            print("=" * 60)
-            for name, old_price, new_price, change_pct in changes:
-                print(f"  {name}: {format_price(old_price)} → {format_price(new_price)} ({change_pct:+.2f}%)")
-        
-        print(f"\n💤 等待 {interval} 秒后再次检查...")
-        time.sleep(interval)
+                print()
+                print_endpoint_health()
+                print_pool_stats()
+                print(f"\n💤 等待 {interval} 秒后再次检查...")
+                time.sleep(interval)
+    finally:
+        if notifier:
+            notifier.close()
+            print(notifier.summary())
+        if shard:
+            shard.leave()
 
-def check_price_once(products):
-    """只检查一次价格"""
+def check_price_once(products, workers=DEFAULT_WORKERS, metrics_file=None, max_age=None):
+    """只检查一次价格（启用缓存时，不超过 max_age 秒的缓存价格直接返回）"""
     print("=" * 60)
     print("🖥️  内存条价格查询")
     print("=" * 60)
     
+    with METRICS.timer('ram_monitor_stage_seconds', "检查周期各阶段耗时", stage='fetch'):
+        prices = get_jd_prices(products.values(), workers=workers, max_age=max_age)
     for name, sku_id in products.items():
-        price = get_jd_price(sku_id)
-        print(f"  📦 {name}: {format_price(price)}")
-        time.sleep(0.5)  # 避免请求过快
+        print(f"  📦 {name}: {format_price(prices.get(str(sku_id)))}")
+    print()
+    print_cache_stats()
+    print_endpoint_health()
+    print_pool_stats()
+    if metrics_file:
+        update_runtime_metrics()
+        write_textfile(metrics_file)
 
 def add_product(config, name, sku_id):
     """添加监控商品"""
@@ -198,37 +996,262 @@ def list_products(config):
     for i, (name, sku_id) in enumerate(config['products'].items(), 1):
         print(f"  {i}. {name} (SKU: {sku_id})")
 
-def show_history(product_name=None, sku_id=None):
-    """显示价格历史"""
-    history_file = "price_history.json"
-    if not os.path.exists(history_file):
-        print("❌ 没有价格历史记录")
+def list_alerts(config):
+    """列出提醒规则，并标出无效的规则"""
+    engine, errors = AlertEngine.from_config(config.get('alerts', []))
+    if not engine.rules and not errors:
+        print("🔔 未配置提醒规则")
         return
+    print("\n🔔 提醒规则:")
+    print("-" * 40)
+    for rule in engine.rules:
+        print(f"  {rule.id}. {rule.describe()}")
+    for i, error in errors:
+        print(f"  {i}. ❌ 无效规则: {error}")
+
+def add_alert(config, sku_id, kind, values):
+    """
+    添加提醒规则
+    below/above 的参数为价格，drop_from_max/rise_from_min/sustained 的参数为 百分比 窗口秒数
+    """
+    data = {'sku': sku_id, 'type': kind}
+    try:
+        if kind in ('below', 'above'):
+            data['price'] = float(values[0])
+        elif kind in ('drop_from_max', 'rise_from_min', 'sustained'):
+            data['percent'], data['window'] = float(values[0]), int(values[1])
+        rule = parse_rule(data, len(config.get('alerts', [])) + 1)
+    except IndexError:
+        print("❌ 缺少参数: below/above 需要价格，drop_from_max/rise_from_min/sustained 需要 百分比 窗口秒数")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ 无效的提醒规则: {e}")
+        sys.exit(1)
+    config.setdefault('alerts', []).append(data)
+    save_config(config)
+    print(f"✅ 已添加提醒: {rule.describe()}")
+
+def check_sharded(products, root=SHARD_ROOT, backend='jsonl'):
+    """从各分片的历史中读取最新价格（不请求京东接口）"""
+    print("=" * 60)
+    print(f"🖥️  内存条价格查询（分片历史: {root}/）")
+    print("=" * 60)
     
-    with open(history_file, 'r') as f:
-        price_history = json.load(f)
+    latest = latest_prices(root, backend)
+    for name, sku_id in products.items():
+        found = latest.get(str(sku_id))
+        if found:
+            ts, price, shard = found
+            print(f"  📦 {name}: {format_price(price)} "
+                  f"({datetime.fromtimestamp(ts).strftime(TIME_FORMAT)}, {shard})")
+        else:
+            print(f"  📦 {name}: N/A")
+
+def show_shards(products, root=SHARD_ROOT):
+    """显示分片成员的心跳和商品分配"""
+    members = live_members(root)
+    names = sorted(set(shard_names(root)) | set(members))
+    if not names:
+        print(f"🧩 {root}/ 下没有分片")
+        return
+    assignment = HashRing(members).assign(set(str(s) for s in products.values()))
+    
+    print(f"\n🧩 分片状态 ({root}/):")
+    print("-" * 60)
+    now = time.time()
+    for name in names:
+        info = members.get(name)
+        if info:
+            print(f"  ✅ {name} ({info['host']}, pid {info['pid']}): 负责 {len(assignment[name])} 个商品, "
+                  f"心跳 {now - info['heartbeat']:.0f} 秒前, 已完成 {info.get('cycles', 0)} 个周期")
+        else:
+            print(f"  💤 {name}: 离线")
+
+def run_shard_processes(count, args, root=SHARD_ROOT):
+    """
+    启动 count 个分片监控子进程（shard-1 ~ shard-N），输出写入各分片目录的 monitor.log
+    子进程都使用分片根目录 root（与 shards / history --shards 读取的目录一致），
+    --metrics-port 依次加 1，--metrics-file 按分片名区分
+    """
+    args = list(args)
+    pop_option(args, '--shard-root')
+    procs = []
+    for i in range(1, count + 1):
+        name = f"shard-{i}"
+        child = args + ['--shard-root', root]
+        port = pop_option(child, '--metrics-port', None, int)
+        if port:
+            child += ['--metrics-port', str(port + i - 1)]
+        metrics_file = pop_option(child, '--metrics-file', None)
+        if metrics_file:
+            base, ext = os.path.splitext(metrics_file)
+            child += ['--metrics-file', f"{base}-{name}{ext}"]
+        os.makedirs(os.path.join(root, name), exist_ok=True)
+        log = open(os.path.join(root, name, 'monitor.log'), 'a')
+        procs.append(subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'monitor', *child, '--shard', name],
+            stdout=log, stderr=subprocess.STDOUT))
+        print(f"🧩 已启动 {name} (pid {procs[-1].pid})，日志: {root}/{name}/monitor.log")
+    try:
+        for proc in procs:
+            proc.wait()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
+
+def show_history(product_name=None, sku_id=None, backend='jsonl', since=None, until=None, limit=10,
+                 resolution='raw', shard_root=None):
+    """
+    显示价格历史
+    
+    Args:
+        since/until: 时间范围（TIME_FORMAT 格式字符串）
+        limit: 每个商品显示的最近记录数
+        resolution: raw（原始样本）、hour 或 day（汇总）
+        shard_root: 指定时合并读取该目录下所有分片的历史
+    """
+    if shard_root:
+        results = merged_history(shard_root, backend, sku=sku_id, name=product_name, since=since,
+                                 until=until, limit=limit, resolution=resolution)
+    else:
+        store = open_history_store(backend)
+        results = store.query(sku=sku_id, name=product_name, since=since, until=until, limit=limit,
+                              resolution=resolution)
+        store.close()
     
-    if not price_history:
+    if not results:
         print("❌ 没有价格历史记录")
         return
     
     print("\n📈 价格历史:")
     print("-" * 60)
     
-    for pid, data in price_history.items():
-        if sku_id and pid != sku_id:
-            continue
-        if product_name and data.get('name') != product_name:
-            continue
-        
-        print(f"\n📦 {data['name']} (SKU: {pid})")
+    for item in results:
+        print(f"\n📦 {item['name']} (SKU: {item['sku']})")
         print("-" * 40)
         
-        for record in data['history'][-10:]:  # 最近10条
-            print(f"  {record['time']}: ¥{record['price']:.2f}")
+        for record in item['history']:
+            if resolution == 'raw':
+                print(f"  {record['time']}: ¥{record['price']:.2f}")
+            else:
+                print(f"  {record['time']}: 最低 ¥{record['min']:.2f}  最高 ¥{record['max']:.2f}  "
+                      f"均价 ¥{record['avg']:.2f}  最新 ¥{record['last']:.2f}  ({record['count']} 次)")
         
-        if len(data['history']) > 10:
-            print(f"  ... 共 {len(data['history'])} 条记录")
+        if item['total'] > len(item['history']):
+            print(f"  ... 共 {item['total']} 条记录")
+
+def analyze_history(backend='jsonl', days=None, top=10, ma=20, corr=None, bucket=3600, rebuild=False,
+                    as_json=False):
+    """
+    分析价格历史：波动率排名、最大回撤、移动平均和商品间相关性
+    历史先导出为列式文件（已是最新时跳过），再以内存映射方式读取
+    
+    Args:
+        days: 只分析最近 N 天
+        top: 每个排名显示的商品数
+        ma: 移动平均的样本数
+        corr: 计算两两相关系数的SKU列表
+        bucket: 相关性计算的对齐粒度（秒）
+    """
+    # numpy 导入较慢，只在 analyze 命令中加载
+    import analytics
+    
+    start = time.perf_counter()
+    if analytics.ensure_columns(backend, rebuild=rebuild) and not as_json:
+        print(f"📤 已导出列式历史: {analytics.COLUMNS_DIR}/")
+    columns = analytics.ColumnStore()
+    since = int(time.time()) - days * 86400 if days else None
+    stats = analytics.price_stats(columns, since=since, ma=ma)
+    missing = [sku for sku in corr or [] if sku not in columns.by_sku]
+    correlations = analytics.correlation(columns, [s for s in corr if s in columns.by_sku], since, bucket) \
+        if corr else {}
+    elapsed = time.perf_counter() - start
+    engine = "numpy" if analytics.np is not None else "标准库"
+    
+    if as_json:
+        print(json.dumps({'engine': engine, 'seconds': elapsed, 'samples': columns.samples,
+                          'stats': stats,
+                          'correlation': [{'a': a, 'b': b, 'r': r} for (a, b), r in correlations.items()]},
+                         ensure_ascii=False, indent=2))
+        columns.close()
+        return
+    
+    print(f"\n📊 分析 {len(stats)} 个商品, {sum(s['count'] for s in stats)} 个样本"
+          f"（{engine}, {elapsed:.2f} 秒）")
+    if not stats:
+        print("❌ 没有价格历史记录")
+    rankings = [
+        ("🌊 波动最大（对数收益率标准差）", lambda s: -s['volatility'],
+         lambda s: f"{s['volatility'] * 100:.2f}%  区间 {format_price(s['min'])} ~ {format_price(s['max'])}"),
+        ("📉 最大回撤", lambda s: -s['max_drop_pct'],
+         lambda s: f"{s['max_drop_pct']:.1f}%  最高 {format_price(s['max'])}  现价 {format_price(s['last'])}"),
+        (f"📏 低于 {ma} 次移动平均最多", lambda s: s['ma_gap_pct'],
+         lambda s: f"{s['ma_gap_pct']:+.1f}%  均线 {format_price(s['moving_avg'])}  现价 {format_price(s['last'])}"),
+    ]
+    for title, key, describe in rankings if stats else []:
+        print(f"\n{title}:")
+        print("-" * 60)
+        for item in sorted(stats, key=key)[:top]:
+            print(f"  📦 {item['name']} (SKU: {item['sku']}): {describe(item)}")
+    
+    if corr:
+        print(f"\n🔗 相关系数（按 {bucket} 秒对齐的收益率）:")
+        print("-" * 60)
+        for sku in missing:
+            print(f"  ❌ SKU {sku} 没有历史记录")
+        for (a, b), r in correlations.items():
+            print(f"  {a} ↔ {b}: {f'{r:+.3f}' if r is not None else '样本不足'}")
+    columns.close()
+
+def create_notifier(config, chat_id=None):
+    """按配置创建飞书通知发送器，未配置群聊或无法加载 feishu-task 时返回 None"""
+    chat_id = chat_id or config.get('notify_chat')
+    if not chat_id:
+        return None
+    try:
+        return Notifier(chat_id, chats=config.get('notify_chats'),
+                        window=config.get('notify_window', NOTIFY_WINDOW))
+    except ImportError as e:
+        print(f"⚠️ 无法加载 feishu-task，飞书通知已关闭: {e}")
+        return None
+
+def send_test_notification(config, chat_id=None, text=None):
+    """发送一条测试消息，检查飞书通知配置"""
+    notifier = create_notifier(config, chat_id)
+    if notifier is None:
+        print("❌ 未配置通知群聊（config.json 的 notify_chat 或 --notify-chat）")
+        sys.exit(1)
+    ok, error = notifier.send_now(text or "🖥️ 内存条价格监控器: 飞书通知测试")
+    notifier.close()
+    if ok:
+        print(f"✅ 已发送到 {notifier.chat_id}")
+    else:
+        print(f"❌ 发送失败: {error}")
+        sys.exit(1)
+
+def parse_time_arg(value):
+    """解析命令行时间参数，支持 YYYY-MM-DD 和 YYYY-MM-DD HH:MM[:SS]"""
+    for fmt in (TIME_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).strftime(TIME_FORMAT)
+        except ValueError:
+            continue
+    print(f"❌ 无法解析时间: {value}（格式: YYYY-MM-DD [HH:MM[:SS]]）")
+    sys.exit(1)
+
+def pop_option(args, name, default=None, cast=str):
+    """从参数列表中取出 `--name 值` 形式的选项"""
+    if name in args:
+        i = args.index(name)
+        if i + 1 >= len(args):
+            print(f"❌ 选项 {name} 缺少参数值")
+            sys.exit(1)
+        value = args[i + 1]
+        del args[i:i + 2]
+        return cast(value)
+    return default
 
 def main():
     """主函数"""
@@ -246,8 +1269,64 @@ def main():
   list             列出所有监控商品
   history          显示价格历史
   history <SKU>    显示指定商品历史
+    --since <时间>   只显示该时间之后的记录（YYYY-MM-DD [HH:MM]）
+    --until <时间>   只显示该时间之前的记录
+    --limit <N>      每个商品显示的记录数（默认10）
+    --resolution <粒度>  raw（原始样本，默认）、hour 或 day（汇总）
+  migrate <源> <目标>  迁移历史数据，如 migrate jsonl sqlite
+  analyze          分析价格历史（波动率、最大回撤、移动平均、相关性）
+    --days <N>       只分析最近 N 天
+    --top <N>        每个排名显示的商品数（默认10）
+    --ma <N>         移动平均的样本数（默认20）
+    --corr <SKU,SKU,...>  计算这些商品之间的相关系数
+    --bucket <秒>    相关性计算的对齐粒度（默认3600）
+    --rebuild        重新导出列式历史
+    --json           以 JSON 输出全部统计
+  shards           显示分片成员和商品分配
+  cache            显示价格缓存统计（cache clear 清空缓存）
+  alerts           列出提醒规则
+  notify [文本]    发送一条飞书测试消息
+  alert <SKU> <类型> [参数]  添加提醒规则，类型:
+                   below/above <价格>、drop_from_max/rise_from_min <百分比> <窗口秒数>、
+                   sustained <百分比（负数为下跌）> <窗口秒数>、all_time_low
   init             初始化配置文件
 
+选项:
+  --workers <N>    并发抓取线程数（默认8）
+  --pool-size <N>  每个域名的长连接数上限（默认8）
+  --adaptive       按SKU自适应调整检查间隔（monitor）
+  --min-interval <秒>  自适应模式的最短间隔（默认60）
+  --max-interval <秒>  自适应模式的最长间隔（默认1800）
+  --store <类型>   历史存储后端: jsonl（默认，追加写入）、sqlite（带索引）或 json（旧版整文件）
+  --metrics-port <端口>  在 127.0.0.1 上提供 Prometheus /metrics 接口（monitor）
+  --metrics-file <文件>  每个周期把指标写入文件，供 node_exporter textfile collector 采集
+  --profile <N>    对前 N 个检查周期做 cProfile/tracemalloc 剖析（monitor）
+  --shard <名称>   以分片模式运行 monitor，只检查一致性哈希分配给本分片的商品
+  --processes <N>  启动 N 个分片监控进程（monitor）
+  --shards         check/history 合并读取所有分片的历史（check 不请求接口）
+  --shard-root <目录>  分片数据目录（默认 shards）
+  --max-age <秒>   check 可接受的缓存价格时长（默认为缓存有效期）
+  --no-cache       不使用价格缓存
+  --notify-chat <chat_id>  把价格变化和提醒推送到该飞书群聊（monitor/notify）
+
+配置项 (config.json):
+  workers          并发抓取线程数
+  pool_size        每个域名的长连接数上限
+  history_backend  历史存储后端 (jsonl/sqlite/json)
+  adaptive         是否启用自适应调度 (true/false)
+  min_interval     自适应模式的最短间隔（秒）
+  max_interval     自适应模式的最长间隔（秒）
+  rate_limits      各域名限速，如 {"p.3.cn": 10, "api.m.jd.com": 5}（次/秒）
+  metrics_port     /metrics 接口端口
+  metrics_file     指标文件路径
+  shard_root       分片数据目录
+  cache_ttl        价格缓存有效期（秒，默认60，0 表示关闭）
+  cache_size       价格缓存最大条目数（默认100000）
+  alerts           提醒规则列表，如 [{"sku": "100026643164", "type": "below", "price": 399}]
+  notify_chat      飞书通知群聊 chat_id（应用凭证读取自 ~/.openclaw/openclaw.json）
+  notify_window    通知合并窗口（秒，默认60）
+  notify_chats     按订阅者指定群聊，如 {"张三": "oc_xxx"}
+
 示例:
   python3 ram_monitor.py monitor          # 启动监控
   python3 ram_monitor.py check           # 检查一次价格
@@ -262,29 +1341,150 @@ def main():
         sys.exit(0)
     
     command = sys.argv[1].lower()
+    args = sys.argv[2:]
+    raw_args = list(args)
     
     # 加载配置
     config = load_config()
+    set_rate_limits(config.get('rate_limits', {}))
+    workers = pop_option(args, '--workers', config.get('workers', DEFAULT_WORKERS), int)
+    configure_pool(pop_option(args, '--pool-size', config.get('pool_size', DEFAULT_POOL_SIZE), int))
+    backend = pop_option(args, '--store', config.get('history_backend', 'jsonl'))
+    if backend not in BACKENDS:
+        print(f"❌ 未知的历史存储后端: {backend}（可选: {', '.join(BACKENDS)}）")
+        sys.exit(1)
+    metrics_file = pop_option(args, '--metrics-file', config.get('metrics_file'))
+    shard_root = pop_option(args, '--shard-root', config.get('shard_root', SHARD_ROOT))
+    cache_ttl = config.get('cache_ttl', CACHE_TTL)
+    if '--no-cache' in args:
+        args.remove('--no-cache')
+        cache_ttl = 0
+    # 查看和清空缓存时不创建新的缓存文件
+    elif command in ('monitor', 'check') or (command == 'cache' and os.path.exists(CACHE_FILE)):
+        configure_cache(cache_ttl, config.get('cache_size', CACHE_SIZE))
+    notify_chat = pop_option(args, '--notify-chat', None)
+    sharded = '--shards' in args
+    if sharded:
+        args.remove('--shards')
     
     if command == "monitor":
-        interval = int(sys.argv[2]) if len(sys.argv) > 2 else 300
-        monitor_price(config.get('products', {}), interval)
+        processes = pop_option(args, '--processes', 0, int)
+        if processes:
+            pop_option(raw_args, '--processes')
+            run_shard_processes(processes, raw_args, shard_root)
+            return
+        shard_name = pop_option(args, '--shard', None)
+        adaptive = None
+        min_interval = pop_option(args, '--min-interval', config.get('min_interval', 60), int)
+        max_interval = pop_option(args, '--max-interval', config.get('max_interval', 1800), int)
+        if '--adaptive' in args:
+            args.remove('--adaptive')
+            adaptive = (min_interval, max_interval)
+        elif config.get('adaptive'):
+            adaptive = (min_interval, max_interval)
+        if adaptive and not 0 < min_interval <= max_interval:
+            print("❌ 自适应间隔需满足 0 < min-interval <= max-interval")
+            sys.exit(1)
+        metrics_port = pop_option(args, '--metrics-port', config.get('metrics_port'), int)
+        profile = pop_option(args, '--profile', 0, int)
+        if metrics_port:
+            start_metrics_server(metrics_port)
+            print(f"📈 指标接口: http://127.0.0.1:{metrics_port}/metrics")
+        shard = None
+        if shard_name:
+            try:
+                shard = ShardMember(shard_name, shard_root)
+            except ShardBusy:
+                print(f"❌ 分片 {shard_name} 已由其他进程运行")
+                sys.exit(1)
+        engine, errors = AlertEngine.from_config(config.get('alerts', []))
+        for i, error in errors:
+            print(f"⚠️ 忽略第 {i} 条提醒规则: {error}")
+        interval = int(args[0]) if args else 300
+        monitor_price(config.get('products', {}), interval, workers=workers, backend=backend,
+                      adaptive=adaptive, metrics_file=metrics_file, profile=profile, shard=shard,
+                      alerts=engine, notifier=create_notifier(config, notify_chat))
     
     elif command == "check":
-        check_price_once(config.get('products', {}))
+        if sharded:
+            check_sharded(config.get('products', {}), shard_root, backend)
+        else:
+            max_age = pop_option(args, '--max-age', None, int)
+            check_price_once(config.get('products', {}), workers=workers, metrics_file=metrics_file,
+                             max_age=max_age)
     
     elif command == "add":
-        if len(sys.argv) < 4:
+        if len(args) < 2:
             print("❌ 用法: python3 ram_monitor.py add <名称> <SKU_ID>")
             sys.exit(1)
-        add_product(config, sys.argv[2], sys.argv[3])
+        add_product(config, args[0], args[1])
     
     elif command == "list":
         list_products(config)
     
     elif command == "history":
-        sku_id = sys.argv[2] if len(sys.argv) > 2 else None
-        show_history(sku_id=sku_id)
+        since = pop_option(args, '--since', None, parse_time_arg)
+        until = pop_option(args, '--until', None, parse_time_arg)
+        limit = pop_option(args, '--limit', 10, int)
+        resolution = pop_option(args, '--resolution', 'raw')
+        if resolution != 'raw' and resolution not in ROLLUPS:
+            print(f"❌ 未知的粒度: {resolution}（可选: raw, {', '.join(ROLLUPS)}）")
+            sys.exit(1)
+        sku_id = args[0] if args else None
+        show_history(sku_id=sku_id, backend=backend, since=since, until=until, limit=limit,
+                     resolution=resolution, shard_root=shard_root if sharded else None)
+    
+    elif command == "migrate":
+        if len(args) < 2 or args[0] not in BACKENDS or args[1] not in BACKENDS:
+            print(f"❌ 用法: python3 ram_monitor.py migrate <源> <目标>（可选: {', '.join(BACKENDS)}）")
+            sys.exit(1)
+        count = migrate_history(args[0], args[1])
+        print(f"✅ 已迁移 {count} 条记录: {args[0]} → {args[1]}")
+    
+    elif command == "analyze":
+        days = pop_option(args, '--days', None, int)
+        top = pop_option(args, '--top', 10, int)
+        ma = pop_option(args, '--ma', 20, int)
+        corr = pop_option(args, '--corr', None, lambda v: [s.strip() for s in v.split(',') if s.strip()])
+        bucket = pop_option(args, '--bucket', 3600, int)
+        rebuild = '--rebuild' in args
+        if rebuild:
+            args.remove('--rebuild')
+        as_json = '--json' in args
+        if as_json:
+            args.remove('--json')
+        if ma < 1 or bucket < 1:
+            print("❌ --ma 和 --bucket 必须大于0")
+            sys.exit(1)
+        analyze_history(backend, days=days, top=top, ma=ma, corr=corr, bucket=bucket, rebuild=rebuild,
+                        as_json=as_json)
+    
+    elif command == "alerts":
+        list_alerts(config)
+    
+    elif command == "alert":
+        if len(args) < 2:
+            print("❌ 用法: python3 ram_monitor.py alert <SKU_ID> <类型> [参数]")
+            sys.exit(1)
+        add_alert(config, args[0], args[1], args[2:])
+    
+    elif command == "notify":
+        send_test_notification(config, notify_chat, " ".join(args) or None)
+    
+    elif command == "cache":
+        if not price_cache:
+            if cache_ttl <= 0:
+                print("💾 价格缓存未启用")
+            else:
+                print(f"💾 还没有价格缓存（{CACHE_FILE} 不存在）")
+        elif args and args[0] == 'clear':
+            price_cache.clear()
+            print("✅ 已清空价格缓存")
+        else:
+            print_cache_stats(detail=True)
+    
+    elif command == "shards":
+        show_shards(config.get('products', {}), shard_root)
     
     elif command == "init":
         save_config({"products": DEFAULT_PRODUCTS})
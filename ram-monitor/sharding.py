@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+分片监控
+多个监控进程（或共享同一目录的多台主机）用一致性哈希分担商品，
+每个分片在 shards/<名称>/ 下维护自己的历史存储。
+成员关系只依赖本地文件：每个分片持有自己目录下 lock 文件的排他锁，
+并定期写入 shards/members/<名称>.json 心跳；心跳超时的成员视为离线。
+"""
+
+import fcntl, hashlib, json, os, socket, threading, time
+from bisect import bisect_right
+
+from history_store import BACKEND_PATHS, open_history_store
+
+# 分片数据根目录
+SHARD_ROOT = "shards"
+# 每个分片在哈希环上的虚拟节点数，越多分布越均匀
+VIRTUAL_NODES = 160
+# 心跳超时（秒），超过后该分片的商品由其他分片接管
+HEARTBEAT_TTL = 90
+
+MEMBERS_DIR = "members"
+
+def hash_key(key):
+    """稳定的 64 位哈希（不受 PYTHONHASHSEED 影响，跨进程、跨主机一致）"""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+class HashRing:
+    """
+    一致性哈希环
+    每个节点映射为 vnodes 个虚拟节点，键归属于顺时针方向的第一个虚拟节点。
+    增加或删除一个节点时，只有约 1/N 的键改变归属。
+    """
+    def __init__(self, nodes=(), vnodes=VIRTUAL_NODES):
+        self.nodes = sorted(set(nodes))
+        self.vnodes = vnodes
+        points = sorted((hash_key(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self.points = [p for p, _ in points]
+        self.owners = [node for _, node in points]
+
+    def node_for(self, key):
+        """键所属的节点，环为空时返回 None"""
+        if not self.points:
+            return None
+        i = bisect_right(self.points, hash_key(str(key))) % len(self.points)
+        return self.owners[i]
+
+    def assign(self, keys):
+        """把一组键分配到各节点，返回 {节点: [键]}"""
+        result = {node: [] for node in self.nodes}
+        for key in keys:
+            node = self.node_for(key)
+            if node is not None:
+                result[node].append(key)
+        return result
+
+class ShardBusy(Exception):
+    """同名分片已由其他进程持有"""
+
+def members_path(root):
+    return os.path.join(root, MEMBERS_DIR)
+
+def live_members(root=SHARD_ROOT, ttl=HEARTBEAT_TTL):
+    """读取心跳未超时的成员，返回 {名称: 心跳信息}"""
+    path = members_path(root)
+    members = {}
+    if not os.path.isdir(path):
+        return members
+    now = time.time()
+    for fn in os.listdir(path):
+        if not fn.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(path, fn)) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            continue  # 正在替换或已删除
+        if now - info.get('heartbeat', 0) <= ttl:
+            members[info['name']] = info
+    return members
+
+def shard_names(root=SHARD_ROOT):
+    """所有有数据目录的分片（包括已离线的）"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root)
+                  if d != MEMBERS_DIR and os.path.isdir(os.path.join(root, d)))
+
+class ShardMember:
+    """
+    一个分片进程的成员身份
+    创建时获取 shards/<名称>/lock 的排他锁，后台线程每 ttl/3 秒写一次心跳；
+    refresh() 按当前在线成员重建哈希环，owns() 判断商品是否归本分片。
+    """
+    def __init__(self, name, root=SHARD_ROOT, ttl=HEARTBEAT_TTL, vnodes=VIRTUAL_NODES):
+        self.name = name
+        self.root = root
+        self.ttl = ttl
+        self.vnodes = vnodes
+        self.path = os.path.join(root, name)
+        os.makedirs(self.path, exist_ok=True)
+        os.makedirs(members_path(root), exist_ok=True)
+
+        self.lock_file = open(os.path.join(self.path, 'lock'), 'w')
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock_file.close()
+            raise ShardBusy(name)
+
+        self.started = time.time()
+        self.stats = {}
+        self.members = ()
+        self.ring = HashRing([name], vnodes)
+        self.stopped = threading.Event()
+        self.heartbeat()
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+
+    def heartbeat(self):
+        """写入心跳文件（先写临时文件再原子替换）"""
+        info = {'name': self.name, 'host': socket.gethostname(), 'pid': os.getpid(),
+                'started': self.started, 'heartbeat': time.time()}
+        info.update(self.stats)
+        path = os.path.join(members_path(self.root), f"{self.name}.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(info, f)
+        os.replace(tmp, path)
+
+    def _heartbeat_loop(self):
+        while not self.stopped.wait(self.ttl / 3):
+            try:
+                self.heartbeat()
+            except OSError as e:
+                print(f"⚠️ 分片心跳写入失败: {e}")
+
+    def refresh(self):
+        """
+        按在线成员重建哈希环
+
+        Returns:
+            成员是否发生变化
+        """
+        members = tuple(sorted(set(live_members(self.root, self.ttl)) | {self.name}))
+        if members == self.members:
+            return False
+        self.members = members
+        self.ring = HashRing(members, self.vnodes)
+        return True
+
+    def owns(self, sku_id):
+        return self.ring.node_for(str(sku_id)) == self.name
+
+    def leave(self):
+        """退出：停止心跳、删除成员文件并释放锁"""
+        self.stopped.set()
+        try:
+            os.remove(os.path.join(members_path(self.root), f"{self.name}.json"))
+        except OSError:
+            pass
+        self.lock_file.close()
+
+# ============ 跨分片视图 ============
+
+def _merge_rollups(records):
+    """合并不同分片中同一时间桶的汇总（SKU迁移时同一桶可能分布在两个分片）"""
+    merged = {}
+    for r in records:
+        m = merged.get(r['time'])
+        if m is None:
+            merged[r['time']] = dict(r)
+            continue
+        total = (m['avg'] or 0) * m['count'] + (r['avg'] or 0) * r['count']
+        m['min'] = min(m['min'], r['min'])
+        m['max'] = max(m['max'], r['max'])
+        m['count'] += r['count']
+        m['avg'] = total / m['count'] if m['count'] else None
+        m['last'] = r['last']
+    return [merged[t] for t in sorted(merged)]
+
+def shard_stores(root=SHARD_ROOT, backend='jsonl'):
+    """
+    逐个打开已有历史数据的分片存储，产生 (分片名, store)，由调用方关闭
+    还没有写入过该后端数据的分片跳过（只读查询不创建目录和空存储）
+    """
+    for shard in shard_names(root):
+        path = os.path.join(root, shard)
+        if os.path.exists(os.path.join(path, BACKEND_PATHS[backend])):
+            yield shard, open_history_store(backend, root=path)
+
+def merged_history(root=SHARD_ROOT, backend='jsonl', sku=None, name=None, since=None, until=None,
+                   limit=10, resolution='raw'):
+    """
+    跨所有分片查询历史，同一商品在多个分片中的记录按时间合并
+    返回格式与 store.query 相同
+    """
+    items = {}
+    for _, store in shard_stores(root, backend):
+        results = store.query(sku=sku, name=name, since=since, until=until, limit=limit,
+                              resolution=resolution)
+        store.close()
+        for item in results:
+            merged = items.get(item['sku'])
+            if merged is None:
+                items[item['sku']] = dict(item, history=list(item['history']))
+            else:
+                merged['history'].extend(item['history'])
+                merged['total'] += item['total']
+
+    for item in items.values():
+        if resolution == 'raw':
+            item['history'].sort(key=lambda r: r['time'])
+        else:
+            item['history'] = _merge_rollups(sorted(item['history'], key=lambda r: r['time']))
+        if limit:
+            item['history'] = item['history'][-limit:]
+    return [items[s] for s in sorted(items)]
+
+def latest_prices(root=SHARD_ROOT, backend='jsonl'):
+    """各商品在所有分片中最新的价格，返回 {SKU_ID: (时间戳, 价格, 分片名)}"""
+    latest = {}
+    for shard, store in shard_stores(root, backend):
+        for sku, entry in store.load().items():
+            last = entry['history'].last()
+            if last and (sku not in latest or last[0] > latest[sku][0]):
+                latest[sku] = (last[0], last[1], shard)
+        store.close()
+    return latest
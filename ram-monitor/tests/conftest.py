@@ -0,0 +1,4 @@
+import os, sys
+
+# 测试直接导入 ram-monitor 目录下的模块（与脚本运行方式相同）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
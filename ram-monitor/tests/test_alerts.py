@@ -0,0 +1,105 @@
+import pytest
+
+from alerts import AlertEngine, RollingWindow, parse_rule
+from history_store import new_entry, record_sample
+
+SKU = '100001'
+
+def engine_for(*rules):
+    engine, errors = AlertEngine.from_config([dict(rule, sku=SKU) for rule in rules])
+    assert errors == []
+    return engine
+
+def step(engine, old, new, now):
+    """提交一次价格变化，返回触发的规则类型"""
+    alerts = engine.evaluate([(SKU, '内存条', old, new, 0)], now)
+    return [a['rule'].type for a in alerts]
+
+@pytest.mark.parametrize('data, message', [
+    ({'sku': SKU, 'type': 'cheaper'}, '未知的规则类型'),
+    ({'type': 'below', 'price': 100}, '缺少 sku'),
+    ({'sku': SKU, 'type': 'below'}, '缺少 price'),
+    ({'sku': SKU, 'type': 'drop_from_max', 'percent': 10}, '缺少 percent 或 window'),
+    ({'sku': SKU, 'type': 'sustained', 'percent': 0, 'window': 60}, 'percent 不能为0'),
+    ({'sku': SKU, 'type': 'rise_from_min', 'percent': 5, 'window': 0}, 'window 必须大于0'),
+])
+def test_parse_rule_rejects_invalid(data, message):
+    with pytest.raises(ValueError, match=message):
+        parse_rule(data, 1)
+
+def test_parse_rule_normalizes_values():
+    rule = parse_rule({'sku': 100001, 'type': 'drop_from_max', 'percent': -10, 'window': '3600'}, 1)
+    assert (rule.sku, rule.percent, rule.window) == (SKU, 10.0, 3600)
+    assert parse_rule({'sku': SKU, 'type': 'sustained', 'percent': -5, 'window': 60}, 2).percent == -5.0
+
+def test_from_config_skips_invalid_rules():
+    engine, errors = AlertEngine.from_config([
+        {'sku': SKU, 'type': 'below', 'price': 100},
+        {'sku': SKU, 'type': 'below'},
+        {'sku': SKU, 'type': 'below', 'price': 'abc'},
+    ])
+    assert [r.id for r in engine.rules] == [1]
+    assert [i for i, _ in errors] == [2, 3]
+
+def test_below_and_above_fire_only_when_crossed():
+    engine = engine_for({'type': 'below', 'price': 100}, {'type': 'below', 'price': 90},
+                        {'type': 'above', 'price': 120})
+    assert step(engine, 110, 95, 1000) == ['below']
+    assert step(engine, 95, 96, 1060) == []
+    assert step(engine, 96, 80, 1120) == ['below']
+    assert step(engine, 80, 130, 1180) == ['above']
+    assert step(engine, 130, 125, 1240) == []
+
+def test_crossing_several_thresholds_at_once():
+    engine = engine_for(*({'type': 'below', 'price': p} for p in (100, 90, 80, 70)))
+    alerts = engine.evaluate([(SKU, '内存条', 95, 75, 0)], 1000)
+    assert sorted(a['rule'].price for a in alerts) == [80, 90]
+
+def test_drop_from_max_uses_window_and_fires_once():
+    engine = engine_for({'type': 'drop_from_max', 'percent': 10, 'window': 3600})
+    assert step(engine, 100, 95, 1000) == []
+    assert step(engine, 95, 89, 1100) == ['drop_from_max']
+    assert step(engine, 89, 88, 1200) == []        # 仍满足条件，不重复提醒
+    assert step(engine, 88, 100, 1300) == []       # 条件解除
+    assert step(engine, 100, 89, 1400) == ['drop_from_max']
+
+def test_rolling_window_keeps_price_valid_at_window_start():
+    window = RollingWindow(100)
+    window.add(0, 200)
+    window.add(50, 150)
+    window.add(180, 120)
+    # 200 已移出窗口，但 150 在窗口起点 (80) 时仍然有效
+    assert window.max() == 150
+    assert window.min() == 120
+
+def test_rise_from_min():
+    engine = engine_for({'type': 'rise_from_min', 'percent': 20, 'window': 600})
+    assert step(engine, 100, 80, 1000) == []
+    assert step(engine, 80, 97, 1100) == ['rise_from_min']
+
+def test_all_time_low_includes_seeded_history():
+    engine = engine_for({'type': 'all_time_low'})
+    entry = new_entry('内存条')
+    for ts, price in ((100, 90.0), (200, 110.0)):
+        record_sample(entry, ts, price)
+    engine.seed({SKU: entry})
+    assert step(engine, 110, 95, 1000) == []
+    assert step(engine, 95, 85, 1100) == ['all_time_low']
+
+def test_sustained_fires_after_window_unless_interrupted():
+    engine = engine_for({'type': 'sustained', 'percent': -10, 'window': 600})
+    assert step(engine, 100, 88, 1000) == []
+    assert engine.evaluate([], 1300) == []
+    alerts = engine.evaluate([], 1600)
+    assert [a['rule'].type for a in alerts] == ['sustained']
+    assert '下跌 12.0%' in alerts[0]['message']
+    assert engine.evaluate([], 2000) == []
+
+    engine = engine_for({'type': 'sustained', 'percent': -10, 'window': 600})
+    step(engine, 100, 88, 1000)
+    step(engine, 88, 99, 1300)                     # 回升，条件被打断
+    assert engine.evaluate([], 1600) == []
+
+def test_changes_for_other_skus_are_ignored():
+    engine = engine_for({'type': 'below', 'price': 100})
+    assert engine.evaluate([('999', '其他', 120, 50, 0)], 1000) == []
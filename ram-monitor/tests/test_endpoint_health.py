@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import ram_monitor
+from ram_monitor import EndpointHealth, parse_backup_response
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(ram_monitor.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_consecutive_failures_open_breaker(clock):
+    health = EndpointHealth('测试', 'example.com')
+    for _ in range(EndpointHealth.FAILURE_STREAK - 1):
+        health.record(False)
+    assert health.state == 'closed' and health.allow()
+    health.record(False)
+    assert health.state == 'open'
+    assert not health.allow()
+
+def test_failure_rate_opens_breaker(clock):
+    health = EndpointHealth('测试', 'example.com')
+    for i in range(EndpointHealth.MIN_SAMPLES):
+        health.record(i % 2 == 0, 0.01)
+    assert health.state == 'open'
+
+def test_half_open_probe_success_closes(clock):
+    health = EndpointHealth('测试', 'example.com')
+    for _ in range(EndpointHealth.FAILURE_STREAK):
+        health.record(False)
+    clock[0] += EndpointHealth.OPEN_SECONDS
+    assert health.allow()
+    assert health.state == 'half_open'
+    assert not health.allow()  # 只放行一个试探请求
+    health.record(True, 0.01)
+    assert health.state == 'closed'
+    assert health.success_rate() == 1.0
+    assert [(old, new) for _, old, new in health.pop_transitions()] == [
+        ('closed', 'open'), ('open', 'half_open'), ('half_open', 'closed')]
+
+def test_half_open_probe_failure_reopens(clock):
+    health = EndpointHealth('测试', 'example.com')
+    for _ in range(EndpointHealth.FAILURE_STREAK):
+        health.record(False)
+    clock[0] += EndpointHealth.OPEN_SECONDS
+    assert health.allow()
+    health.record(False)
+    assert health.state == 'open'
+    assert not health.allow()
+
+@pytest.mark.parametrize('data, expected', [
+    ({'code': 0, 'price': {'p': '199.00'}}, 199.0),
+    ({'code': 0, 'price': {'p': 259}}, 259.0),
+    ({'code': 0}, None),
+    ({'code': 0, 'price': {}}, None),
+    ({'code': 0, 'price': {'p': 'abc'}}, None),
+    ({'code': 0, 'price': {'p': 'nan'}}, None),
+    ({'code': 0, 'price': '199'}, None),
+    ([], None),
+])
+def test_parse_backup_response(data, expected):
+    assert parse_backup_response(data) == expected
+
+def test_backup_without_price_counts_as_failure(monkeypatch):
+    """备用接口返回了 JSON 但没有价格时记为失败，连续出现时熔断"""
+    primary = EndpointHealth('比价API', 'p.3.cn')
+    primary.state = 'open'
+    primary.opened_at = float('inf')  # 主接口一直熔断，直接走备用接口
+    backup = EndpointHealth('备用API', 'api.m.jd.com')
+    monkeypatch.setitem(ram_monitor.ENDPOINTS, 'mgets', primary)
+    monkeypatch.setitem(ram_monitor.ENDPOINTS, 'backup', backup)
+    monkeypatch.setattr(ram_monitor, 'get_rate_limiter', lambda host: None)
+    body = [json.dumps({'code': 0}).encode()]
+    monkeypatch.setattr(ram_monitor.http_pool, 'request', lambda url, headers, timeout: body[0])
+
+    for _ in range(EndpointHealth.FAILURE_STREAK):
+        assert ram_monitor.get_jd_price('3') is None
+    assert backup.state == 'open'
+
+    body[0] = json.dumps({'code': 0, 'price': {'p': '202.00'}}).encode()
+    backup.opened_at -= EndpointHealth.OPEN_SECONDS
+    assert ram_monitor.get_jd_price('3') == 202.0
+    assert backup.state == 'closed'
@@ -0,0 +1,163 @@
+import json, sqlite3, time
+
+import pytest
+
+import history_store
+from history_store import (bucket_start, from_epoch, migrate_history, new_entry, open_history_store,
+                           record_sample, to_epoch)
+
+SAMPLES = [
+    ('100001', '内存条A', '2026-10-01 10:05:00', 299.0),
+    ('100001', '内存条A', '2026-10-01 10:35:00', 289.0),
+    ('100001', '内存条A', '2026-10-01 11:05:00', 309.0),
+    ('100002', '内存条B', '2026-10-01 10:05:00', 599.0),
+    ('100002', '内存条B', '2026-10-02 09:00:00', 579.0),
+]
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """存储使用当前目录下的默认文件名"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def observe(store, samples):
+    """按监控周期的方式记录样本：先更新内存历史，再追加写入存储"""
+    price_history = store.load()
+    for sku, name, ts, price in samples:
+        entry = price_history.get(sku)
+        if entry is None:
+            entry = price_history[sku] = new_entry(name, store.max_history,
+                                                   rollups=not isinstance(store, history_store.SQLiteHistoryStore))
+        record_sample(entry, to_epoch(ts), price)
+    store.append(samples)
+
+def raw_history(store, sku):
+    return [(r['time'], r['price']) for r in store.query(sku=sku, limit=None)[0]['history']]
+
+def expected(sku):
+    return [(ts, price) for s, _, ts, price in SAMPLES if s == sku]
+
+@pytest.mark.parametrize('backend', ['json', 'jsonl', 'sqlite'])
+def test_round_trip(backend):
+    store = open_history_store(backend)
+    observe(store, SAMPLES)
+    store.close()
+
+    store = open_history_store(backend)
+    store.load()
+    for sku in ('100001', '100002'):
+        assert raw_history(store, sku) == expected(sku)
+    hours = store.query(sku='100001', resolution='hour', limit=None)[0]['history']
+    assert [(h['min'], h['max'], h['count'], h['last']) for h in hours] == [
+        (289.0, 299.0, 2, 289.0), (309.0, 309.0, 1, 309.0)]
+    days = store.query(sku='100002', resolution='day', limit=None)[0]['history']
+    assert [d['time'][:10] for d in days] == ['2026-10-01', '2026-10-02']
+    store.close()
+
+def test_jsonl_compact_keeps_history_and_rollups():
+    store = open_history_store('jsonl')
+    observe(store, SAMPLES[:3])
+    store.compact()
+    observe(store, SAMPLES[3:])
+    store.close()
+
+    store = open_history_store('jsonl')
+    history = store.load()
+    assert raw_history(store, '100001') == expected('100001')
+    assert raw_history(store, '100002') == expected('100002')
+    assert sum(row[4] for row in history['100001']['rollups']['hour']) == 3
+
+def test_query_time_range():
+    store = open_history_store('sqlite')
+    observe(store, SAMPLES)
+    result = store.query(sku='100001', since='2026-10-01 10:30:00', until='2026-10-01 11:00:00')
+    assert result[0]['total'] == 1
+    assert result[0]['history'] == [{'time': '2026-10-01 10:35:00', 'price': 289.0}]
+    store.close()
+
+@pytest.mark.parametrize('target', ['jsonl', 'sqlite'])
+def test_migrate_from_json_does_not_duplicate(target):
+    store = open_history_store('json')
+    observe(store, SAMPLES)
+
+    assert migrate_history('json', target) == len(SAMPLES)
+    if target == 'sqlite':
+        db = sqlite3.connect(history_store.HISTORY_DB)
+        assert db.execute("SELECT COUNT(*) FROM prices").fetchone()[0] == len(SAMPLES)
+        db.close()
+    dst = open_history_store(target, max_history=None)
+    dst.load()
+    assert raw_history(dst, '100001') == expected('100001')
+    hours = dst.query(sku='100001', resolution='hour', limit=None)[0]['history']
+    assert sum(h['count'] for h in hours) == 3
+    dst.close()
+
+def test_legacy_json_is_imported_once():
+    with open(history_store.HISTORY_FILE, 'w') as f:
+        json.dump({'100001': {'name': '内存条A', 'history': [
+            {'time': ts, 'price': price} for sku, _, ts, price in SAMPLES if sku == '100001']}}, f)
+    store = open_history_store('sqlite')
+    store.close()
+    store = open_history_store('sqlite')
+    store.load()
+    assert raw_history(store, '100001') == expected('100001')
+    store.close()
+
+@pytest.fixture
+def new_york(monkeypatch):
+    """切换到有夏令时的时区（2026-03-08 02:00 开始，2026-11-01 02:00 结束）"""
+    if not hasattr(time, 'tzset'):
+        pytest.skip("平台不支持 time.tzset")
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    to_epoch.cache_clear()
+    bucket_start.cache_clear()
+    if time.localtime(to_epoch('2026-07-01 12:00:00')).tm_gmtoff != -4 * 3600:
+        pytest.skip("系统缺少 America/New_York 时区数据")
+    yield
+    monkeypatch.undo()
+    time.tzset()
+    to_epoch.cache_clear()
+    bucket_start.cache_clear()
+
+@pytest.mark.parametrize('ts, hour, day', [
+    ('2026-03-08 01:30:00', '2026-03-08 01:00:00', '2026-03-08 00:00:00'),
+    ('2026-03-08 03:30:00', '2026-03-08 03:00:00', '2026-03-08 00:00:00'),
+    ('2026-03-08 23:59:00', '2026-03-08 23:00:00', '2026-03-08 00:00:00'),
+    ('2026-03-09 00:30:00', '2026-03-09 00:00:00', '2026-03-09 00:00:00'),
+    ('2026-11-01 12:00:00', '2026-11-01 12:00:00', '2026-11-01 00:00:00'),
+])
+def test_buckets_follow_local_time_across_dst(new_york, ts, hour, day):
+    epoch = to_epoch(ts)
+    assert from_epoch(bucket_start(epoch, 3600)) == hour
+    assert from_epoch(bucket_start(epoch, 86400)) == day
+
+def test_dst_day_bucket_length(new_york):
+    start = bucket_start(to_epoch('2026-03-08 12:00:00'), 86400)
+    end = bucket_start(to_epoch('2026-03-09 12:00:00'), 86400)
+    assert end - start == 23 * 3600
+
+def test_sqlite_duplicate_samples_are_counted_once():
+    store = open_history_store('sqlite')
+    observe(store, SAMPLES[:2] + SAMPLES[:1])
+    observe(store, SAMPLES[:3])
+    store.close()
+
+    store = open_history_store('sqlite')
+    store.load()
+    assert raw_history(store, '100001') == expected('100001')
+    hours = store.query(sku='100001', resolution='hour', limit=None)[0]['history']
+    assert [(h['count'], h['min'], h['max']) for h in hours] == [(2, 289.0, 299.0), (1, 309.0, 309.0)]
+    store.close()
+
+def test_sqlite_name_follows_latest_sample():
+    store = open_history_store('sqlite')
+    store.append([('100001', '新名称', '2026-10-02 10:00:00', 299.0),
+                  ('100001', '旧名称', '2026-10-01 10:00:00', 289.0)])
+    assert store.query(sku='100001')[0]['name'] == '新名称'
+    # 补录更早的样本不覆盖商品名，更新的样本会覆盖
+    store.append([('100001', '更旧的名称', '2026-09-30 10:00:00', 279.0)])
+    assert store.query(sku='100001')[0]['name'] == '新名称'
+    store.append([('100001', '最新名称', '2026-10-03 10:00:00', 309.0)])
+    assert store.query(sku='100001')[0]['name'] == '最新名称'
+    store.close()
@@ -0,0 +1,115 @@
+import gzip, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ram_monitor
+from ram_monitor import HTTPPool, HTTPStatusError
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    /ok       返回 ok
+    /gzip     返回 gzip 压缩的 ok
+    /missing  返回 404
+    /drop     返回 ok 后关闭连接，但不发送 Connection: close（模拟服务端回收空闲连接）
+    /slow     等待 0.05 秒后返回 ok
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        status, body, headers = 200, b"ok", {}
+        if self.path == '/gzip':
+            body = gzip.compress(b"ok")
+            headers['Content-Encoding'] = 'gzip'
+        elif self.path == '/missing':
+            status, body = 404, b"not found"
+        elif self.path == '/slow':
+            with self.server.lock:
+                self.server.active += 1
+                self.server.peak = max(self.server.peak, self.server.active)
+            time.sleep(0.05)
+            with self.server.lock:
+                self.server.active -= 1
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path == '/drop':
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(ram_monitor.urllib.request, 'getproxies', lambda: {})
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    httpd.connections = set()
+    httpd.lock = threading.Lock()
+    httpd.active = httpd.peak = 0
+    threading.Thread(target=httpd.serve_forever, args=(0.01,), daemon=True).start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_connection_is_reused(server):
+    httpd, base = server
+    pool = HTTPPool(size=2)
+    for _ in range(5):
+        assert pool.request(base + '/ok') == b"ok"
+    assert [c['uses'] for c in pool.stats()] == [5]
+    assert len(httpd.connections) == 1
+    pool.close()
+
+def test_gzip_response_is_decompressed(server):
+    _, base = server
+    pool = HTTPPool()
+    assert pool.request(base + '/gzip') == b"ok"
+    pool.close()
+
+def test_error_status_raises_and_keeps_connection(server):
+    httpd, base = server
+    pool = HTTPPool()
+    with pytest.raises(HTTPStatusError) as e:
+        pool.request(base + '/missing')
+    assert e.value.status == 404
+    assert pool.request(base + '/ok') == b"ok"
+    assert len(httpd.connections) == 1
+    pool.close()
+
+def test_stale_connection_is_replaced(server):
+    httpd, base = server
+    pool = HTTPPool()
+    assert pool.request(base + '/drop') == b"ok"
+    time.sleep(0.05)
+    assert pool.request(base + '/ok') == b"ok"
+    assert pool.reconnects == 1
+    assert len(httpd.connections) == 2
+    pool.close()
+
+def test_idle_connections_expire(server):
+    httpd, base = server
+    pool = HTTPPool(idle_timeout=0.01)
+    pool.request(base + '/ok')
+    time.sleep(0.05)
+    pool.request(base + '/ok')
+    assert len(httpd.connections) == 2
+    assert len(pool.stats()) == 1  # 过期的连接已关闭并移出统计
+    pool.close()
+
+def test_pool_size_bounds_concurrent_connections(server):
+    httpd, base = server
+    pool = HTTPPool(size=2)
+    threads = [threading.Thread(target=pool.request, args=(base + '/slow',)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert httpd.peak <= 2
+    assert len(pool.stats()) <= 2
+    assert sum(c['uses'] for c in pool.stats()) == 8
+    pool.close()
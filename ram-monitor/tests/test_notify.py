@@ -0,0 +1,110 @@
+import pytest
+
+import notify
+from notify import Notifier
+
+class FakeFeishu:
+    """替代 feishu_task：send_message 依次返回 results 中的结果，用完后返回成功"""
+    INVALID_TOKEN_CODES = {99991663}
+
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.messages = []
+        self.invalidated = []
+        self.tokens = 0
+
+    def load_config(self):
+        return {'appId': 'cli_test', 'appSecret': 'secret'}
+
+    def get_token(self, app_id, app_secret):
+        self.tokens += 1
+        return f"t-{self.tokens}"
+
+    def invalidate_token(self, app_id, token):
+        self.invalidated.append(token)
+
+    def send_message(self, token, chat_id, text):
+        self.messages.append((token, chat_id, text))
+        return self.results.pop(0) if self.results else {'success': True}
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(notify, 'BACKOFF_BASE', 0.001)
+    monkeypatch.setattr(notify, 'BACKOFF_MAX', 0.002)
+
+def make(feishu, **options):
+    options.setdefault('window', 0.05)
+    return Notifier('oc_main', feishu=feishu, **options)
+
+def test_changes_in_one_window_are_coalesced():
+    feishu = FakeFeishu()
+    notifier = make(feishu)
+    notifier.notify_changes([('1', '内存条', 300.0, 290.0, -3.3), ('2', '硬盘', 500.0, 550.0, 10.0)])
+    notifier.notify_changes([('1', '内存条', 290.0, 280.0, -3.4)])
+    notifier.close()
+    assert len(feishu.messages) == 1
+    _, chat_id, text = feishu.messages[0]
+    assert chat_id == 'oc_main'
+    assert "2 个商品，📉 1 / 📈 1" in text
+    assert "内存条: ¥300.00 → ¥280.00" in text
+    assert notifier.sent == 1
+
+def test_alerts_go_to_subscriber_chat():
+    class Rule:
+        id = 7
+    feishu = FakeFeishu()
+    notifier = Notifier('oc_main', chats={'张三': 'oc_zhang'}, window=0.05, feishu=feishu)
+    notifier.notify_alerts([{'sku': '1', 'rule': Rule(), 'message': "内存条 降到 ¥280.00",
+                             'subscriber': '张三'}])
+    notifier.notify_changes([('1', '内存条', 300.0, 280.0, -6.7)])
+    notifier.close()
+    chats = {chat_id: text for _, chat_id, text in feishu.messages}
+    assert "🔔 价格提醒 (1 条)" in chats['oc_zhang']
+    assert "价格提醒" not in chats['oc_main']
+
+def test_close_sends_pending_messages_without_waiting_for_window():
+    feishu = FakeFeishu()
+    notifier = make(feishu, window=3600)
+    notifier.notify_changes([('1', '内存条', 300.0, 290.0, -3.3)])
+    notifier.close(timeout=5)
+    assert not notifier.thread.is_alive()
+    assert len(feishu.messages) == 1
+
+def test_retries_stop_at_configured_limit():
+    feishu = FakeFeishu([{'success': False, 'status': 429, 'error': "too many requests"}] * 10)
+    notifier = make(feishu, retries=3)
+    assert not notifier._deliver('oc_main', "测试")
+    assert len(feishu.messages) == 4
+    assert notifier.failed == 1
+    notifier.close()
+
+def test_rate_limit_is_retried_until_success():
+    feishu = FakeFeishu([{'success': False, 'code': 99991400}, {'success': False, 'status': 503}])
+    notifier = make(feishu)
+    assert notifier._deliver('oc_main', "测试")
+    assert len(feishu.messages) == 3
+    notifier.close()
+
+def test_non_retryable_error_is_not_retried():
+    feishu = FakeFeishu([{'success': False, 'code': 230002, 'status': 400, 'error': "bot not in chat"}])
+    notifier = make(feishu)
+    assert not notifier._deliver('oc_main', "测试")
+    assert len(feishu.messages) == 1
+    notifier.close()
+
+def test_invalid_token_is_refreshed_before_retry():
+    feishu = FakeFeishu([{'success': False, 'code': 99991663}])
+    notifier = make(feishu)
+    assert notifier._deliver('oc_main', "测试")
+    assert feishu.invalidated == ['t-1']
+    assert [token for token, _, _ in feishu.messages] == ['t-1', 't-2']
+    notifier.close()
+
+def test_digest_is_truncated():
+    notifier = make(FakeFeishu(), max_lines=5)
+    items = {('change', str(i)): (f"商品{i}", 100.0, 100.0 + i) for i in range(1, 11)}
+    lines = notifier.digest(items).splitlines()
+    assert len(lines) == 6
+    assert lines[-1] == "……还有 6 条"
+    assert "商品10" in lines[1]  # 变化幅度最大的排在最前
+    notifier.close()
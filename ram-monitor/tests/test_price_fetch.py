@@ -0,0 +1,79 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import ram_monitor
+from ram_monitor import EndpointHealth, parse_mgets_response
+
+CAPTCHA = {'error': 'pdos_captcha'}
+
+@pytest.fixture
+def jd(monkeypatch):
+    """
+    替换京东接口：responses['mgets'] 为批量接口的响应（可调用，参数为SKU列表），
+    备用接口按 backup 中的价格返回
+    """
+    monkeypatch.setitem(ram_monitor.ENDPOINTS, 'mgets', EndpointHealth('比价API', 'p.3.cn'))
+    monkeypatch.setitem(ram_monitor.ENDPOINTS, 'backup', EndpointHealth('备用API', 'api.m.jd.com'))
+    monkeypatch.setattr(ram_monitor, 'get_rate_limiter', lambda host: None)
+    monkeypatch.setattr(ram_monitor, 'price_cache', None)
+    state = {'mgets': lambda skus: [{'id': f'J_{s}', 'p': '100.00'} for s in skus],
+             'backup': {}, 'calls': []}
+
+    def request(url, headers, timeout):
+        query = parse_qs(urlparse(url).query)
+        if urlparse(url).hostname == 'p.3.cn':
+            skus = [s[2:] for s in query['skuIds'][0].split(',')]
+            state['calls'].append(('mgets', skus))
+            data = state['mgets'](skus)
+        else:
+            sku = query['skuId'][0]
+            state['calls'].append(('backup', sku))
+            price = state['backup'].get(sku)
+            data = {'code': 0, 'price': {'p': str(price)}} if price else {'code': 0}
+        return json.dumps(data).encode()
+
+    monkeypatch.setattr(ram_monitor.http_pool, 'request', request)
+    return state
+
+@pytest.mark.parametrize('data, expected', [
+    ([{'id': 'J_1', 'p': '99.00'}, {'id': 'J_2', 'p': '-1'}], {'1': 99.0, '2': -1.0}),
+    ([{'id': 'J_1', 'p': '99.00'}, 'junk', None], {'1': 99.0}),
+    ([{'id': 'J_1'}], {}),
+    ([], {}),
+    (CAPTCHA, None),
+    (None, None),
+    (['junk'], None),
+])
+def test_parse_mgets_response(data, expected):
+    assert parse_mgets_response(data) == expected
+
+def test_error_body_falls_back_to_backup(jd):
+    jd['mgets'] = lambda skus: CAPTCHA
+    jd['backup'] = {'1': 201.0, '2': 202.0}
+    prices = ram_monitor.get_jd_prices(['1', '2', '3'], batch_size=2, workers=1)
+    assert prices == {'1': 201.0, '2': 202.0, '3': None}
+    assert ('backup', '3') in jd['calls']
+
+def test_one_bad_chunk_does_not_abort_the_others(jd):
+    def mgets(skus):
+        if '1' in skus:
+            raise ConnectionResetError("连接被重置")
+        return [{'id': f'J_{s}', 'p': '100.00'} for s in skus]
+    jd['mgets'] = mgets
+    jd['backup'] = {'1': 150.0, '2': 150.0}
+    prices = ram_monitor.get_jd_prices(['1', '2', '3', '4'], batch_size=2, workers=2)
+    assert prices == {'1': 150.0, '2': 100.0, '3': 100.0, '4': 100.0}
+
+def test_error_bodies_trip_the_mgets_breaker(jd):
+    jd['mgets'] = lambda skus: CAPTCHA
+    jd['backup'] = {'1': 201.0}
+    health = ram_monitor.ENDPOINTS['mgets']
+    for _ in range(EndpointHealth.FAILURE_STREAK):
+        ram_monitor.fetch_mgets_chunk(['1'])
+    assert health.state == 'open'
+    # 熔断后直接走备用接口，不再请求批量接口
+    del jd['calls'][:]
+    assert ram_monitor.get_jd_prices(['1'], workers=1) == {'1': 201.0}
+    assert jd['calls'] == [('backup', '1')]
@@ -0,0 +1,77 @@
+import pytest
+
+import ram_monitor
+from ram_monitor import AdaptiveScheduler
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的 time.time；time.sleep 只推进时钟并记录时长"""
+    now = [10000.0]
+    sleeps = []
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+    monkeypatch.setattr(ram_monitor.time, 'time', lambda: now[0])
+    monkeypatch.setattr(ram_monitor.time, 'sleep', sleep)
+    monkeypatch.setattr(ram_monitor.random, 'uniform', lambda a, b: 0.0)  # 去掉抖动
+    return now, sleeps
+
+def test_first_round_is_staggered_and_deduplicated(clock):
+    now, _ = clock
+    scheduler = AdaptiveScheduler(['1', '2', 3, '3', '4'], min_interval=60, max_interval=600, window=0)
+    assert sorted(due - now[0] for due, _, _ in scheduler.heap) == [0, 15, 30, 45]
+    assert scheduler.pop_due() == ['1']
+
+def test_pop_due_takes_skus_within_window(clock):
+    now, _ = clock
+    scheduler = AdaptiveScheduler(['1', '2', '3', '4'], min_interval=60, max_interval=600, window=20)
+    assert scheduler.pop_due() == ['1', '2']
+    now[0] += 30
+    assert scheduler.pop_due() == ['3', '4']
+    assert scheduler.pop_due() == []
+
+def test_wait_sleeps_until_next_due(clock):
+    now, sleeps = clock
+    scheduler = AdaptiveScheduler(['1', '2'], min_interval=60, max_interval=600, window=0)
+    scheduler.pop_due()
+    scheduler.wait()
+    assert sleeps == [30]
+    assert scheduler.pop_due() == ['2']
+
+def test_wait_on_empty_heap_sleeps_max_interval(clock):
+    _, sleeps = clock
+    scheduler = AdaptiveScheduler([], min_interval=60, max_interval=600)
+    assert scheduler.next_due() is None
+    scheduler.wait()
+    assert sleeps == [600]
+    assert scheduler.pop_due() == []
+
+def test_interval_follows_change_rate(clock):
+    scheduler = AdaptiveScheduler(['1', '2'], min_interval=60, max_interval=600, window=0)
+    for _ in range(20):
+        scheduler.report('1', changed=True)
+        scheduler.report('2', changed=False)
+    assert scheduler.interval['1'] == pytest.approx(60, rel=0.01)
+    assert scheduler.interval['2'] == pytest.approx(600, rel=0.01)
+
+def test_failures_back_off_up_to_limit(clock):
+    now, _ = clock
+    scheduler = AdaptiveScheduler(['1'], min_interval=60, max_interval=600, window=0)
+    scheduler.pop_due()
+    base = scheduler.interval['1']
+    delays = []
+    for _ in range(6):
+        scheduler.report('1', failed=True)
+        due, _, _ = scheduler.heap.pop()
+        delays.append(due - now[0])
+    assert delays[:2] == [pytest.approx(base * 2), pytest.approx(base * 4)]
+    assert max(delays) == pytest.approx(600 * AdaptiveScheduler.BACKOFF_LIMIT)
+    scheduler.report('1')
+    assert scheduler.failures['1'] == 0
+
+def test_skip_reschedules_with_current_interval(clock):
+    now, _ = clock
+    scheduler = AdaptiveScheduler(['1'], min_interval=60, max_interval=600, window=0)
+    scheduler.pop_due()
+    scheduler.skip('1')
+    assert scheduler.next_due() - now[0] == pytest.approx(scheduler.interval['1'])
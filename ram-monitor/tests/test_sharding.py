@@ -0,0 +1,99 @@
+import json, os
+
+import pytest
+
+from history_store import open_history_store
+from sharding import (HashRing, ShardBusy, ShardMember, latest_prices, live_members,
+                      merged_history, members_path)
+
+KEYS = [str(100000 + i) for i in range(20000)]
+
+def test_empty_ring_has_no_owner():
+    assert HashRing().node_for('100001') is None
+    assert HashRing().assign(['100001']) == {}
+
+def test_keys_are_spread_evenly():
+    nodes = [f"s{i}" for i in range(4)]
+    counts = {node: len(keys) for node, keys in HashRing(nodes).assign(KEYS).items()}
+    assert sum(counts.values()) == len(KEYS)
+    for count in counts.values():
+        assert count == pytest.approx(len(KEYS) / len(nodes), rel=0.2)
+
+def test_assignment_does_not_depend_on_node_order():
+    assert HashRing(['a', 'b', 'c']).assign(KEYS[:500]) == HashRing(['c', 'a', 'b', 'a']).assign(KEYS[:500])
+
+@pytest.mark.parametrize('n', [3, 4, 8])
+def test_adding_a_node_remaps_about_one_nth(n):
+    nodes = [f"s{i}" for i in range(n)]
+    before = HashRing(nodes)
+    after = HashRing(nodes + ['new'])
+    moved = [k for k in KEYS if before.node_for(k) != after.node_for(k)]
+    # 只有新节点接管的键改变归属
+    assert all(after.node_for(k) == 'new' for k in moved)
+    assert len(moved) / len(KEYS) == pytest.approx(1 / (n + 1), rel=0.25)
+
+def test_removing_a_node_only_moves_its_keys():
+    nodes = ['s0', 's1', 's2', 's3']
+    before = HashRing(nodes)
+    after = HashRing(nodes[:-1])
+    moved = [k for k in KEYS if before.node_for(k) != after.node_for(k)]
+    assert moved == [k for k in KEYS if before.node_for(k) == 's3']
+    assert len(moved) / len(KEYS) == pytest.approx(1 / 4, rel=0.25)
+
+def test_member_lock_and_refresh(tmp_path):
+    root = str(tmp_path)
+    a = ShardMember('a', root)
+    with pytest.raises(ShardBusy):
+        ShardMember('a', root)
+    assert a.refresh()
+    assert a.members == ('a',)
+    assert all(a.owns(k) for k in KEYS[:100])
+
+    b = ShardMember('b', root)
+    assert a.refresh() and b.refresh()
+    assert a.members == b.members == ('a', 'b')
+    owned = [k for k in KEYS[:1000] if a.owns(k)]
+    assert 0 < len(owned) < 1000
+    assert not any(b.owns(k) for k in owned)
+
+    b.leave()
+    assert a.refresh()
+    assert a.members == ('a',)
+    a.leave()
+    ShardMember('a', root).leave()  # 锁已释放
+
+def test_stale_heartbeats_are_ignored(tmp_path):
+    root = str(tmp_path)
+    a = ShardMember('a', root)
+    path = os.path.join(members_path(root), 'a.json')
+    with open(path) as f:
+        info = json.load(f)
+    info['heartbeat'] -= 1000
+    with open(path, 'w') as f:
+        json.dump(info, f)
+    assert live_members(root, ttl=90) == {}
+    a.leave()
+
+def test_merged_views_across_shards(tmp_path):
+    root = str(tmp_path)
+    old = open_history_store('sqlite', root=os.path.join(root, 'a'))
+    old.append([('100001', '内存条', '2026-10-01 10:00:00', 299.0),
+                ('100002', '硬盘', '2026-10-01 10:00:00', 399.0)])
+    old.close()
+    new = open_history_store('sqlite', root=os.path.join(root, 'b'))
+    new.append([('100001', '内存条', '2026-10-01 10:30:00', 289.0)])
+    new.close()
+    os.makedirs(os.path.join(root, 'c'))  # 还没有数据的分片
+    before = sorted(os.listdir(os.path.join(root, 'c')))
+
+    history = merged_history(root, 'sqlite', sku='100001', limit=None)
+    assert [(r['time'], r['price']) for r in history[0]['history']] == [
+        ('2026-10-01 10:00:00', 299.0), ('2026-10-01 10:30:00', 289.0)]
+    assert history[0]['total'] == 2
+    hours = merged_history(root, 'sqlite', sku='100001', resolution='hour')[0]['history']
+    assert [(h['min'], h['max'], h['count']) for h in hours] == [(289.0, 299.0, 2)]
+
+    latest = latest_prices(root, 'sqlite')
+    assert latest['100001'][1:] == (289.0, 'b')
+    assert latest['100002'][1:] == (399.0, 'a')
+    assert sorted(os.listdir(os.path.join(root, 'c'))) == before
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+feishu-task 常驻进程的延迟测试
+分别测量：
+  cold_cli    每次启动新进程、不使用常驻进程（原来的执行方式）
+  warm_cli    每次启动新进程，命令交给常驻进程执行
+  warm_socket 直接通过 socket 发送命令（不含解释器启动）
+  concurrent  多个线程同时通过 socket 发送命令的总耗时
+
+用法:
+  python3 benchmarks/bench_daemon.py [--runs 20] [--workers 8] [--command 列表]
+
+使用 ~/.openclaw/openclaw.json 中配置的飞书应用，命令会真实执行（默认的“列表”只读）。结果以 JSON 输出。
+"""
+
+import json, os, shutil, subprocess, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+SKILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SKILL_DIR)
+
+from feishu_task import pop_option
+from task_daemon import send_command
+
+def summarize(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {'mean_ms': round(sum(samples) / len(samples) * 1000, 1),
+            'p50_ms': round(pick(0.5) * 1000, 1),
+            'p95_ms': round(pick(0.95) * 1000, 1)}
+
+def time_cli(command, runs, env):
+    script = os.path.join(SKILL_DIR, 'feishu_task.py')
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script] + command.split(), env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    args = sys.argv[1:]
+    runs = pop_option(args, '--runs', 20, int)
+    workers = pop_option(args, '--workers', 8, int)
+    command = pop_option(args, '--command', '列表')
+
+    workdir = tempfile.mkdtemp(prefix='feishu-task-')
+    path = os.path.join(workdir, 'task.sock')
+    env = dict(os.environ, FEISHU_TASK_SOCKET=path)
+    result = {'command': command, 'runs': runs}
+
+    result['cold_cli'] = summarize(time_cli(command, runs, dict(env, FEISHU_TASK_NO_DAEMON='1')))
+
+    daemon = subprocess.Popen([sys.executable, os.path.join(SKILL_DIR, 'task_daemon.py'),
+                               '--socket', path, '--workers', str(workers)],
+                              env=env, stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 30
+        while send_command('__ping__', path, timeout=5) is None:
+            if time.time() > deadline or daemon.poll() is not None:
+                sys.exit("❌ 常驻进程启动失败")
+            time.sleep(0.1)
+
+        result['warm_cli'] = summarize(time_cli(command, runs, env))
+
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            send_command(command, path)
+            samples.append(time.perf_counter() - start)
+        result['warm_socket'] = summarize(samples)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(lambda _: send_command(command, path), range(runs)))
+        total = time.perf_counter() - start
+        result['concurrent'] = {'workers': workers, 'total_seconds': round(total, 3),
+                                'commands_per_second': round(runs / total, 1)}
+    finally:
+        daemon.terminate()
+        daemon.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result['speedup_p50'] = round(result['cold_cli']['p50_ms'] / max(result['warm_cli']['p50_ms'], 0.1), 1)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
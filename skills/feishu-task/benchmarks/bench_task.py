@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+feishu_task 离线性能测试
+启动本地飞书接口替身（feishu_stub.py），测试以下场景，结果以 JSON 输出，便于不同版本之间对比：
+  cold_cli   每次启动新进程执行一条命令，分阶段计时：解释器启动、导入、加载配置、获取令牌、执行命令（接口调用）；
+             分别在有本地缓存（令牌、成员目录、任务）和没有缓存时测试
+  parse      parse_command 处理聊天消息语料（corpus/chat_commands.txt）的吞吐
+  assign     大量成员时的成员目录拉取、从磁盘加载、按名字查找和完整的分配命令
+  list       大量任务时的首次同步、本地列表 / 查看，以及少量任务变化后的增量同步
+
+用法:
+  python3 benchmarks/bench_task.py [选项]
+
+选项:
+  --scenarios <列表>   测试场景，默认 cold_cli,parse,assign,list
+  --runs <N>           cold_cli 的进程数，以及各场景的重复次数（默认20）
+  --users <N>          替身的成员数（默认10000）
+  --tasks <N>          替身的任务数（默认5000）
+  --changes <N>        list 场景中增量同步前修改的任务数（默认50）
+  --latency <毫秒>     替身服务每个请求的延迟（默认20）
+  --throttle <N>       替身服务每秒最多处理的请求数（默认0，不限）
+  --command <命令>     cold_cli 执行的命令（默认「查看 g00000001」）
+  --output <文件>      结果写入文件（默认输出到标准输出）
+
+每个场景在独立子进程中运行，使用临时 HOME（配置和缓存互不影响，也不会读写 ~/.openclaw）。
+"""
+
+import json, os, shutil, subprocess, sys, tempfile, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SKILL_DIR = os.path.join(BENCH_DIR, '..')
+CORPUS = os.path.join(BENCH_DIR, 'corpus', 'chat_commands.txt')
+sys.path.insert(0, SKILL_DIR)
+
+from feishu_task import pop_option
+
+# cold_cli 子进程执行的脚本：只计时，不导入额外模块
+PHASE_SCRIPT = r'''
+import sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import feishu_task
+t1 = time.perf_counter()
+config = feishu_task.load_config()
+t2 = time.perf_counter()
+token = feishu_task.get_token(config["appId"], config["appSecret"])
+t3 = time.perf_counter()
+command = feishu_task.parse_command(sys.argv[2])
+output = feishu_task.build_response(feishu_task.execute_command(token, command), command)
+t4 = time.perf_counter()
+print(t1 - t0, t2 - t1, t3 - t2, t4 - t3, output.startswith("❌"))
+'''
+PHASES = ('import', 'config', 'token', 'api')
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def summarize_ms(samples):
+    """秒 -> {mean_ms, p50_ms, p95_ms}"""
+    if not samples:
+        return None
+    return {'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+            'p50_ms': round(percentile(samples, 0.5) * 1000, 3),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 3)}
+
+def make_home(base_url):
+    """临时 HOME：写入替身应用的配置"""
+    home = tempfile.mkdtemp(prefix='feishu-bench-')
+    os.makedirs(os.path.join(home, '.openclaw'), mode=0o700)
+    with open(os.path.join(home, '.openclaw', 'openclaw.json'), 'w') as f:
+        json.dump({'channels': {'feishu': {'appId': 'cli_bench', 'appSecret': 'bench-secret'}}}, f)
+    env = dict(os.environ, HOME=home, FEISHU_BASE_URL=base_url, FEISHU_TASK_NO_DAEMON='1',
+               FEISHU_TASK_SOCKET=os.path.join(home, 'none.sock'))
+    return home, env
+
+def clear_caches(home):
+    """删除令牌、成员目录和任务缓存，只保留配置"""
+    directory = os.path.join(home, '.openclaw')
+    for name in os.listdir(directory):
+        if name != 'openclaw.json':
+            os.remove(os.path.join(directory, name))
+
+# ============ cold_cli（在父进程中启动子进程） ============
+
+def run_cold_cli(base_url, runs, command, cached):
+    home, env = make_home(base_url)
+    phases = {p: [] for p in PHASES}
+    startup, walls = [], []
+    failed = 0
+    try:
+        if cached:
+            # 先执行一次，生成令牌、成员目录和任务缓存
+            subprocess.run([sys.executable, '-c', PHASE_SCRIPT, SKILL_DIR, command], env=env,
+                           check=True, stdout=subprocess.DEVNULL)
+        for _ in range(runs):
+            if not cached:
+                clear_caches(home)
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', PHASE_SCRIPT, SKILL_DIR, command], env=env,
+                                 check=True, capture_output=True, text=True).stdout.split()
+            wall = time.perf_counter() - start
+            values = [float(v) for v in out[:4]]
+            for name, value in zip(PHASES, values):
+                phases[name].append(value)
+            startup.append(wall - sum(values))
+            walls.append(wall)
+            failed += out[4] == 'True'
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    result = {'command': command, 'process': summarize_ms(walls), 'interpreter': summarize_ms(startup),
+              'failed_commands': failed}
+    result.update({name: summarize_ms(values) for name, values in phases.items()})
+    return result
+
+# ============ 场景（在子进程中运行） ============
+
+def get_token(feishu_task):
+    config = feishu_task.load_config()
+    return feishu_task.get_token(config['appId'], config['appSecret'])
+
+def scenario_parse(runs, options):
+    import feishu_task
+    with open(CORPUS, encoding='utf-8') as f:
+        corpus = [line.strip() for line in f if line.strip()]
+    actions = {}
+    for line in corpus:
+        action = feishu_task.parse_command(line)['action']
+        actions[action] = actions.get(action, 0) + 1
+    count = 0
+    start = time.perf_counter()
+    # 至少运行 1 秒
+    while time.perf_counter() - start < 1.0:
+        for line in corpus:
+            feishu_task.parse_command(line)
+        count += len(corpus)
+    elapsed = time.perf_counter() - start
+    return {'corpus_lines': len(corpus), 'actions': actions,
+            'commands_per_second': round(count / elapsed), 'us_per_command': round(elapsed / count * 1e6, 2)}
+
+def scenario_assign(runs, options):
+    import feishu_task
+    from user_directory import AmbiguousUser
+    token = get_token(feishu_task)
+
+    start = time.perf_counter()
+    directory = feishu_task.get_user_directory(token)
+    fetch = time.perf_counter() - start
+    feishu_task._directory = None
+    start = time.perf_counter()
+    feishu_task.get_user_directory(token)
+    load = time.perf_counter() - start
+
+    users = list(directory.by_open_id.values())
+    step = max(1, len(users) // 200)
+    sample = users[::step][:200]
+    queries = {
+        'exact_name': [u['name'] for u in sample],
+        'en_name': [u['en_name'].lower() for u in sample if u.get('en_name')],
+        'email_prefix': [u['email'].split('@')[0] for u in sample if u.get('email')],
+        'prefix': [u['name'][:1] for u in sample],
+        'open_id': [u['open_id'] for u in sample],
+        'miss': [f"不存在的成员{i}" for i in range(len(sample))],
+    }
+    lookups = {}
+    ambiguous = 0
+    for kind, names in queries.items():
+        samples = []
+        for name in names:
+            start = time.perf_counter()
+            try:
+                feishu_task.get_user_id_by_name(token, name)
+            except AmbiguousUser:
+                ambiguous += 1
+            samples.append(time.perf_counter() - start)
+        lookups[kind] = summarize_ms(samples)
+
+    unique = [u['name'] for u in sample if len(directory.lookup(u['name'])) == 1]
+    samples = []
+    for i in range(runs):
+        command = feishu_task.parse_command(f"分配 @{unique[i % len(unique)]} 压测任务{i}")
+        start = time.perf_counter()
+        result = feishu_task.execute_command(token, command)
+        samples.append(time.perf_counter() - start)
+        if not result.get('success'):
+            raise RuntimeError(f"分配失败: {result}")
+    return {'users': len(directory), 'directory_fetch_seconds': round(fetch, 3),
+            'directory_load_seconds': round(load, 4), 'lookup': lookups, 'ambiguous_lookups': ambiguous,
+            'assign_command': summarize_ms(samples)}
+
+def scenario_list(runs, options):
+    import feishu_task
+    token = get_token(feishu_task)
+    stats = feishu_task.get_client().stats
+
+    start = time.perf_counter()
+    result = feishu_task.list_tasks(token)
+    first = time.perf_counter() - start
+    if not result.get('success'):
+        raise RuntimeError(f"列表失败: {result}")
+    pages = stats().get('task.list', {}).get('calls', 0)
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        feishu_task.build_response(feishu_task.list_tasks(token), {'action': 'list'})
+        samples.append(time.perf_counter() - start)
+    views = []
+    for task in result['tasks'][:runs]:
+        start = time.perf_counter()
+        feishu_task.get_task(token, task['guid'])
+        views.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    unchanged = feishu_task.sync_tasks(token, force=True)
+    noop = time.perf_counter() - start
+
+    # 绕过本地缓存直接修改部分任务，模拟在飞书客户端中的修改
+    changed_tasks = feishu_task.get_task_cache().list(options['changes'])[0]
+    for task in changed_tasks:
+        feishu_task.api('PATCH', f"/open-apis/task/v2/tasks/{task['guid']}", token,
+                        body={'task': {'title': task['title'] + ' (改)'}, 'update_fields': ['title']})
+    start = time.perf_counter()
+    changed = feishu_task.sync_tasks(token, force=True)
+    incremental = time.perf_counter() - start
+    return {'tasks': result['open'] + result['done'], 'first_sync_seconds': round(first, 3),
+            'first_sync_pages': pages, 'cached_list': summarize_ms(samples), 'cached_view': summarize_ms(views),
+            'resync_unchanged_seconds': round(noop, 3), 'resync_unchanged_writes': unchanged[0],
+            'resync_changed_seconds': round(incremental, 3), 'resync_changed_writes': changed[0]}
+
+SCENARIOS = {'parse': scenario_parse, 'assign': scenario_assign, 'list': scenario_list}
+
+def run_scenario_process(name, base_url, runs, options):
+    home, env = make_home(base_url)
+    try:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-scenario', name,
+                               '--runs', str(runs), '--changes', str(options['changes'])],
+                              env=env, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}
+    return json.loads(proc.stdout)
+
+def main():
+    args = sys.argv[1:]
+    scenario = pop_option(args, '--run-scenario', None)
+    runs = pop_option(args, '--runs', 20, int)
+    options = {'changes': pop_option(args, '--changes', 50, int)}
+    if scenario:
+        # 子进程：HOME 和 FEISHU_BASE_URL 已由父进程设置
+        print(json.dumps(SCENARIOS[scenario](runs, options), ensure_ascii=False))
+        return
+
+    scenarios = pop_option(args, '--scenarios', 'cold_cli,parse,assign,list').split(',')
+    users = pop_option(args, '--users', 10000, int)
+    tasks = pop_option(args, '--tasks', 5000, int)
+    latency = pop_option(args, '--latency', 20, float)
+    throttle = pop_option(args, '--throttle', 0, int)
+    command = pop_option(args, '--command', '查看 g00000001')
+    output = pop_option(args, '--output', None)
+
+    sys.path.insert(0, BENCH_DIR)
+    from feishu_stub import start_stub
+    server, base_url = start_stub(users=users, tasks=tasks, latency=latency / 1000, throttle=throttle)
+    result = {'python': sys.version.split()[0], 'runs': runs, 'users': users, 'tasks': tasks,
+              'latency_ms': latency, 'throttle': throttle}
+    try:
+        for name in scenarios:
+            start = time.perf_counter()
+            if name == 'cold_cli':
+                result['cold_cli'] = run_cold_cli(base_url, runs, command, cached=True)
+                result['cold_cli_no_cache'] = run_cold_cli(base_url, runs, command, cached=False)
+            elif name in SCENARIOS:
+                result[name] = run_scenario_process(name, base_url, runs, options)
+            else:
+                result[name] = {'error': '未知的场景'}
+                continue
+            print(f"✅ {name}: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        with server.state.lock:
+            result['stub'] = {k: server.state.stats[k] for k in ('requests', 'throttled', 'errors', 'tokens')}
+    finally:
+        server.shutdown()
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+飞书开放平台接口的本地替身
+实现 feishu_task 使用的接口：租户访问令牌、通讯录成员（分页）、任务 v2 的创建 / 更新 / 删除 / 列表 / 详情
+和发送消息，用于离线性能测试。把环境变量 FEISHU_BASE_URL 设置为输出的地址即可让 feishu_task 使用替身。
+
+用法:
+  python3 benchmarks/feishu_stub.py [--port 18090] [--users 10000] [--tasks 5000] [--latency 20]
+                                    [--error-rate 0.01] [--throttle 50]
+
+选项:
+  --port <N>          监听端口，0 表示随机端口（启动后第一行输出实际地址）
+  --users <N>         通讯录成员数（含少量同名成员）
+  --tasks <N>         初始任务数（约 1/5 已完成，2/3 设置了截止时间）
+  --latency <毫秒>    每个请求的固定延迟
+  --jitter <毫秒>     额外的随机延迟上限
+  --token-latency <毫秒> 获取访问令牌的额外延迟（默认 100）
+  --error-rate <比例> 返回 HTTP 500 的概率
+  --throttle <N>      每秒最多处理的请求数，超过返回 HTTP 429 / 错误码 99991400（0 表示不限）
+"""
+
+import json, os, random, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from feishu_task import pop_option
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈"
+GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红波宁浩宇晨欣怡子涵梓轩思雨佳琪"
+INVALID_TOKEN = 99991663
+RATE_LIMITED = 99991400
+NOT_FOUND = 1470404
+
+def make_users(count, seed=0):
+    """生成成员列表：中文名（每 500 人中有一对同名）、英文名和邮箱"""
+    rng = random.Random(seed)
+    users = []
+    for i in range(count):
+        name = rng.choice(SURNAMES) + "".join(rng.choice(GIVEN) for _ in range(rng.choice((1, 2))))
+        if i % 500 == 1:
+            name = users[-1]["name"]
+        users.append({"open_id": f"ou_{i:08x}", "user_id": f"u{i}", "name": name,
+                      "en_name": f"User {i}", "email": f"user{i}@example.com"})
+    return users
+
+def make_tasks(count, seed=0):
+    rng = random.Random(seed)
+    now = int(time.time() * 1000)
+    tasks = {}
+    for i in range(count):
+        guid = f"g{i:08d}"
+        task = {"guid": guid, "title": f"任务 {i}", "description": "", "completed_at": "0",
+                "created_at": str(now - 86400000), "updated_at": str(now - 86400000 + i)}
+        if i % 3:
+            task["due"] = {"timestamp": str(now + rng.randint(-7, 30) * 86400000), "is_all_day": False}
+        if i % 5 == 0:
+            task["completed_at"] = str(now - 3600000)
+        tasks[guid] = task
+    return tasks
+
+class StubState:
+    """替身服务的配置、数据和请求统计"""
+    def __init__(self, users=10000, tasks=5000, latency=0.0, jitter=0.0, token_latency=0.1,
+                 error_rate=0.0, throttle=0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.throttle = throttle
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.users = make_users(users, seed)
+        self.tasks = make_tasks(tasks, seed)   # guid -> 任务（按创建顺序）
+        self.client_tokens = {}                # client_token -> guid
+        self.created = 0
+        self.tokens = set()
+        self.messages = []
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.stats = {'requests': 0, 'errors': 0, 'throttled': 0, 'tokens': 0, 'endpoints': {}}
+
+    def admit(self, endpoint):
+        """返回本次请求的处理结果: ok / throttled / error"""
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['endpoints'][endpoint] = self.stats['endpoints'].get(endpoint, 0) + 1
+            if self.throttle:
+                now = time.monotonic()
+                if now - self.window_start >= 1:
+                    self.window_start, self.window_count = now, 0
+                self.window_count += 1
+                if self.window_count > self.throttle:
+                    self.stats['throttled'] += 1
+                    return 'throttled'
+            if self.random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 'error'
+        return 'ok'
+
+    def issue_token(self):
+        with self.lock:
+            self.stats['tokens'] += 1
+            token = f"t-{self.stats['tokens']}-{self.random.getrandbits(32):08x}"
+            self.tokens.add(token)
+        return token
+
+    def revoke_tokens(self):
+        """使所有已发放的令牌失效（测试令牌刷新）"""
+        with self.lock:
+            self.tokens.clear()
+
+def page(items, query, max_size=100):
+    """按 page_size / page_token 分页，page_token 为下一页的起始位置"""
+    size = min(int(query.get('page_size', ['20'])[0]), max_size)
+    start = int(query.get('page_token', ['0'])[0] or 0)
+    chunk = items[start:start + size]
+    more = start + size < len(items)
+    return {'items': chunk, 'has_more': more, 'page_token': str(start + size) if more else ''}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _handle(self, method):
+        state = self.server.state
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+
+        if path == '/_stats':
+            with state.lock:
+                stats = dict(state.stats, endpoints=dict(state.stats['endpoints']), messages=len(state.messages))
+            return self._send(200, stats)
+
+        delay = state.latency + (random.uniform(0, state.jitter) if state.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        endpoint = self._endpoint(method, path)
+        verdict = state.admit(endpoint)
+        if verdict == 'throttled':
+            return self._send(429, {'code': RATE_LIMITED, 'msg': 'request trigger frequency limit'},
+                              {'x-ogw-ratelimit-reset': '1'})
+        if verdict == 'error':
+            return self._send(500, {'code': -1, 'msg': 'internal error'})
+        try:
+            body = json.loads(raw or b'{}')
+        except ValueError:
+            return self._send(400, {'code': 9499, 'msg': 'invalid json'})
+
+        if endpoint == 'auth.token':
+            if state.token_latency:
+                time.sleep(state.token_latency)
+            if not body.get('app_id') or not body.get('app_secret'):
+                return self._send(400, {'code': 10003, 'msg': 'invalid param'})
+            return self._send(200, {'code': 0, 'msg': 'ok', 'tenant_access_token': state.issue_token(),
+                                    'expire': 7200})
+
+        token = self.headers.get('Authorization', '')[len('Bearer '):]
+        with state.lock:
+            valid = token in state.tokens
+        if not valid:
+            return self._send(400, {'code': INVALID_TOKEN, 'msg': 'Invalid access token for authorization'})
+
+        if endpoint == 'contact.users':
+            return self._send(200, {'code': 0, 'data': page(state.users, query, 100)})
+        if endpoint == 'im.send':
+            with state.lock:
+                state.messages.append((query.get('receive_id_type', [''])[0], body.get('receive_id'),
+                                       body.get('content')))
+            return self._send(200, {'code': 0, 'data': {'message_id': f"om_{len(state.messages)}"}})
+        if endpoint == 'task.list':
+            with state.lock:
+                tasks = list(state.tasks.values())
+            return self._send(200, {'code': 0, 'data': page(tasks, query, 100)})
+        if endpoint == 'task.create':
+            return self._create(state, body)
+
+        guid = path.rsplit('/', 1)[-1]
+        with state.lock:
+            task = state.tasks.get(guid)
+            if task is None:
+                status, reply = 404, {'code': NOT_FOUND, 'msg': 'task not found'}
+            elif endpoint == 'task.delete':
+                del state.tasks[guid]
+                status, reply = 200, {'code': 0, 'data': {}}
+            else:
+                if endpoint == 'task.patch':
+                    for field in body.get('update_fields', []):
+                        if field in body.get('task', {}):
+                            task[field] = body['task'][field]
+                    task['updated_at'] = str(int(time.time() * 1000))
+                status, reply = 200, {'code': 0, 'data': {'task': dict(task)}}
+        self._send(status, reply)
+
+    def _create(self, state, body):
+        if not body.get('title'):
+            return self._send(400, {'code': 1470400, 'msg': 'title is required'})
+        now = str(int(time.time() * 1000))
+        with state.lock:
+            # 相同 client_token 的请求只创建一次
+            guid = state.client_tokens.get(body.get('client_token'))
+            if guid is None:
+                state.created += 1
+                guid = f"n{state.created:08d}"
+                state.tasks[guid] = {
+                    "guid": guid, "title": body['title'], "description": body.get('description', ''),
+                    "completed_at": "0", "created_at": now, "updated_at": now,
+                    "due": body.get('due') or {}, "reminders": body.get('reminders') or [],
+                    "members": body.get('members') or []}
+                if body.get('client_token'):
+                    state.client_tokens[body['client_token']] = guid
+            task = dict(state.tasks.get(guid, {}))
+        return self._send(200, {'code': 0, 'data': {'task': task}})
+
+    @staticmethod
+    def _endpoint(method, path):
+        if path.endswith('/tenant_access_token/internal'):
+            return 'auth.token'
+        if path.startswith('/open-apis/contact/v3/users'):
+            return 'contact.users'
+        if path.startswith('/open-apis/im/v1/messages'):
+            return 'im.send'
+        if path.rstrip('/') == '/open-apis/task/v2/tasks':
+            return 'task.create' if method == 'POST' else 'task.list'
+        if path.startswith('/open-apis/task/v2/tasks/'):
+            return {'GET': 'task.get', 'PATCH': 'task.patch', 'DELETE': 'task.delete'}.get(method, 'other')
+        return 'other'
+
+    def _send(self, status, obj, headers=None):
+        body = json.dumps(obj, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_stub(port=0, **options):
+    """
+    在后台线程启动替身服务
+
+    Returns:
+        (server, base_url)，server.state 为 StubState
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    args = sys.argv[1:]
+    port = pop_option(args, '--port', 18090, int)
+    options = {
+        'users': pop_option(args, '--users', 10000, int),
+        'tasks': pop_option(args, '--tasks', 5000, int),
+        'latency': pop_option(args, '--latency', 0, float) / 1000,
+        'jitter': pop_option(args, '--jitter', 0, float) / 1000,
+        'token_latency': pop_option(args, '--token-latency', 100, float) / 1000,
+        'error_rate': pop_option(args, '--error-rate', 0, float),
+        'throttle': pop_option(args, '--throttle', 0, int),
+    }
+    server, base_url = start_stub(port, **options)
+    print(base_url, flush=True)
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        print(json.dumps(server.state.stats, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
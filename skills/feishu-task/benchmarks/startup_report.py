@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+feishu_task 启动报告
+用 python3 -X importtime 执行各类命令（每条命令一个新进程，与群聊触发相同），统计导入耗时、
+耗时最多的模块，以及是否加载了网络相关的模块：
+  help         帮助命令（帮助）
+  invalid      缺少参数的命令（完成）
+  list_cached  有本地缓存时的任务列表（同步间隔内，令牌和任务都来自缓存，不调用接口）
+  view         没有本地缓存时查看任务（获取令牌并调用接口，使用本地飞书接口替身）
+目标：help / invalid 不加载任何网络模块（NETWORK_MODULES），也不连接常驻进程；
+有模块不符合时在标准错误输出提示，退出码为 1。
+
+用法:
+  python3 benchmarks/startup_report.py [--runs 10] [--top 8] [--output report.json]
+
+选项:
+  --runs <N>       每条命令计时的进程数（默认10，计时不带 -X importtime）
+  --top <N>        列出自身导入耗时最多的 N 个模块（默认8）
+  --output <文件>  结果写入文件（默认输出到标准输出）
+"""
+
+import json, os, shutil, subprocess, sys, time
+
+from bench_task import SKILL_DIR, clear_caches, make_home, pop_option, summarize_ms
+
+SCRIPT = os.path.join(SKILL_DIR, 'feishu_task.py')
+# 只应在需要调用飞书接口时加载的模块
+NETWORK_MODULES = ('socket', 'ssl', 'http.client', 'urllib.request', 'json', 'sqlite3', 'feishu_client')
+# (名称, 命令, 是否有本地缓存, 是否必须不加载网络模块)
+CASES = (
+    ('help', '帮助', False, True),
+    ('invalid', '完成', False, True),
+    ('list_cached', '列表', True, False),
+    ('view', '查看 g00000001', False, False),
+)
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+
+    Returns:
+        [(模块名, 自身耗时微秒)]
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|', 2)
+        modules.append((name.strip(), int(self_us)))
+    return modules
+
+def report_case(env, command, top):
+    """执行一次带 -X importtime 的命令，返回导入统计"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', SCRIPT, command], env=env,
+                          capture_output=True, text=True)
+    modules = parse_importtime(proc.stderr)
+    loaded = {name for name, _ in modules}
+    heaviest = sorted(modules, key=lambda m: -m[1])[:top]
+    return {
+        'output': proc.stdout.strip().splitlines()[0] if proc.stdout.strip() else '',
+        'modules': len(modules),
+        'import_ms': round(sum(m[1] for m in modules) / 1000, 3),
+        'top': [[name, round(self_us / 1000, 3)] for name, self_us in heaviest],
+        'network_modules': [name for name in NETWORK_MODULES if name in loaded],
+        'daemon': 'task_daemon' in loaded,
+    }
+
+def time_case(env, command, runs, cached, home):
+    walls = []
+    for _ in range(runs):
+        if not cached:
+            clear_caches(home)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT, command], env=env, check=True, stdout=subprocess.DEVNULL)
+        walls.append(time.perf_counter() - start)
+    return summarize_ms(walls)
+
+def main():
+    args = sys.argv[1:]
+    runs = pop_option(args, '--runs', 10, int)
+    top = pop_option(args, '--top', 8, int)
+    output = pop_option(args, '--output', None)
+
+    from feishu_stub import start_stub
+    server, base_url = start_stub(users=100, tasks=100, token_latency=0)
+    result = {'python': sys.version.split()[0], 'runs': runs}
+    # 解释器自身启动时导入的模块（site 等），作为基准
+    baseline = parse_importtime(subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'],
+                                               capture_output=True, text=True).stderr)
+    result['interpreter'] = {'modules': len(baseline),
+                             'import_ms': round(sum(m[1] for m in baseline) / 1000, 3)}
+    failures = []
+    try:
+        for name, command, cached, offline in CASES:
+            home, env = make_home(base_url)
+            try:
+                if offline:
+                    # 允许连接常驻进程：快速路径应在检查常驻进程之前返回
+                    env.pop('FEISHU_TASK_NO_DAEMON', None)
+                if cached:
+                    subprocess.run([sys.executable, SCRIPT, command], env=env, check=True,
+                                   stdout=subprocess.DEVNULL)
+                case = report_case(env, command, top)
+                case['command'] = command
+                case['process'] = time_case(env, command, runs, cached, home)
+            finally:
+                shutil.rmtree(home, ignore_errors=True)
+            unexpected = case['network_modules'] + (['task_daemon'] if case['daemon'] else [])
+            if offline and unexpected:
+                failures.append(f"{name}: 加载了 {', '.join(unexpected)}")
+            result[name] = case
+            print(f"✅ {name}: 导入 {case['import_ms']}ms，进程 {case['process']['p50_ms']}ms", file=sys.stderr)
+    finally:
+        server.shutdown()
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    for failure in failures:
+        print(f"⚠️ {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+批量任务操作
+一次执行多条创建 / 分配 / 完成 / 删除操作：共用一个访问令牌和连接池，由有限的工作线程并发执行，
+按令牌桶限制请求速率（不超过飞书任务接口的频率限制），最后按条目汇总结果。
+速率按接口请求计算：一个条目可能发出多个请求（分配时查找成员、同步任务、重试），每个请求都先取得令牌。
+
+输入格式（自动识别）:
+  多行命令   每行一条，与单条命令格式相同，如「分配 @张三 整理周报 18:00」
+  CSV        第一行为表头: action,title,member,due,reminder,desc,task_id（也可用中文列名）
+  JSONL      每行一个 JSON 对象，键与 CSV 列名相同
+
+创建任务时为每个条目生成 client_token，重试（网络错误、令牌刷新）不会重复创建。
+"""
+
+import csv, io, json, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import feishu_task
+
+# 默认工作线程数
+BULK_WORKERS = 4
+# 默认请求速率（次/秒）和突发上限；飞书任务接口的限制为 50 次/秒、1000 次/分钟
+BULK_RATE = 15
+BULK_BURST = 5
+# 单次批量操作的条目上限
+BULK_MAX_ITEMS = 1000
+# 估算耗时时每个条目的接口请求数（分配时查找成员、同步任务、重试）
+REQUESTS_PER_ITEM = 3
+
+# CSV / JSONL 的列名（含中文别名）
+FIELD_ALIASES = {
+    "action": "action", "操作": "action",
+    "title": "title", "标题": "title",
+    "member": "member", "成员": "member", "assignee": "member",
+    "due": "due", "截止时间": "due",
+    "reminder": "reminder", "提醒": "reminder",
+    "desc": "desc", "description": "desc", "描述": "desc",
+    "task_id": "task_id", "guid": "task_id", "任务ID": "task_id",
+}
+ACTIONS = {
+    "create": "create", "创建": "create",
+    "assign": "assign", "分配": "assign",
+    "complete": "complete", "完成": "complete",
+    "delete": "delete", "删除": "delete",
+}
+# 可以批量执行的命令
+BULK_ACTIONS = {"create", "create_full", "assign", "complete", "delete"}
+
+class RateLimiter:
+    """令牌桶限速（线程安全）：平均每秒 rate 次，最多连续 burst 次"""
+
+    def __init__(self, rate=BULK_RATE, burst=BULK_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌，不足时等待（先预约再等待，不持有锁睡眠）"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+# ============ 解析 ============
+
+def row_to_command(row):
+    """
+    把 CSV / JSONL 的一行转换为命令
+
+    Raises:
+        ValueError: 操作类型未知或缺少必需的字段
+    """
+    row = {FIELD_ALIASES.get(str(k).strip(), str(k).strip()): str(v).strip()
+           for k, v in row.items() if k is not None and v not in (None, "")}
+    action = ACTIONS.get(row.get("action", "create").lower())
+    if action is None:
+        raise ValueError(f"未知的操作: {row['action']}")
+    if action in ("complete", "delete"):
+        if not row.get("task_id"):
+            raise ValueError("缺少任务ID")
+        return {"action": action, "task_id": row["task_id"]}
+    if not row.get("title"):
+        raise ValueError("缺少标题")
+    due_time = None
+    if row.get("due"):
+        due_time = feishu_task.parse_time(row["due"])
+        if due_time is None:
+            raise ValueError(f"无法识别的截止时间: {row['due']}")
+    if action == "assign" or row.get("member"):
+        if not row.get("member"):
+            raise ValueError("缺少成员")
+        return {"action": "assign", "member": row["member"].lstrip("@"), "title": row["title"],
+                "due_time": due_time}
+    try:
+        reminder = int(row.get("reminder") or 0)
+    except ValueError:
+        raise ValueError(f"提醒分钟数不是数字: {row['reminder']}")
+    return {"action": "create_full", "title": row["title"], "due_time": due_time,
+            "reminder": reminder, "description": row.get("desc", "")}
+
+def parse_bulk(text):
+    """
+    解析批量输入
+
+    Returns:
+        [(原始内容, 命令或 None, 错误信息或 None)]
+    """
+    text = text.strip()
+    lines = [line for line in text.splitlines() if line.strip()]
+    items = []
+    if not lines:
+        return items
+    if lines[0].lstrip().startswith("{"):
+        for line in lines:
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("不是 JSON 对象")
+                items.append((line, row_to_command(row), None))
+            except ValueError as e:
+                items.append((line, None, str(e)))
+        return items
+    header = [FIELD_ALIASES.get(h.strip()) for h in lines[0].split(",")]
+    if "," in lines[0] and ("action" in header or "title" in header):
+        # 由 csv 模块切分记录（带引号的字段可以跨行），原始内容取该记录对应的源文本行
+        source = text.split("\n")
+        reader = csv.DictReader(io.StringIO(text, newline=""))
+        start = 1
+        for row in reader:
+            raw = "\n".join(source[start:reader.line_num]).strip()
+            start = reader.line_num
+            try:
+                items.append((raw, row_to_command(row), None))
+            except ValueError as e:
+                items.append((raw, None, str(e)))
+        return items
+    for line in lines:
+        command = feishu_task.parse_command(line)
+        if command.get("action") not in BULK_ACTIONS:
+            items.append((line, None, command.get("message") or "该命令不支持批量执行"))
+        else:
+            items.append((line, command, None))
+    return items
+
+# ============ 执行 ============
+
+def describe(command):
+    action = command["action"]
+    if action in ("create", "create_full"):
+        return f"创建「{command['title']}」"
+    if action == "assign":
+        return f"分配 @{command['member']}「{command['title']}」"
+    return f"{'完成' if action == 'complete' else '删除'} {command['task_id']}"
+
+def failure_reason(result):
+    """失败原因（只取提示的第一行，去掉前面的图标）"""
+    reason = result.get("message") or result.get("error") or "未知错误"
+    return reason.splitlines()[0].lstrip("❌❓ ")
+
+def estimate_seconds(text):
+    """
+    按条目数和 --rate 估算批量操作最长需要的时间（秒）
+    客户端据此延长等待常驻进程回复的超时，避免超时后用户重试导致重复执行
+    """
+    first, _, body = text.partition("\n")
+    args = first.split()
+    try:
+        rate = max(0.1, feishu_task.pop_option(args, "--rate", BULK_RATE, float))
+    except (IndexError, ValueError):
+        return 0
+    # 按非空行计数（CSV 跨行字段会多算，只会让超时更长）
+    items = min(sum(1 for line in body.splitlines() if line.strip()), BULK_MAX_ITEMS)
+    return items * REQUESTS_PER_ITEM / rate
+
+def run_bulk(text, workers=BULK_WORKERS, rate=BULK_RATE, burst=BULK_BURST):
+    """
+    执行批量操作，返回汇总文本
+
+    第一行可以带选项: 批量 [--workers N] [--rate 次/秒]，其余各行为操作
+    --rate 限制的是飞书接口请求（含查找成员、同步和重试），而不是条目数
+    """
+    first, _, body = text.partition("\n")
+    args = first.split()
+    try:
+        workers = max(1, feishu_task.pop_option(args, "--workers", workers, int))
+        rate = max(0.1, feishu_task.pop_option(args, "--rate", rate, float))
+    except (IndexError, ValueError):
+        return "❌ 选项格式错误，用法: 批量 [--workers 线程数] [--rate 每秒请求数]"
+    items = parse_bulk(body)
+    if not items:
+        return "请提供要批量执行的操作（每行一条）"
+    if len(items) > BULK_MAX_ITEMS:
+        return f"❌ 单次最多 {BULK_MAX_ITEMS} 条操作，当前 {len(items)} 条"
+
+    config = feishu_task.load_config()
+    app_id = config.get("appId")
+    app_secret = config.get("appSecret")
+    if not app_id or not app_secret:
+        return "❌ 错误: 未配置飞书应用"
+    try:
+        token = feishu_task.get_token(app_id, app_secret)
+    except Exception as e:
+        return f"❌ 获取访问令牌失败: {e}"
+
+    # 创建类命令的幂等键，同一条目的所有重试共用
+    for _, command, _ in items:
+        if command and command["action"] in ("create", "create_full", "assign"):
+            command["client_token"] = str(uuid.uuid4())
+
+    limiter = RateLimiter(rate, min(burst, max(1, int(rate))))
+    client = feishu_task.get_client()
+    current = [token]
+
+    def run_item(item):
+        with client.limited(limiter):
+            return execute_item(item)
+
+    def execute_item(item):
+        _, command, error = item
+        if command is None:
+            return {"success": False, "error": error}
+        token = current[0]
+        result = feishu_task.execute_command(token, command)
+        if result.get("code") in feishu_task.INVALID_TOKEN_CODES:
+            # 令牌失效：刷新（多个线程同时失效时只刷新一次）后重试
+            feishu_task.invalidate_token(app_id, token)
+            try:
+                current[0] = feishu_task.get_token(app_id, app_secret)
+            except Exception as e:
+                return {"success": False, "error": f"获取访问令牌失败: {e}"}
+            result = feishu_task.execute_command(current[0], command)
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers, thread_name_prefix="bulk") as pool:
+        results = list(pool.map(run_item, items))
+    elapsed = time.perf_counter() - start
+
+    ok = sum(1 for r in results if r.get("success"))
+    lines = [f"📦 批量操作完成：成功 {ok}，失败 {len(results) - ok}（共 {len(results)} 条，用时 {elapsed:.1f}s）\n"]
+    for i, ((_, command, _), result) in enumerate(zip(items, results), 1):
+        # 无法解析的条目不回显原始内容（可能来自文件），只给出序号和原因
+        label = describe(command) if command else "无法解析"
+        if result.get("success"):
+            guid = result.get("task_guid")
+            lines.append(f"{i}. ✅ {label}" + (f" `{guid}`" if guid else ""))
+        else:
+            lines.append(f"{i}. ❌ {label}: {failure_reason(result)}")
+    return "\n".join(lines)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+飞书开放平台 API 客户端
+所有接口调用共用一个 keep-alive 连接池，统一处理鉴权头和 JSON 编解码；
+网络错误、5xx（500/502/503/504）和限流按带随机抖动的指数退避重试（优先遵循 Retry-After 等提示），
+并按接口记录调用次数、失败次数和耗时。
+"""
+
+import contextlib, http.client, json, os, random, threading, time
+from collections import deque
+from urllib.parse import urlencode, urlparse
+
+# 开放平台地址（可用环境变量 FEISHU_BASE_URL 覆盖，如指向 benchmarks/feishu_stub.py）
+BASE_URL = os.environ.get("FEISHU_BASE_URL", "https://open.feishu.cn")
+# 请求超时（秒）
+DEFAULT_TIMEOUT = 10
+# 保持的空闲连接数上限
+DEFAULT_POOL_SIZE = 4
+# 空闲超过该时长（秒）的连接不再复用
+POOL_IDLE_TIMEOUT = 60
+# 最大重试次数
+DEFAULT_RETRIES = 3
+# 退避的初始和最长等待（秒）
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+# 飞书的频率限制错误码
+RATE_LIMIT_CODES = {99991400}
+# 可重试的 HTTP 状态码（服务端临时故障）
+RETRY_STATUS = {500, 502, 503, 504}
+# 每个接口保留的耗时样本数（用于计算分位数）
+LATENCY_SAMPLES = 200
+
+class EndpointStats:
+    """单个接口的调用统计"""
+    __slots__ = ('calls', 'failures', 'retries', 'total_seconds', 'latencies')
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def percentile(self, q):
+        if not self.latencies:
+            return None
+        samples = sorted(self.latencies)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+class FeishuClient:
+    """
+    线程安全的飞书 API 客户端
+
+    用法:
+        client = FeishuClient()
+        result = client.request('GET', '/open-apis/task/v2/tasks', token=token,
+                                params={'page_size': 50}, endpoint='task.list')
+    """
+    # 复用连接时这些异常说明连接已被服务端关闭，可以换新连接立即重试
+    STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                    ConnectionResetError, ConnectionAbortedError, BrokenPipeError)
+
+    def __init__(self, base_url=BASE_URL, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, idle_timeout=POOL_IDLE_TIMEOUT):
+        u = urlparse(base_url)
+        self.base_url = base_url
+        self.scheme = u.scheme or 'https'
+        self.host = u.hostname
+        self.port = u.port or (443 if self.scheme == 'https' else 80)
+        self.prefix = u.path.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle = []           # [(连接, 上次使用时间)]
+        self.connects = 0
+        self.reuses = 0
+        self.endpoints = {}      # 接口名 -> EndpointStats
+        self.local = threading.local()  # 当前线程的限速器，见 limited()
+        self.context = None
+        if self.scheme == 'https':
+            import ssl
+            self.context = ssl.create_default_context()
+
+    # ============ 连接池 ============
+
+    def _proxy(self):
+        """环境变量中配置的代理（https_proxy / http_proxy，no_proxy 中的域名除外）"""
+        no_proxy = os.environ.get('no_proxy') or os.environ.get('NO_PROXY') or ''
+        if any(self.host.endswith(h.strip().lstrip('.')) for h in no_proxy.split(',') if h.strip()):
+            return None
+        proxy = os.environ.get(f'{self.scheme}_proxy') or os.environ.get(f'{self.scheme.upper()}_PROXY')
+        return urlparse(proxy) if proxy else None
+
+    def _connect(self):
+        with self.lock:
+            self.connects += 1
+        proxy = self._proxy()
+        if self.scheme == 'https':
+            if proxy:
+                conn = http.client.HTTPSConnection(proxy.hostname, proxy.port or 8080, timeout=self.timeout,
+                                                   context=self.context)
+                conn.set_tunnel(self.host, self.port)
+                return conn
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                               context=self.context)
+        if proxy:
+            conn = http.client.HTTPConnection(proxy.hostname, proxy.port or 8080, timeout=self.timeout)
+            conn.set_tunnel(self.host, self.port)
+            return conn
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _checkout(self):
+        """取出一个空闲连接，没有则新建，返回 (连接, 是否为复用)"""
+        now = time.monotonic()
+        with self.lock:
+            while self.idle:
+                conn, last_used = self.idle.pop()
+                if now - last_used < self.idle_timeout:
+                    self.reuses += 1
+                    return conn, True
+                conn.close()
+        return self._connect(), False
+
+    def _checkin(self, conn):
+        with self.lock:
+            if len(self.idle) < self.pool_size:
+                self.idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn, _ in idle:
+            conn.close()
+
+    def _send(self, method, path, body, headers):
+        """发送一次请求，返回 (状态码, 响应头, 响应体)"""
+        conn, reused = self._checkout()
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+            except self.STALE_ERRORS:
+                if not reused:
+                    raise
+                # 复用的连接已被服务端关闭（请求未被处理），换新连接重试一次
+                conn.close()
+                conn = self._connect()
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+            data = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(conn)
+        return resp.status, resp.headers, data
+
+    # ============ 请求与重试 ============
+
+    @contextlib.contextmanager
+    def limited(self, limiter):
+        """
+        在 with 块内，当前线程每次发送请求（包括重试）前先调用 limiter.acquire()
+        只影响当前线程，常驻进程中同时执行的其他命令不受限速
+        """
+        previous = getattr(self.local, 'limiter', None)
+        self.local.limiter = limiter
+        try:
+            yield
+        finally:
+            self.local.limiter = previous
+
+    def request(self, method, path, token=None, body=None, params=None, endpoint=None,
+                idempotent=None):
+        """
+        调用飞书接口
+
+        Args:
+            path: 以 /open-apis/ 开头的路径
+            token: 访问令牌，设置后添加 Authorization 头
+            body: 请求体（dict，按 JSON 编码）
+            params: 查询参数（值为 None 的参数忽略）
+            endpoint: 统计用的接口名，默认为 "方法 路径"
+            idempotent: 请求是否可以安全重发，默认除 POST 外都可以；
+                        不可重发的请求只在服务端明确拒绝（限流）时重试
+
+        Returns:
+            解析后的响应 JSON；HTTP 状态码不是 2xx 时附带 "status"
+
+        Raises:
+            OSError / http.client.HTTPException: 重试后仍然失败的网络错误
+        """
+        if params:
+            path += ('&' if '?' in path else '?') + urlencode(
+                {k: v for k, v in params.items() if v is not None})
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        data = None
+        if body is not None:
+            data = json.dumps(body, ensure_ascii=False).encode()
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+        if idempotent is None:
+            idempotent = method != 'POST'
+        name = endpoint or f"{method} {path.split('?')[0]}"
+        with self.lock:
+            stats = self.endpoints.setdefault(name, EndpointStats())
+
+        limiter = getattr(self.local, 'limiter', None)
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            start = time.perf_counter()
+            delay = None
+            try:
+                status, resp_headers, raw = self._send(method, self.prefix + path, data, headers)
+            except (OSError, http.client.HTTPException):
+                self._record(stats, start, failed=True)
+                if not idempotent or attempt >= self.retries:
+                    raise
+            else:
+                result = self._decode(status, raw)
+                throttled = status == 429 or result.get('code') in RATE_LIMIT_CODES
+                retryable = throttled or status in RETRY_STATUS
+                self._record(stats, start, failed=status >= 500 or throttled)
+                if not retryable or attempt >= self.retries or (not throttled and not idempotent):
+                    return result
+                delay = self._retry_after(resp_headers)
+            if delay is None:
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            with self.lock:
+                stats.retries += 1
+            time.sleep(min(delay, BACKOFF_MAX))
+            attempt += 1
+
+    @staticmethod
+    def _decode(status, raw):
+        try:
+            result = json.loads(raw.decode() or '{}')
+        except ValueError:
+            result = {'code': -1, 'msg': f"HTTP {status}: 响应不是 JSON"}
+        if not isinstance(result, dict):
+            result = {'code': -1, 'msg': f"HTTP {status}: 响应格式错误"}
+        if not 200 <= status < 300:
+            result['status'] = status
+        return result
+
+    @staticmethod
+    def _retry_after(headers):
+        """服务端给出的重试等待时间（秒）：Retry-After 或飞书网关的限流重置时间"""
+        for name in ('Retry-After', 'x-ogw-ratelimit-reset'):
+            value = headers.get(name)
+            if value:
+                try:
+                    return max(0.0, float(value))
+                except ValueError:
+                    pass
+        return None
+
+    def _record(self, stats, start, failed):
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            stats.calls += 1
+            stats.total_seconds += elapsed
+            stats.latencies.append(elapsed)
+            if failed:
+                stats.failures += 1
+
+    def stats(self):
+        """各接口的调用统计 {接口名: {calls, failures, retries, avg_ms, p50_ms, p95_ms}}"""
+        with self.lock:
+            items = list(self.endpoints.items())
+        result = {}
+        for name, s in sorted(items):
+            ms = lambda v: round(v * 1000, 1) if v is not None else None
+            result[name] = {'calls': s.calls, 'failures': s.failures, 'retries': s.retries,
+                            'avg_ms': ms(s.total_seconds / s.calls if s.calls else None),
+                            'p50_ms': ms(s.percentile(0.5)), 'p95_ms': ms(s.percentile(0.95))}
+        return result
+
+    def format_stats(self):
+        """统计信息的文本形式"""
+        lines = [f"🔌 连接: 新建 {self.connects} 次，复用 {self.reuses} 次，空闲 {len(self.idle)} 个"]
+        for name, s in self.stats().items():
+            lines.append(f"  {name}: {s['calls']} 次（失败 {s['failures']}，重试 {s['retries']}），"
+                         f"平均 {s['avg_ms']}ms，p50 {s['p50_ms']}ms / p95 {s['p95_ms']}ms")
+        return "\n".join(lines)
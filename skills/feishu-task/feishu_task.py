@@ -4,53 +4,324 @@ feishu-task: 飞书任务管理
 支持在群聊和私聊中创建、分配、完成任务
 """
 
-import json, urllib.request, re, os, sys
-from datetime import datetime, timedelta
-from urllib.parse import parse_qs
+import os, sys, time, fcntl, threading
+
+# 启动时只导入解析和分发命令需要的模块：帮助和格式错误的命令不加载 json、正则、网络（http.client / ssl）、
+# SQLite 等模块，这些模块在第一次用到时才导入（python3 benchmarks/startup_report.py 查看各命令的导入耗时）
 
 # ============ 配置 ============
 CONFIG_PATH = os.path.expanduser("~/.openclaw/openclaw.json")
 
+# 访问令牌缓存文件（仅当前用户可读写），按 appId 保存令牌和过期时间
+TOKEN_CACHE_PATH = os.path.expanduser("~/.openclaw/feishu_token.json")
+# 距离过期不足该时长（秒）时提前刷新
+TOKEN_REFRESH_AHEAD = 300
+# 表示访问令牌无效或过期的飞书错误码
+INVALID_TOKEN_CODES = {99991661, 99991663, 99991668}
+
+# 配置快照（可选）：openclaw.json 中飞书配置的 marshal 副本，加载时不需要导入和执行 json 解析；
+# 用 `feishu_task.py --config-snapshot` 生成，存在时 openclaw.json 修改后自动更新（文件权限为 600）
+CONFIG_SNAPSHOT_PATH = os.path.expanduser("~/.openclaw/feishu_task.snapshot")
+CONFIG_SNAPSHOT_VERSION = 1
+
+# 「批量 <文件>」只能读取该目录中的文件（命令来自聊天消息，不能读取配置等其他文件）
+BULK_FILE_DIR = os.path.expanduser("~/.openclaw/feishu_task_bulk")
+
+# 已加载的配置 ((修改时间, 大小), 配置)，常驻进程中配置文件修改后自动重新加载
+_config_cache = (None, {})
+
+def config_key():
+    """配置文件的 (修改时间, 大小)，快照和内存缓存以此判断是否过期"""
+    st = os.stat(CONFIG_PATH)
+    return (st.st_mtime_ns, st.st_size)
+
+def read_config_snapshot(key):
+    """读取与 key 一致的配置快照，不存在或已过期时返回 None"""
+    import marshal
+    try:
+        with open(CONFIG_SNAPSHOT_PATH, "rb") as f:
+            version, snapshot_key, feishu = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != CONFIG_SNAPSHOT_VERSION or tuple(snapshot_key) != key or not isinstance(feishu, dict):
+        return None
+    return feishu
+
+def write_config_snapshot(key, feishu):
+    """原子写入配置快照，文件权限为 600（含 appSecret）"""
+    import marshal
+    os.makedirs(os.path.dirname(CONFIG_SNAPSHOT_PATH), mode=0o700, exist_ok=True)
+    tmp = f"{CONFIG_SNAPSHOT_PATH}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        marshal.dump((CONFIG_SNAPSHOT_VERSION, key, feishu), f)
+    os.replace(tmp, CONFIG_SNAPSHOT_PATH)
+
 def load_config():
-    """加载飞书配置"""
+    """加载飞书配置（有有效的配置快照时直接读取快照）"""
+    global _config_cache
     try:
-        with open(CONFIG_PATH) as f:
-            config = json.load(f)
-        return config.get("channels", {}).get("feishu", {})
+        key = config_key()
+        if key == _config_cache[0]:
+            return _config_cache[1]
+        feishu = read_config_snapshot(key)
+        if feishu is None:
+            import json
+            with open(CONFIG_PATH) as f:
+                config = json.load(f)
+            feishu = config.get("channels", {}).get("feishu", {})
+            if os.path.exists(CONFIG_SNAPSHOT_PATH):
+                try:
+                    write_config_snapshot(key, feishu)
+                except (OSError, ValueError):
+                    pass  # 快照写入失败不影响本次使用
+        _config_cache = (key, feishu)
+        return feishu
     except:
         return {}
 
+def save_config_snapshot():
+    """生成配置快照，返回提示文本"""
+    import json
+    try:
+        key = config_key()
+        with open(CONFIG_PATH) as f:
+            feishu = json.load(f).get("channels", {}).get("feishu", {})
+        write_config_snapshot(key, feishu)
+    except (OSError, ValueError) as e:
+        return f"❌ 生成配置快照失败: {e}"
+    return f"✅ 已生成配置快照: {CONFIG_SNAPSHOT_PATH}（openclaw.json 修改后自动更新）"
+
+def fetch_token(app_id, app_secret):
+    """请求新的访问令牌，返回 (令牌, 有效期秒数)"""
+    result = api("POST", "/open-apis/auth/v3/tenant_access_token/internal",
+                 body={"app_id": app_id, "app_secret": app_secret}, endpoint="auth.token", idempotent=True)
+    if "tenant_access_token" not in result:
+        raise RuntimeError(result.get("msg") or "未返回访问令牌")
+    return result["tenant_access_token"], result.get("expire", 7200)
+
+def read_token_cache():
+    """读取令牌缓存 {appId: {"token", "expire_at"}}"""
+    try:
+        import json
+        with open(TOKEN_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_token_cache(cache):
+    """原子写入令牌缓存，文件权限为 600"""
+    import json
+    os.makedirs(os.path.dirname(TOKEN_CACHE_PATH), mode=0o700, exist_ok=True)
+    tmp = f"{TOKEN_CACHE_PATH}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp, TOKEN_CACHE_PATH)
+
+def cached_token(cache, app_id):
+    """缓存中仍在有效期内（且不需要提前刷新）的令牌"""
+    entry = cache.get(app_id)
+    if entry and entry.get("expire_at", 0) - time.time() > TOKEN_REFRESH_AHEAD:
+        return entry.get("token")
+    return None
+
+class token_lock:
+    """令牌缓存的文件锁，避免多个进程同时刷新"""
+    def __enter__(self):
+        os.makedirs(os.path.dirname(TOKEN_CACHE_PATH), mode=0o700, exist_ok=True)
+        self.fd = os.open(TOKEN_CACHE_PATH + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+# 进程内的令牌缓存 {appId: {"token", "expire_at"}}，常驻进程中不必每次读取磁盘
+_token_memo = {}
+
 def get_token(app_id, app_secret):
-    """获取飞书访问令牌"""
-    url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
-    data = json.dumps({"app_id": app_id, "app_secret": app_secret}).encode()
-    req = urllib.request.Request(url, data=data)
-    req.add_header('Content-Type', 'application/json')
-    resp = urllib.request.urlopen(req, timeout=10)
-    return json.loads(resp.read().decode())["tenant_access_token"]
+    """
+    获取飞书访问令牌
+    优先使用内存和磁盘缓存；即将过期时在文件锁内刷新，同时运行的其他进程等待并复用刷新结果
+    """
+    token = cached_token(_token_memo, app_id)
+    if token:
+        return token
+    cache = read_token_cache()
+    token = cached_token(cache, app_id)
+    if token:
+        _token_memo[app_id] = cache[app_id]
+        return token
+    with token_lock():
+        # 等锁期间可能已由其他进程刷新
+        cache = read_token_cache()
+        token = cached_token(cache, app_id)
+        if token:
+            _token_memo[app_id] = cache[app_id]
+            return token
+        token, expire = fetch_token(app_id, app_secret)
+        cache[app_id] = {"token": token, "expire_at": time.time() + expire}
+        _token_memo[app_id] = cache[app_id]
+        try:
+            write_token_cache(cache)
+        except OSError:
+            pass  # 缓存写入失败不影响本次使用
+        return token
+
+def invalidate_token(app_id, token=None):
+    """删除缓存的令牌（指定 token 时，只有缓存的仍是该令牌才删除）"""
+    entry = _token_memo.get(app_id)
+    if entry and (token is None or entry.get("token") == token):
+        _token_memo.pop(app_id, None)
+    with token_lock():
+        cache = read_token_cache()
+        entry = cache.get(app_id)
+        if entry and (token is None or entry.get("token") == token):
+            del cache[app_id]
+            try:
+                write_token_cache(cache)
+            except OSError:
+                pass
+
+class TokenInvalid(Exception):
+    """访问令牌无效或已过期"""
+    def __init__(self, code, msg=None):
+        super().__init__(msg or f"访问令牌无效 ({code})")
+        self.code = code
+
+# 进程内共用的 API 客户端（keep-alive 连接池）
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """获取共用的飞书 API 客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from feishu_client import FeishuClient
+                _client = FeishuClient()
+    return _client
+
+def api(method, path, token=None, body=None, params=None, endpoint=None, idempotent=None):
+    """
+    通过共用客户端调用飞书接口，返回解析后的 JSON
+    HTTP 错误（如 401、429）的响应体中也带有飞书错误码，一并返回
+    """
+    return get_client().request(method, path, token=token, body=body, params=params,
+                                endpoint=endpoint, idempotent=idempotent)
+
+def list_users(token, page_size=100):
+    """
+    分页拉取全部成员
+
+    Raises:
+        TokenInvalid: 访问令牌无效
+        RuntimeError: 其他接口错误
+    """
+    users = []
+    page_token = ""
+    while True:
+        data = api("GET", "/open-apis/contact/v3/users", token,
+                   params={"page_size": page_size, "page_token": page_token or None}, endpoint="contact.users")
+        if data.get("code") in INVALID_TOKEN_CODES:
+            raise TokenInvalid(data.get("code"), data.get("msg"))
+        if data.get("code") != 0:
+            raise RuntimeError(data.get("msg") or f"获取成员列表失败 ({data.get('code')})")
+        page = data.get("data", {})
+        users.extend(page.get("items", []))
+        page_token = page.get("page_token")
+        if not page.get("has_more") or not page_token:
+            return users
+
+# 进程内的成员目录（常驻进程中重复查找不再读取磁盘）
+_directory = None
+_directory_lock = threading.Lock()
+
+def get_user_directory(token, refresh=False):
+    """
+    获取成员目录：优先使用内存和磁盘缓存，过期或 refresh=True 时重新拉取
+    拉取失败时继续使用过期的缓存
+    """
+    global _directory
+    from user_directory import DIRECTORY_PATH, DIRECTORY_TTL, UserDirectory
+    app_id = load_config().get("appId")
+    current = _directory
+    if current is not None and current.app_id == app_id and not refresh and current.age() < DIRECTORY_TTL:
+        return current
+    # 常驻进程中多个命令同时需要刷新时只拉取一次
+    with _directory_lock:
+        if _directory is None or _directory.app_id != app_id:
+            _directory = UserDirectory.load(DIRECTORY_PATH, app_id)
+        # 磁盘缓存仍有效，或等锁期间已由其他线程刷新
+        if (_directory is not None and _directory.age() < DIRECTORY_TTL
+                and (not refresh or _directory is not current)):
+            return _directory
+        try:
+            directory = UserDirectory(list_users(token), app_id=app_id)
+        except TokenInvalid:
+            raise
+        except Exception:
+            if _directory is None:
+                raise
+            return _directory
+        try:
+            directory.save(DIRECTORY_PATH)
+        except OSError:
+            pass  # 缓存写入失败不影响本次使用
+        _directory = directory
+        return directory
 
 def get_user_id_by_name(token, name):
-    """通过名字查找用户ID"""
-    url = f"https://open.feishu.cn/open-apis/contact/v3/users?page_size=100"
-    req = urllib.request.Request(url)
-    req.add_header('Authorization', f'Bearer {token}')
+    """
+    通过名字查找用户ID（open_id、原名、规范化名称或前缀）
+    找不到时如果目录已有一段时间未刷新，刷新一次后重试（发现新成员）
+
+    Raises:
+        AmbiguousUser: 名字匹配到多个成员
+        TokenInvalid: 刷新目录时访问令牌无效
+    """
+    import http.client
+    from user_directory import MISS_REFRESH_INTERVAL
+    # 连接池中的 keep-alive 连接断开时抛出 HTTPException（不是 OSError 的子类）
+    errors = (OSError, ValueError, RuntimeError, http.client.HTTPException)
     try:
-        resp = urllib.request.urlopen(req, timeout=10)
-        data = json.loads(resp.read().decode())
-        users = data.get("data", {}).get("items", [])
-        for user in users:
-            if name in user.get("name", "") or user.get("name", "") in name:
-                return user.get("open_id")
-    except:
-        pass
-    return None
+        directory = get_user_directory(token)
+    except errors:
+        return None
+    open_id = directory.resolve(name)
+    if open_id is None and directory.age() >= MISS_REFRESH_INTERVAL:
+        try:
+            directory = get_user_directory(token, refresh=True)
+        except errors:
+            return None
+        open_id = directory.resolve(name)
+    return open_id
 
-def create_task(token, title, description="", due_time=None, reminder_minutes=0, assignee_id=None):
-    """创建任务"""
-    url = "https://open.feishu.cn/open-apis/task/v2/tasks"
-    
+def format_candidates(candidates, limit=10):
+    """多个匹配成员的列表"""
+    lines = []
+    for user in candidates[:limit]:
+        extra = user.get("en_name") or user.get("email") or ""
+        lines.append(f"  - {user.get('name')}{f' ({extra})' if extra else ''} `{user['open_id']}`")
+    if len(candidates) > limit:
+        lines.append(f"  ……还有 {len(candidates) - limit} 个")
+    return "\n".join(lines)
+
+def create_task(token, title, description="", due_time=None, reminder_minutes=0, assignee_id=None,
+                client_token=None):
+    """
+    创建任务
+
+    Args:
+        client_token: 幂等键，飞书对相同 client_token 的请求只创建一次任务；
+                      默认随机生成，同一次调用内的重试共用
+    """
+    import uuid
     payload = {
-        "task_id": f"task-{int(datetime.now().timestamp())}",
+        "client_token": client_token or str(uuid.uuid4()),
         "title": title,
         "summary": description[:50] if description else title[:50],
         "description": description
@@ -68,7 +339,7 @@ def create_task(token, title, description="", due_time=None, reminder_minutes=0,
         payload["members"] = [{"id": assignee_id, "role": "assignee"}]
     
     if reminder_minutes > 0 and due_time:
-        remind_ts = int((due_time - timedelta(minutes=reminder_minutes)).timestamp() * 1000)
+        remind_ts = int((due_time.timestamp() - reminder_minutes * 60) * 1000)
         payload["reminders"] = [{
             "is_whole_day": False,
             "trigger_time": str(remind_ts),
@@ -76,99 +347,257 @@ def create_task(token, title, description="", due_time=None, reminder_minutes=0,
             "relative_fire_minute": reminder_minutes
         }]
     
-    data = json.dumps(payload).encode()
-    req = urllib.request.Request(url, data=data)
-    req.add_header('Authorization', f'Bearer {token}')
-    req.add_header('Content-Type', 'application/json')
-    req.get_method = lambda: 'POST'
-    
     try:
-        resp = urllib.request.urlopen(req, timeout=10)
-        result = json.loads(resp.read().decode())
+        result = api("POST", "/open-apis/task/v2/tasks", token, body=payload, endpoint="task.create",
+                     idempotent=True)
         if result.get("code") == 0:
-            return {"success": True, "task_guid": result.get("data", {}).get("task", {}).get("guid")}
+            task = result.get("data", {}).get("task", {})
+            cache_tasks([task])
+            return {"success": True, "task_guid": task.get("guid")}
         else:
-            return {"success": False, "error": result.get("msg")}
+            return {"success": False, "error": result.get("msg"), "code": result.get("code")}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 def complete_task(token, task_guid):
     """完成任务"""
-    url = f"https://open.feishu.cn/open-apis/task/v2/tasks/{task_guid}"
     payload = {
-        "task": {"completed_at": str(int(datetime.now().timestamp() * 1000))},
+        "task": {"completed_at": str(int(time.time() * 1000))},
         "update_fields": ["completed_at"]
     }
-    data = json.dumps(payload).encode()
-    req = urllib.request.Request(url, data=data)
-    req.add_header('Authorization', f'Bearer {token}')
-    req.add_header('Content-Type', 'application/json')
-    req.get_method = lambda: 'PATCH'
     
     try:
-        resp = urllib.request.urlopen(req, timeout=10)
-        result = json.loads(resp.read().decode())
-        return {"success": result.get("code") == 0, "error": result.get("msg")}
+        result = api("PATCH", f"/open-apis/task/v2/tasks/{task_guid}", token, body=payload,
+                     endpoint="task.patch")
+        if result.get("code") == 0:
+            task = result.get("data", {}).get("task")
+            if task:
+                cache_tasks([task])
+            else:
+                cache_deleted(task_guid)  # 缓存中的旧状态不再可信，下次查看时从飞书获取
+        return {"success": result.get("code") == 0, "error": result.get("msg"), "code": result.get("code")}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 def delete_task(token, task_guid):
     """删除任务"""
-    url = f"https://open.feishu.cn/open-apis/task/v2/tasks/{task_guid}"
-    req = urllib.request.Request(url)
-    req.add_header('Authorization', f'Bearer {token}')
-    req.get_method = lambda: 'DELETE'
-    
     try:
-        resp = urllib.request.urlopen(req, timeout=10)
-        result = json.loads(resp.read().decode())
-        return {"success": result.get("code") == 0, "error": result.get("msg")}
+        result = api("DELETE", f"/open-apis/task/v2/tasks/{task_guid}", token, endpoint="task.delete")
+        if result.get("code") == 0:
+            cache_deleted(task_guid)
+        return {"success": result.get("code") == 0, "error": result.get("msg"), "code": result.get("code")}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-def list_tasks(token, page_size=20):
-    """查询任务列表"""
-    url = f"https://open.feishu.cn/open-apis/task/v2/tasks?page_size={page_size}"
-    req = urllib.request.Request(url)
-    req.add_header('Authorization', f'Bearer {token}')
-    
+def iter_tasks(token, page_size=100):
+    """
+    逐页拉取全部任务，逐个产生（不在内存中保存全部任务）
+
+    Raises:
+        TokenInvalid: 访问令牌无效
+        RuntimeError: 其他接口错误
+    """
+    page_token = ""
+    while True:
+        data = api("GET", "/open-apis/task/v2/tasks", token,
+                   params={"page_size": page_size, "page_token": page_token or None}, endpoint="task.list")
+        if data.get("code") in INVALID_TOKEN_CODES:
+            raise TokenInvalid(data.get("code"), data.get("msg"))
+        if data.get("code") != 0:
+            raise RuntimeError(data.get("msg") or f"获取任务列表失败 ({data.get('code')})")
+        page = data.get("data", {})
+        yield from page.get("items", [])
+        page_token = page.get("page_token")
+        if not page.get("has_more") or not page_token:
+            return
+
+# 进程内的任务缓存（SQLite 连接常驻，常驻进程中各线程共用）
+_task_cache = None
+_task_cache_lock = threading.Lock()
+# 同一时间只进行一次同步
+_task_sync_lock = threading.Lock()
+
+def get_task_cache():
+    """获取本地任务缓存，无法打开时返回 None（直接查询飞书）"""
+    global _task_cache
+    from task_cache import TASK_CACHE_PATH, TaskCache
+    app_id = load_config().get("appId")
+    with _task_cache_lock:
+        if _task_cache is None or _task_cache.app_id != app_id:
+            try:
+                _task_cache = TaskCache(TASK_CACHE_PATH, app_id)
+            except Exception:
+                return None
+        return _task_cache
+
+# 任务变化的监听者（如常驻进程中的提醒调度器）
+_task_listeners = []
+
+def add_task_listener(listener):
+    """注册任务变化的回调 listener(更新的任务列表, 删除的任务 guid 列表)，本进程的写入和同步都会通知"""
+    _task_listeners.append(listener)
+
+def notify_task_listeners(tasks, deleted):
+    for listener in _task_listeners:
+        try:
+            listener(tasks, deleted)
+        except Exception as e:
+            print(f"⚠️ 任务变化通知失败: {e}", file=sys.stderr)
+
+def cache_tasks(tasks):
+    """把本进程写入飞书的任务同步写入缓存（缓存出错不影响操作结果）"""
+    cache = get_task_cache()
+    if cache is not None:
+        try:
+            cache.upsert(tasks)
+        except Exception:
+            pass
+    notify_task_listeners(tasks, [])
+
+def cache_deleted(task_guid):
+    cache = get_task_cache()
+    if cache is not None:
+        try:
+            cache.mark_deleted([task_guid])
+        except Exception:
+            pass
+    notify_task_listeners([], [task_guid])
+
+def sync_tasks(token, force=False):
+    """
+    缓存超过 TASK_SYNC_TTL 未同步（或 force=True）时同步一次
+
+    Returns:
+        (变化的任务数, 删除的任务数)，无需同步时返回 None
+    """
+    from task_cache import TASK_SYNC_TTL
+    cache = get_task_cache()
+    if cache is None:
+        return None
+    age = cache.synced_age()
+    if not force and age is not None and age < TASK_SYNC_TTL:
+        return None
+    synced = cache.meta("synced_at")
+    with _task_sync_lock:
+        # 等锁期间其他线程可能已完成同步
+        if not force and cache.meta("synced_at") != synced:
+            return None
+        return cache.sync(iter_tasks(token), on_change=notify_task_listeners if _task_listeners else None)
+
+def list_tasks(token, limit=20, refresh=False):
+    """
+    查询任务列表：从本地缓存读取（需要时先同步）
+
+    Args:
+        limit: 返回的任务数（未完成的在前，按截止时间排序）
+        refresh: 忽略同步间隔，立即同步
+
+    Returns:
+        {"success", "tasks", "open", "done"}；同步失败但有旧缓存时附带 "stale"（失败原因）
+    """
+    from task_cache import is_completed, sort_key
+    cache = get_task_cache()
     try:
-        resp = urllib.request.urlopen(req, timeout=10)
-        result = json.loads(resp.read().decode())
-        if result.get("code") == 0:
-            tasks = result.get("data", {}).get("items", [])
-            return {"success": True, "tasks": tasks}
-        return {"success": False, "error": result.get("msg")}
+        if cache is None:
+            tasks = sorted(iter_tasks(token), key=sort_key)
+            done = sum(1 for t in tasks if is_completed(t))
+            return {"success": True, "tasks": tasks[:limit], "open": len(tasks) - done, "done": done}
+        stale = None
+        try:
+            sync_tasks(token, refresh)
+        except TokenInvalid:
+            raise
+        except Exception as e:
+            if cache.synced_age() is None:
+                raise
+            stale = str(e)
+        tasks, open_count, done = cache.list(limit)
+        return {"success": True, "tasks": tasks, "open": open_count, "done": done, "stale": stale}
+    except TokenInvalid as e:
+        return {"success": False, "error": str(e), "code": e.code}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 def get_task(token, task_guid):
-    """查询单个任务详情"""
-    url = f"https://open.feishu.cn/open-apis/task/v2/tasks/{task_guid}"
-    req = urllib.request.Request(url)
-    req.add_header('Authorization', f'Bearer {token}')
+    """
+    查询单个任务详情
+    缓存在 TASK_SYNC_TTL 内同步过时直接读取本地，否则从飞书获取并写入缓存
+    """
+    from task_cache import TASK_SYNC_TTL
+    cache = get_task_cache()
+    if cache is not None:
+        age = cache.synced_age()
+        task = cache.get(task_guid) if age is not None and age < TASK_SYNC_TTL else None
+        if task is not None:
+            return {"success": True, "task": task}
+    try:
+        result = api("GET", f"/open-apis/task/v2/tasks/{task_guid}", token, endpoint="task.get")
+        if result.get("code") == 0:
+            task = result.get("data", {}).get("task", {})
+            cache_tasks([task])
+            return {"success": True, "task": task}
+        return {"success": False, "error": result.get("msg"), "code": result.get("code")}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+def send_message(token, receive_id, text, receive_id_type="chat_id"):
+    """
+    发送文本消息
+
+    Args:
+        receive_id: 接收方ID（默认为群聊 chat_id）
+        receive_id_type: chat_id / open_id / user_id / email
+
+    Returns:
+        {"success", "message_id"}，失败时为 {"success": False, "error", "code", "status"}
+        code 为飞书错误码，status 为 HTTP 状态码（限流时为 429），用于判断是否重试
+    """
+    import json
+    payload = {
+        "receive_id": receive_id,
+        "msg_type": "text",
+        "content": json.dumps({"text": text}, ensure_ascii=False)
+    }
     
     try:
-        resp = urllib.request.urlopen(req, timeout=10)
-        result = json.loads(resp.read().decode())
+        result = api("POST", "/open-apis/im/v1/messages", token, body=payload,
+                     params={"receive_id_type": receive_id_type}, endpoint="im.send")
         if result.get("code") == 0:
-            return {"success": True, "task": result.get("data", {})}
-        return {"success": False, "error": result.get("msg")}
+            return {"success": True, "message_id": result.get("data", {}).get("message_id")}
+        return {"success": False, "error": result.get("msg"), "code": result.get("code"),
+                "status": result.get("status")}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+# 预编译的正则（第一次解析时间或 @成员 时导入 re 并编译，之后直接使用）
+_patterns = None
+
+def patterns():
+    global _patterns
+    if _patterns is None:
+        import re
+        _patterns = {
+            "time": re.compile(r'^(\d{1,2}):(\d{2})$'),
+            "datetime": re.compile(r'^(\d{4})-(\d{2})-(\d{2})\s+(\d{1,2}):(\d{2})$'),
+            "mention": re.compile(r'@(\S+)'),
+        }
+    return _patterns
+
 def parse_time(time_str):
     """解析时间字符串"""
-    now = datetime.now()
+    time_str = time_str.strip()
+    if ":" not in time_str:
+        return None
+    from datetime import datetime
     
     # 格式: HH:MM
-    match = re.match(r'^(\d{1,2}):(\d{2})$', time_str.strip())
+    match = patterns()["time"].match(time_str)
     if match:
         hour, minute = int(match.group(1)), int(match.group(2))
-        return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
     
     # 格式: YYYY-MM-DD HH:MM
-    match = re.match(r'^(\d{4})-(\d{2})-(\d{2})\s+(\d{1,2}):(\d{2})$', time_str.strip())
+    match = patterns()["datetime"].match(time_str)
     if match:
         year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
         hour, minute = int(match.group(4)), int(match.group(5))
@@ -176,10 +605,37 @@ def parse_time(time_str):
     
     return None
 
+HELP_WORDS = {"帮助", "help", "-h", "--help"}
+HELP_TEXT = """📋 任务命令
+  创建任务 <标题>
+  创建 <标题> [截止时间] [--reminder 提前分钟] [--desc 描述]
+  分配 @成员 <标题> [截止时间]
+  完成 <任务ID>
+  删除 <任务ID>
+  查看 <任务ID>
+  列表 / 列表 刷新
+  批量（第二行起每行一条操作，或: 批量 <批量文件目录中的 CSV/JSONL 文件名>）
+截止时间格式: HH:MM 或 YYYY-MM-DD HH:MM；其他内容按标题创建任务"""
+# 缺少参数的命令及其用法
+USAGES = {
+    "创建任务": "创建任务 <标题>",
+    "创建": "创建 <标题> [截止时间] [--reminder 提前分钟] [--desc 描述]",
+    "分配": "分配 @成员 <标题> [截止时间]",
+    "完成": "完成 <任务ID>",
+    "删除": "删除 <任务ID>",
+    "查看": "查看 <任务ID>",
+}
+
 def parse_command(text):
     """解析用户命令"""
     text = text.strip()
     
+    # 帮助，以及缺少参数的命令（不需要调用飞书接口，直接回复）
+    if text in HELP_WORDS:
+        return {"action": "help"}
+    if text in USAGES:
+        return {"action": "invalid", "message": f"❌ 缺少参数，用法: {USAGES[text]}"}
+    
     # 简化命令
     if text.startswith("创建任务 "):
         title = text[5:].strip()
@@ -208,7 +664,7 @@ def parse_command(text):
     if text.startswith("分配 "):
         # 格式: 分配 @成员 标题 [截止时间]
         # 提取被@成员的名字
-        text_without_at = re.sub(r'@(\S+)', r'\1', text[3:]).strip()
+        text_without_at = patterns()["mention"].sub(r'\1', text[3:]).strip()
         parts = text_without_at.split(" ", 1)
         member_name = parts[0]
         title = parts[1] if len(parts) > 1 else ""
@@ -222,6 +678,8 @@ def parse_command(text):
             else:
                 due_time = parse_time(parts2[1]) if len(parts2) > 1 else None
                 title = parts2[0]
+        if not title:
+            return {"action": "invalid", "message": f"❌ 缺少任务标题，用法: {USAGES['分配']}"}
         
         return {"action": "assign", "member": member_name, "title": title, "due_time": due_time}
     
@@ -236,6 +694,9 @@ def parse_command(text):
     if text in ["列表", "list"]:
         return {"action": "list"}
     
+    if text in ["列表 刷新", "list refresh"]:
+        return {"action": "list", "refresh": True}
+    
     if text.startswith("查看 "):
         task_id = text[3:].strip()
         return {"action": "view", "task_id": task_id}
@@ -243,6 +704,21 @@ def parse_command(text):
     # 默认：创建任务
     return {"action": "create", "title": text}
 
+def local_reply(command):
+    """不需要调用飞书接口的命令（帮助、缺少参数）的回复，其他命令返回 None"""
+    if command.get("action") == "help":
+        return HELP_TEXT
+    if command.get("action") == "invalid":
+        return command["message"]
+    return None
+
+def format_due(task, empty="无"):
+    """截止时间的显示文本"""
+    from datetime import datetime
+    from task_cache import due_ms
+    due = due_ms(task)
+    return datetime.fromtimestamp(due / 1000).strftime("%Y-%m-%d %H:%M") if due else empty
+
 def build_response(result, command):
     """构建回复消息"""
     action = command.get("action")
@@ -271,92 +747,190 @@ def build_response(result, command):
         if not tasks:
             return "📋 当前没有任务"
         
-        lines = ["📋 任务列表\n"]
+        from task_cache import is_completed
+        lines = [f"📋 任务列表（进行中 {result.get('open', 0)}，已完成 {result.get('done', 0)}）\n"]
         for i, task in enumerate(tasks, 1):
             title = task.get("title", "未命名")
-            status = "✅" if task.get("completed_at") else "🔄"
-            due = task.get("due", {}).get("date", "无")
-            lines.append(f"{i}. {status} {title} (截止: {due})")
+            status = "✅" if is_completed(task) else "🔄"
+            lines.append(f"{i}. {status} {title} (截止: {format_due(task)})")
         
+        more = result.get("open", 0) + result.get("done", 0) - len(tasks)
+        if more > 0:
+            lines.append(f"……另有 {more} 个任务")
+        if result.get("stale"):
+            lines.append(f"\n⚠️ 同步失败（{result['stale']}），显示的是上次同步的结果")
         return "\n".join(lines)
     
     if action == "view" and result.get("success"):
+        from task_cache import is_completed
         task = result.get("task", {})
         title = task.get("title", "未命名")
         desc = task.get("description", "")
-        due = task.get("due", {})
-        due_str = f"{due.get('date')} {due.get('time', '')}" if due else "未设置"
-        status = "已完成" if task.get("completed_at") else "进行中"
+        status = "已完成" if is_completed(task) else "进行中"
         
-        return f"📋 任务详情\n标题: {title}\n描述: {desc}\n截止: {due_str}\n状态: {status}\nID: `{task.get('guid')}`"
+        return f"📋 任务详情\n标题: {title}\n描述: {desc}\n截止: {format_due(task, '未设置')}\n状态: {status}\nID: `{task.get('guid')}`"
     
     return f"❌ 操作失败: {result.get('error', '未知错误')}"
 
-def main():
-    """主函数"""
-    # 从标准输入读取命令
-    if len(sys.argv) > 1:
-        # 从命令行参数读取（群聊触发）
-        command_text = " ".join(sys.argv[1:])
-    else:
-        # 从 stdin 读取（私聊触发）
-        command_text = sys.stdin.read().strip()
-    
-    if not command_text:
-        print("请提供任务命令")
-        return
-    
-    # 加载配置
-    config = load_config()
-    app_id = config.get("appId")
-    app_secret = config.get("appSecret")
-    
-    if not app_id or not app_secret:
-        print("❌ 错误: 未配置飞书应用")
-        return
-    
-    # 获取 token
-    try:
-        token = get_token(app_id, app_secret)
-    except Exception as e:
-        print(f"❌ 获取访问令牌失败: {e}")
-        return
-    
-    # 解析命令
-    command = parse_command(command_text)
+def execute_command(token, command):
+    """执行解析后的命令，返回接口结果（message 为需要直接输出的提示）"""
     action = command.get("action")
+    reply = local_reply(command)
+    if reply is not None:
+        return {"success": action == "help", "message": reply}
     
-    # 执行操作
     if action == "create":
-        result = create_task(token, command["title"])
+        result = create_task(token, command["title"], client_token=command.get("client_token"))
     elif action == "create_full":
         result = create_task(
             token, command["title"], command.get("description", ""),
-            command.get("due_time"), command.get("reminder", 0)
+            command.get("due_time"), command.get("reminder", 0), client_token=command.get("client_token")
         )
     elif action == "assign":
+        from user_directory import AmbiguousUser
         # 先查找成员ID
-        member_id = get_user_id_by_name(token, command["member"])
+        try:
+            member_id = get_user_id_by_name(token, command["member"])
+        except TokenInvalid as e:
+            return {"success": False, "error": str(e), "code": e.code}
+        except AmbiguousUser as e:
+            return {"success": False, "message": f"❓ 「{command['member']}」匹配到多个成员，请使用完整名字或 open_id:\n"
+                                                 f"{format_candidates(e.candidates)}"}
         if not member_id:
-            print(f"❌ 未找到成员: {command['member']}")
-            return
+            return {"success": False, "message": f"❌ 未找到成员: {command['member']}"}
         result = create_task(
-            token, command["title"], "", command.get("due_time"), 0, member_id
+            token, command["title"], "", command.get("due_time"), 0, member_id,
+            client_token=command.get("client_token")
         )
     elif action == "complete":
         result = complete_task(token, command["task_id"])
     elif action == "delete":
         result = delete_task(token, command["task_id"])
     elif action == "list":
-        result = list_tasks(token)
+        result = list_tasks(token, refresh=command.get("refresh", False))
     elif action == "view":
         result = get_task(token, command["task_id"])
     else:
-        print("❌ 未知的命令")
+        return {"success": False, "message": "❌ 未知的命令"}
+    return result
+
+def run_command(command_text):
+    """执行一条任务命令，返回回复文本（命令行和常驻进程共用）"""
+    command_text = command_text.strip()
+    if not command_text:
+        return "请提供任务命令"
+    
+    # 批量操作: 第一行为「批量」，其余每行一条操作
+    if command_text.split(maxsplit=1)[0] in ("批量", "bulk"):
+        from bulk_tasks import run_bulk
+        return run_bulk(command_text)
+    
+    # 解析命令；帮助和缺少参数的命令不需要配置和令牌，直接回复
+    command = parse_command(command_text)
+    reply = local_reply(command)
+    if reply is not None:
+        return reply
+    
+    # 加载配置
+    config = load_config()
+    app_id = config.get("appId")
+    app_secret = config.get("appSecret")
+    
+    if not app_id or not app_secret:
+        return "❌ 错误: 未配置飞书应用"
+    
+    # 获取 token（优先使用缓存）
+    try:
+        token = get_token(app_id, app_secret)
+    except Exception as e:
+        return f"❌ 获取访问令牌失败: {e}"
+    
+    # 执行操作；缓存的令牌已失效时刷新后重试一次
+    result = execute_command(token, command)
+    if result.get("code") in INVALID_TOKEN_CODES:
+        invalidate_token(app_id, token)
+        try:
+            token = get_token(app_id, app_secret)
+        except Exception as e:
+            return f"❌ 获取访问令牌失败: {e}"
+        result = execute_command(token, command)
+    
+    if "message" in result:
+        return result["message"]
+    
+    return build_response(result, command)
+
+def pop_option(args, name, default=None, cast=str):
+    """
+    从参数列表中取出 `--name 值` 形式的选项（本技能各脚本共用）
+
+    Raises:
+        IndexError: 选项缺少值
+        ValueError: 值无法转换
+    """
+    if name in args:
+        i = args.index(name)
+        value = cast(args[i + 1])
+        del args[i:i + 2]
+        return value
+    return default
+
+def bulk_file_path(name):
+    """批量文件的实际路径；不在 BULK_FILE_DIR 中（含符号链接指向目录外）或不存在时返回 None"""
+    root = os.path.realpath(BULK_FILE_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+def main():
+    """主函数"""
+    # 从标准输入读取命令
+    if len(sys.argv) > 1:
+        # 从命令行参数读取（群聊触发）
+        command_text = " ".join(sys.argv[1:])
+    else:
+        # 从 stdin 读取（私聊触发）
+        command_text = sys.stdin.read().strip()
+    
+    if not command_text:
+        print("请提供任务命令")
+        return
+    
+    # 生成配置快照: feishu_task.py --config-snapshot
+    if command_text == "--config-snapshot":
+        print(save_config_snapshot())
         return
     
-    # 输出结果
-    response = build_response(result, command)
+    # 批量操作可以从 BULK_FILE_DIR 中的文件读取: feishu_task.py 批量 tasks.csv [--workers N] [--rate 次/秒]
+    args = command_text.split("\n", 1)[0].split()
+    if len(args) > 1 and args[0] in ("批量", "bulk") and not args[1].startswith("-"):
+        path = bulk_file_path(args[1])
+        if path is None:
+            print(f"❌ 找不到批量文件 {args[1]}（只能读取 {BULK_FILE_DIR} 中的文件）")
+            return
+        with open(path, encoding="utf-8-sig") as f:
+            command_text = " ".join(args[:1] + args[2:]) + "\n" + f.read()
+    
+    # 帮助和缺少参数的命令在本进程直接回复，不连接常驻进程
+    if not args or args[0] not in ("批量", "bulk"):
+        reply = local_reply(parse_command(command_text))
+        if reply is not None:
+            print(reply)
+            return
+    
+    # 常驻进程在运行时交给它执行，否则在本进程中执行
+    response = None
+    if not os.environ.get("FEISHU_TASK_NO_DAEMON"):
+        from task_daemon import CLIENT_TIMEOUT, send_command
+        timeout = CLIENT_TIMEOUT
+        if args and args[0] in ("批量", "bulk"):
+            # 批量操作按条目数和限速延长等待时间
+            import bulk_tasks
+            timeout += bulk_tasks.estimate_seconds(command_text)
+        response = send_command(command_text, timeout=timeout)
+    if response is None:
+        response = run_command(command_text)
     print(response)
 
 if __name__ == "__main__":
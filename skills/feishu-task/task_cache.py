@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+本地任务缓存
+任务保存在 ~/.openclaw/feishu_tasks.db（SQLite, WAL 模式），列表和查看直接查询本地；
+同步时逐页拉取全部任务，只写入 updated_at 有变化的任务，并把本次没有出现的任务标记为已删除。
+本进程创建、完成、删除任务时同步更新缓存（write-through）。
+"""
+
+import json, os, sqlite3, threading, time
+
+TASK_CACHE_PATH = os.path.expanduser("~/.openclaw/feishu_tasks.db")
+# 距上次同步超过该时长（秒）时，列表前先同步
+TASK_SYNC_TTL = 120
+
+def _int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def is_completed(task):
+    """飞书用 completed_at = "0" 表示未完成"""
+    return _int(task.get("completed_at")) > 0
+
+def due_ms(task):
+    """截止时间（毫秒时间戳），未设置时为 0"""
+    return _int((task.get("due") or {}).get("timestamp"))
+
+def sort_key(task):
+    """与 TaskCache.list 相同的排序：未完成在前，按截止时间，未设置截止时间的排在最后"""
+    due = due_ms(task)
+    return (is_completed(task), due == 0, due, -_int(task.get("updated_at")))
+
+class TaskCache:
+    """任务缓存（线程安全）"""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            guid       TEXT PRIMARY KEY,
+            title      TEXT,
+            completed  INTEGER NOT NULL DEFAULT 0,
+            due        INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER NOT NULL DEFAULT 0,
+            deleted    INTEGER NOT NULL DEFAULT 0,
+            data       TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_open ON tasks (deleted, completed, due);
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    # 同步时每批写入的任务数
+    BATCH = 500
+
+    def __init__(self, path=TASK_CACHE_PATH, app_id=None):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        self.path = path
+        self.app_id = app_id
+        self.lock = threading.Lock()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        os.close(fd)
+        self.db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        if app_id and self.meta("app_id") != app_id:
+            # 切换了飞书应用，旧缓存作废
+            with self.lock, self.db:
+                self.db.execute("DELETE FROM tasks")
+                self.db.execute("DELETE FROM meta")
+            self.set_meta("app_id", app_id)
+
+    def meta(self, key, default=None):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                            "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, str(value)))
+
+    def synced_age(self):
+        """距上次完整同步的秒数，从未同步时为 None"""
+        synced = self.meta("synced_at")
+        return time.time() - float(synced) if synced else None
+
+    @staticmethod
+    def _row(task):
+        due = due_ms(task)
+        return (task["guid"], task.get("title"), int(is_completed(task)), due,
+                _int(task.get("updated_at")), json.dumps(task, ensure_ascii=False))
+
+    def upsert(self, tasks):
+        """写入任务（覆盖旧版本，并清除已删除标记）"""
+        rows = [self._row(t) for t in tasks if t.get("guid")]
+        if not rows:
+            return
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT INTO tasks (guid, title, completed, due, updated_at, deleted, data) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?) ON CONFLICT(guid) DO UPDATE SET title = excluded.title, "
+                "completed = excluded.completed, due = excluded.due, updated_at = excluded.updated_at, "
+                "deleted = 0, data = excluded.data", rows)
+
+    def mark_deleted(self, guids):
+        with self.lock, self.db:
+            self.db.executemany("UPDATE tasks SET deleted = 1 WHERE guid = ?", [(g,) for g in guids])
+
+    def get(self, guid):
+        """缓存中的任务，不存在或已删除时返回 None"""
+        with self.lock:
+            row = self.db.execute("SELECT data FROM tasks WHERE guid = ? AND deleted = 0", (guid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def sync(self, tasks, on_change=None):
+        """
+        用完整的任务列表同步缓存
+
+        Args:
+            tasks: 逐个产生任务的迭代器（边拉取边比较，只写入 updated_at 有变化的任务）；
+                   迭代中途出错时异常向上传递，已写入的任务保留，不标记删除
+            on_change: 变化通知 on_change(更新的任务列表, 删除的任务 guid 列表)
+
+        Returns:
+            (变化的任务数, 删除的任务数)
+        """
+        with self.lock:
+            known = dict(self.db.execute("SELECT guid, updated_at FROM tasks WHERE deleted = 0"))
+        seen = set()
+        updates = []
+        changed = 0
+        for task in tasks:
+            guid = task.get("guid")
+            if not guid:
+                continue
+            seen.add(guid)
+            if known.get(guid) != _int(task.get("updated_at")):
+                updates.append(task)
+                if len(updates) >= self.BATCH:
+                    self.upsert(updates)
+                    changed += len(updates)
+                    if on_change:
+                        on_change(updates, [])
+                    updates = []
+        self.upsert(updates)
+        changed += len(updates)
+        removed = [g for g in known if g not in seen]
+        self.mark_deleted(removed)
+        if on_change and (updates or removed):
+            on_change(updates, removed)
+        self.set_meta("synced_at", time.time())
+        return changed, len(removed)
+
+    def open_tasks(self):
+        """所有设置了截止时间的未完成任务"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT data FROM tasks WHERE deleted = 0 AND completed = 0 AND due > 0").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def list(self, limit=20):
+        """
+        未完成的任务（按截止时间，未设置截止时间的排在最后）在前，已完成的在后
+
+        Returns:
+            (任务列表, 未完成数, 已完成数)
+        """
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT data FROM tasks WHERE deleted = 0 "
+                "ORDER BY completed, due = 0, due, updated_at DESC LIMIT ?", (limit,)).fetchall()
+            counts = dict(self.db.execute(
+                "SELECT completed, COUNT(*) FROM tasks WHERE deleted = 0 GROUP BY completed"))
+        return [json.loads(r[0]) for r in rows], counts.get(0, 0), counts.get(1, 0)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
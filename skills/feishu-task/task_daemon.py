@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+feishu-task 常驻进程
+在本地 Unix socket 上接收任务命令，配置、访问令牌、成员目录、任务缓存和飞书 API 的 keep-alive 连接常驻内存，
+命令由线程池并发执行。feishu_task.py 检测到常驻进程时把命令交给它执行，否则在本进程中执行。
+
+用法:
+  python3 task_daemon.py [--workers 8] [--socket <路径>]   前台运行（可由 systemd 管理）
+      [--remind-chat <chat_id>] [--remind-assignees]      发送任务提醒到群聊 / 负责人（见 task_reminders.py）
+  python3 task_daemon.py status                           检查常驻进程是否在运行，并显示各接口的调用统计
+
+协议: 每个连接发送一行 JSON {"text": 命令}，收到一行 JSON {"output": 回复文本}
+"""
+
+import json, os, signal, socket, sys, threading, time
+
+# socket 路径（可用环境变量 FEISHU_TASK_SOCKET 覆盖）
+SOCKET_PATH = os.environ.get("FEISHU_TASK_SOCKET",
+                             os.path.expanduser("~/.openclaw/feishu_task.sock"))
+# 默认工作线程数
+DEFAULT_WORKERS = 8
+# 客户端等待回复的超时（秒）
+CLIENT_TIMEOUT = 60
+# 单条请求的大小上限（批量操作的内容随命令一起发送）
+MAX_REQUEST = 1 << 20
+
+def send_command(text, path=None, timeout=CLIENT_TIMEOUT):
+    """
+    把命令交给常驻进程执行
+
+    Returns:
+        回复文本；常驻进程没有运行（无法连接）时返回 None
+        已发出命令后出错时返回错误提示，不会回退到本进程执行，避免同一命令执行两次
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path or SOCKET_PATH)
+    except OSError:
+        sock.close()
+        return None
+    try:
+        with sock, sock.makefile("rwb") as f:
+            f.write(json.dumps({"text": text}, ensure_ascii=False).encode() + b"\n")
+            f.flush()
+            line = f.readline()
+        if not line:
+            return "❌ 常驻进程未返回结果"
+        return json.loads(line).get("output", "")
+    except socket.timeout:
+        return f"❌ 等待常驻进程回复超时（{timeout:.0f} 秒），命令可能仍在执行，请稍后查看结果，不要重复发送"
+    except (OSError, ValueError) as e:
+        return f"❌ 常驻进程通信失败: {e}"
+
+def warm_up():
+    """预先加载配置、访问令牌、成员目录和任务缓存（同时建立到飞书的连接）"""
+    import feishu_task
+
+    config = feishu_task.load_config()
+    if config.get("appId") and config.get("appSecret"):
+        try:
+            token = feishu_task.get_token(config["appId"], config["appSecret"])
+            directory = feishu_task.get_user_directory(token)
+            print(f"👥 成员目录: {len(directory)} 人")
+            synced = feishu_task.sync_tasks(token)
+            if synced:
+                print(f"📋 任务缓存: {synced[0]} 个更新，{synced[1]} 个删除")
+        except Exception as e:
+            print(f"⚠️ 预热失败（命令执行时重试）: {e}")
+    else:
+        print("⚠️ 未配置飞书应用")
+    return feishu_task
+
+class TaskDaemon:
+    """Unix socket 服务：主线程接受连接，线程池执行命令"""
+
+    def __init__(self, path=None, workers=DEFAULT_WORKERS):
+        # 只有服务端需要线程池，客户端（send_command）不导入
+        from concurrent.futures import ThreadPoolExecutor
+        self.path = path or SOCKET_PATH
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="task")
+        self.stopping = threading.Event()
+        self.handled = 0
+        self.sock = None
+
+    def bind(self):
+        """
+        创建 socket（权限 600）
+
+        Raises:
+            RuntimeError: 已有常驻进程在运行
+        """
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise RuntimeError(f"常驻进程已在运行: {self.path}")
+            except OSError:
+                os.remove(self.path)  # 上次异常退出留下的 socket 文件
+            finally:
+                probe.close()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            self.sock.bind(self.path)
+        finally:
+            os.umask(umask)
+        self.sock.listen(128)
+
+    def serve(self, run_command):
+        """接受连接直到 stop()"""
+        self.sock.settimeout(1.0)
+        while not self.stopping.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                if self.stopping.is_set():
+                    break
+                raise
+            self.pool.submit(self.handle, conn, run_command)
+        self.pool.shutdown(wait=True)
+
+    def handle(self, conn, run_command):
+        start = time.perf_counter()
+        text = ""
+        with conn, conn.makefile("rwb") as f:
+            try:
+                line = f.readline(MAX_REQUEST)
+                text = json.loads(line).get("text", "")
+                output = run_command(text)
+            except Exception as e:
+                output = f"❌ 命令执行失败: {e}"
+            try:
+                f.write(json.dumps({"output": output}, ensure_ascii=False).encode() + b"\n")
+                f.flush()
+            except OSError:
+                pass  # 客户端已断开
+        self.handled += 1
+        print(f"[{time.strftime('%H:%M:%S')}] {text[:40]!r} {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def stop(self, *_):
+        self.stopping.set()
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+def main():
+    from feishu_task import pop_option
+    args = sys.argv[1:]
+    path = pop_option(args, "--socket", SOCKET_PATH)
+    workers = pop_option(args, "--workers", DEFAULT_WORKERS, int)
+    remind_chat = pop_option(args, "--remind-chat", None)
+    remind_assignees = "--remind-assignees" in args
+
+    if args and args[0] == "status":
+        output = send_command("__stats__", path, timeout=5)
+        if output is None:
+            print(f"⏹️ 常驻进程未运行（{path}）")
+            sys.exit(1)
+        print(f"✅ 常驻进程运行中（{path}）")
+        print(output)
+        return
+
+    daemon = TaskDaemon(path, workers)
+    try:
+        daemon.bind()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    feishu_task = warm_up()
+
+    # 任务提醒（命令行参数优先，其次为配置中的 reminderChat / remindAssignees）
+    config = feishu_task.load_config()
+    remind_chat = remind_chat or config.get("reminderChat")
+    remind_assignees = remind_assignees or bool(config.get("remindAssignees"))
+    scheduler = None
+    if remind_chat or remind_assignees:
+        from task_reminders import ReminderScheduler
+        scheduler = ReminderScheduler(remind_chat, remind_assignees, feishu=feishu_task)
+        scheduler.start()
+        print(scheduler.format_stats())
+
+    def run(text):
+        if text == "__ping__":
+            return "pong"
+        if text == "__stats__":
+            stats = f"📨 已处理 {daemon.handled} 条命令\n" + feishu_task.get_client().format_stats()
+            if scheduler:
+                stats += "\n" + scheduler.format_stats()
+            return stats
+        return feishu_task.run_command(text)
+
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    print(f"🚀 feishu-task 常驻进程: {path}（{workers} 个工作线程）")
+    try:
+        daemon.serve(run)
+    finally:
+        if scheduler:
+            scheduler.stop()
+        daemon.close()
+        print(f"👋 已退出，共处理 {daemon.handled} 条命令")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+任务提醒调度
+在常驻进程中按时间维护一个最小堆，保存所有未完成任务的提醒时间、截止前 1 小时和截止时间，
+到点时发送提醒（到达提醒时间 / 即将到期 / 已逾期），同一时刻的提醒按接收方合并为一条消息。
+调度线程只在最近的时间点到达或有更早的时间加入时唤醒，不轮询；
+任务数据来自本地任务缓存，并随本进程的创建、完成、删除和同步增量更新，
+只在发送提醒前同步一次任务（避免提醒已在飞书中完成的任务），空闲时不调用飞书接口。
+"""
+
+import heapq, itertools, sys, threading, time
+from datetime import datetime
+
+from task_cache import due_ms, is_completed
+
+# “即将到期”提醒提前的时长（秒）
+DUE_SOON = 3600
+# 最早的时间点到达后再等待的时长（秒），期间到点的提醒合并为一条消息（提醒不会提前发送）
+COALESCE = 2
+# 每条消息最多列出的任务数
+REMIND_MAX_LINES = 50
+# 过期的堆条目超过有效条目数时重建堆
+COMPACT_RATIO = 1.0
+
+REMIND, DUE_SOON_KIND, OVERDUE = "remind", "due_soon", "overdue"
+LABELS = {REMIND: "🔔 提醒", DUE_SOON_KIND: "⏳ 即将到期", OVERDUE: "❗ 已逾期"}
+# 同一任务同时有多个提醒时只发送最紧急的一个
+PRIORITY = {REMIND: 0, DUE_SOON_KIND: 1, OVERDUE: 2}
+
+def task_events(task, now, due_soon=DUE_SOON):
+    """任务在 now 之后的提醒时间点 [(时间戳, 类型)]"""
+    if is_completed(task):
+        return []
+    due = due_ms(task) / 1000
+    if not due:
+        return []
+    events = [(due - due_soon, DUE_SOON_KIND), (due, OVERDUE)]
+    for reminder in task.get("reminders") or []:
+        try:
+            minutes = int(reminder.get("relative_fire_minute") or 0)
+        except (TypeError, ValueError):
+            continue
+        if minutes > 0:
+            events.append((due - minutes * 60, REMIND))
+    return [(t, kind) for t, kind in events if t > now]
+
+class ReminderScheduler:
+    """
+    提醒调度器
+
+    用法:
+        scheduler = ReminderScheduler(chat_id, assignees=True, feishu=feishu_task)
+        scheduler.start()      # 从任务缓存加载，注册任务变化通知，启动调度线程
+        scheduler.stop()
+    """
+    def __init__(self, chat_id=None, assignees=False, due_soon=DUE_SOON, max_lines=REMIND_MAX_LINES,
+                 feishu=None):
+        self.chat_id = chat_id
+        self.assignees = assignees
+        self.due_soon = due_soon
+        self.max_lines = max_lines
+        self.feishu = feishu
+        self.cond = threading.Condition()
+        self.heap = []           # [(时间戳, 版本, guid, 类型)]
+        self.tasks = {}          # guid -> [版本, 任务, 堆中剩余的条目数]（最后一个提醒发送后保留到任务完成）
+        self.versions = itertools.count()
+        self.stale = 0           # 堆中已失效的条目数
+        self.wakeups = 0
+        self.sent = 0
+        self.failed = 0
+        self.stopping = False
+        self.thread = None
+
+    # ============ 调度表 ============
+
+    def _drop(self, guid):
+        entry = self.tasks.pop(guid, None)
+        if entry:
+            self.stale += entry[2]
+
+    def apply(self, tasks=(), deleted=()):
+        """更新调度表（任务变化通知的回调），有更早的时间点时唤醒调度线程"""
+        now = time.time()
+        with self.cond:
+            earliest = self.heap[0][0] if self.heap else None
+            for guid in deleted:
+                self._drop(guid)
+            for task in tasks:
+                guid = task.get("guid")
+                if not guid:
+                    continue
+                self._drop(guid)
+                events = task_events(task, now, self.due_soon)
+                if not events:
+                    continue
+                version = next(self.versions)
+                self.tasks[guid] = [version, task, len(events)]
+                for when, kind in events:
+                    heapq.heappush(self.heap, (when, version, guid, kind))
+            if self.stale > max(len(self.heap) - self.stale, 64) * COMPACT_RATIO:
+                self._compact()
+            if self.heap and (earliest is None or self.heap[0][0] < earliest):
+                self.cond.notify()
+
+    def _compact(self):
+        """去掉失效的条目后重建堆"""
+        self.heap = [e for e in self.heap if self._valid(e)]
+        heapq.heapify(self.heap)
+        self.stale = 0
+
+    def _valid(self, entry):
+        current = self.tasks.get(entry[2])
+        return current is not None and current[0] == entry[1]
+
+    def _pop_due(self, until):
+        """取出 until 及之前的所有有效提醒 {guid: (类型, 任务)}，同一任务只保留最紧急的一个"""
+        due = {}
+        while self.heap and self.heap[0][0] <= until:
+            entry = heapq.heappop(self.heap)
+            if not self._valid(entry):
+                self.stale -= 1
+                continue
+            _, version, guid, kind = entry
+            current = self.tasks[guid]
+            current[2] -= 1
+            task = current[1]
+            if guid not in due or PRIORITY[kind] > PRIORITY[due[guid][0]]:
+                due[guid] = (kind, task)
+        return due
+
+    # ============ 调度线程 ============
+
+    def start(self):
+        """从任务缓存加载未完成的任务，注册任务变化通知，启动调度线程"""
+        cache = self.feishu.get_task_cache()
+        if cache is not None:
+            self.apply(cache.open_tasks())
+        self.feishu.add_task_listener(self.apply)
+        self.thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=10)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.stopping:
+                    now = time.time()
+                    if self.heap and self.heap[0][0] + COALESCE <= now:
+                        break
+                    # 没有待发送的提醒时一直等待，直到 apply() 加入新的时间点
+                    self.cond.wait(self.heap[0][0] + COALESCE - now if self.heap else None)
+                if self.stopping:
+                    return
+                self.wakeups += 1
+                due = self._pop_due(time.time())
+            if due:
+                try:
+                    self._dispatch(due)
+                except Exception as e:
+                    self.failed += 1
+                    print(f"⚠️ 发送任务提醒失败: {e}", file=sys.stderr)
+
+    # ============ 发送 ============
+
+    def _refresh(self, token, due):
+        """
+        发送前同步任务（同步间隔内不重复调用接口），去掉期间已完成、删除或截止时间已修改的任务
+        """
+        try:
+            self.feishu.sync_tasks(token)
+        except Exception as e:
+            print(f"⚠️ 同步任务失败，按缓存发送提醒: {e}", file=sys.stderr)
+            return due
+        with self.cond:
+            fresh = {}
+            for guid, (kind, task) in due.items():
+                current = self.tasks.get(guid)
+                if current is None:
+                    continue  # 已完成或已删除
+                latest = current[1]
+                if is_completed(latest) or due_ms(latest) != due_ms(task):
+                    continue
+                fresh[guid] = (kind, latest)
+            return fresh
+
+    def targets(self, task):
+        """提醒的接收方 [(receive_id_type, receive_id)]：提醒群聊，以及（assignees=True 时）各负责人"""
+        targets = []
+        if self.chat_id:
+            targets.append(("chat_id", self.chat_id))
+        if self.assignees:
+            for member in task.get("members") or []:
+                if member.get("role") == "assignee" and member.get("id"):
+                    targets.append(("open_id", member["id"]))
+        return targets
+
+    def format(self, items):
+        """一条提醒消息：逾期的在前，同类按截止时间排序"""
+        items = sorted(items, key=lambda i: (-PRIORITY[i[0]], due_ms(i[1])))
+        lines = [f"⏰ 任务提醒（{len(items)} 个）"]
+        for kind, task in items[:self.max_lines]:
+            due = datetime.fromtimestamp(due_ms(task) / 1000).strftime("%m-%d %H:%M")
+            lines.append(f"{LABELS[kind]}: {task.get('title') or '未命名'}（截止 {due}）`{task.get('guid')}`")
+        if len(items) > self.max_lines:
+            lines.append(f"……还有 {len(items) - self.max_lines} 个任务")
+        return "\n".join(lines)
+
+    def _dispatch(self, due):
+        config = self.feishu.load_config()
+        app_id, app_secret = config.get("appId"), config.get("appSecret")
+        if not app_id or not app_secret:
+            raise LookupError("未配置飞书应用")
+        token = self.feishu.get_token(app_id, app_secret)
+        due = self._refresh(token, due)
+
+        grouped = {}
+        for kind, task in due.values():
+            for target in self.targets(task):
+                grouped.setdefault(target, []).append((kind, task))
+        for (id_type, receive_id), items in grouped.items():
+            text = self.format(items)
+            result = self.feishu.send_message(token, receive_id, text, id_type)
+            if result.get("code") in self.feishu.INVALID_TOKEN_CODES:
+                self.feishu.invalidate_token(app_id, token)
+                token = self.feishu.get_token(app_id, app_secret)
+                result = self.feishu.send_message(token, receive_id, text, id_type)
+            if result.get("success"):
+                self.sent += 1
+            else:
+                self.failed += 1
+                print(f"⚠️ 发送任务提醒失败（{receive_id}）: {result.get('error')}", file=sys.stderr)
+
+    def format_stats(self):
+        with self.cond:
+            pending = len(self.heap) - self.stale
+            upcoming = self.heap[0][0] if self.heap else None
+            tasks = len(self.tasks)
+        upcoming = datetime.fromtimestamp(upcoming).strftime("%m-%d %H:%M:%S") if upcoming else "无"
+        return (f"⏰ 提醒: {tasks} 个任务，{pending} 个待发送时间点（最近 {upcoming}），"
+                f"唤醒 {self.wakeups} 次，已发送 {self.sent} 条，失败 {self.failed} 条")
@@ -0,0 +1,113 @@
+import pytest
+
+import bulk_tasks
+from bulk_tasks import RateLimiter, parse_bulk
+
+def test_empty_input():
+    assert parse_bulk("") == []
+    assert parse_bulk("\n  \n") == []
+
+def test_chat_lines():
+    items = parse_bulk("分配 @张三 整理周报\n\n完成 g00000001\n列表\n")
+    assert [raw for raw, _, _ in items] == ["分配 @张三 整理周报", "完成 g00000001", "列表"]
+    assert items[0][1]["action"] == "assign"
+    assert items[0][1]["member"] == "张三"
+    assert items[1][1] == {"action": "complete", "task_id": "g00000001"}
+    assert items[2][1] is None
+    assert items[2][2] == "该命令不支持批量执行"
+
+def test_csv_rows():
+    items = parse_bulk("action,title,member,task_id\n"
+                       "create,写周报,,\n"
+                       "assign,整理周报,@张三,\n"
+                       "删除,,,g00000002\n"
+                       "delete,,,\n"
+                       "archive,旧任务,,\n")
+    assert [raw for raw, _, _ in items] == ["create,写周报,,", "assign,整理周报,@张三,",
+                                            "删除,,,g00000002", "delete,,,", "archive,旧任务,,"]
+    assert items[0][1] == {"action": "create_full", "title": "写周报", "due_time": None,
+                           "reminder": 0, "description": ""}
+    assert items[1][1]["member"] == "张三"
+    assert items[2][1] == {"action": "delete", "task_id": "g00000002"}
+    assert items[3][2] == "缺少任务ID"
+    assert items[4][2] == "未知的操作: archive"
+
+def test_csv_chinese_headers():
+    items = parse_bulk("操作,标题,提醒\n创建,写周报,30\n创建,写月报,半小时\n")
+    assert items[0][1]["reminder"] == 30
+    assert items[1][2] == "提醒分钟数不是数字: 半小时"
+
+def test_csv_quoted_field_spans_lines():
+    text = ('title,desc\n'
+            '写周报,"第一段\n'
+            '\n'
+            '第二段"\n'
+            '\n'
+            '写月报,简短\n')
+    items = parse_bulk(text)
+    assert len(items) == 2
+    assert items[0][0] == '写周报,"第一段\n\n第二段"'
+    assert items[0][1]["description"] == "第一段\n\n第二段"
+    assert items[1][0] == "写月报,简短"
+    assert items[1][1]["title"] == "写月报"
+
+def test_jsonl_rows():
+    items = parse_bulk('{"title": "写周报", "desc": "本周进展"}\n'
+                       '\n'
+                       '{"action": "完成", "task_id": "g00000001"}\n'
+                       '[1, 2]\n'
+                       '{"title": \n')
+    assert len(items) == 4
+    assert items[0][1]["description"] == "本周进展"
+    assert items[1][1] == {"action": "complete", "task_id": "g00000001"}
+    assert items[2][2] == "不是 JSON 对象"
+    assert items[3][1] is None and items[3][2]
+
+def test_rate_limiter_allows_burst_then_waits(monkeypatch):
+    now = [100.0]
+    sleeps = []
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+    monkeypatch.setattr(bulk_tasks.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(bulk_tasks.time, 'sleep', sleep)
+    limiter = RateLimiter(rate=10, burst=3)
+    for _ in range(3):
+        limiter.acquire()
+    assert sleeps == []
+    limiter.acquire()
+    assert sleeps == [pytest.approx(0.1)]
+
+@pytest.fixture
+def feishu(monkeypatch):
+    """替换飞书接口调用，记录执行的命令"""
+    executed = []
+    def execute_command(token, command):
+        executed.append(command)
+        return {"success": True, "task_guid": f"g{len(executed):08d}"}
+    monkeypatch.setattr(bulk_tasks.feishu_task, "load_config",
+                        lambda: {"appId": "cli_test", "appSecret": "secret"})
+    monkeypatch.setattr(bulk_tasks.feishu_task, "get_token", lambda app_id, app_secret: "t-test")
+    monkeypatch.setattr(bulk_tasks.feishu_task, "execute_command", execute_command)
+    return executed
+
+def test_summary_does_not_echo_unparseable_lines(feishu):
+    text = ('批量\n'
+            '{"title": "写周报"}\n'
+            '{"appSecret": "s3cr3t-value", \n')
+    summary = bulk_tasks.run_bulk(text)
+    assert "成功 1，失败 1" in summary
+    assert "s3cr3t" not in summary
+    assert "2. ❌ 无法解析" in summary
+    assert [c["title"] for c in feishu] == ["写周报"]
+
+def test_estimate_seconds_covers_item_count_and_rate():
+    body = "\n".join(f"创建 任务{i}" for i in range(1000))
+    assert bulk_tasks.estimate_seconds("批量\n" + body) == pytest.approx(
+        1000 * bulk_tasks.REQUESTS_PER_ITEM / bulk_tasks.BULK_RATE)
+    assert bulk_tasks.estimate_seconds("批量 --rate 50\n" + body) == pytest.approx(
+        1000 * bulk_tasks.REQUESTS_PER_ITEM / 50)
+    # 超过条目上限的批量操作会被直接拒绝，不需要更长的等待
+    assert bulk_tasks.estimate_seconds("批量\n" + body + "\n" + body) == \
+        bulk_tasks.estimate_seconds("批量\n" + body)
+    assert bulk_tasks.estimate_seconds("批量 --rate\n创建 a") == 0
@@ -0,0 +1,134 @@
+import json, socket, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import feishu_client
+from feishu_client import FeishuClient
+
+class Handler(BaseHTTPRequestHandler):
+    """依次返回 server.script 中的 (状态码, 响应 JSON, 响应头)，用完后返回成功"""
+    protocol_version = "HTTP/1.1"
+
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.requests.append((self.command, self.path, self.headers.get('Authorization'), body))
+        self.server.connections.add(self.client_address)
+        status, result, headers = self.server.script.pop(0) if self.server.script else (200, {'code': 0}, {})
+        data = json.dumps(result).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = handle_request
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    for name in ('http_proxy', 'HTTP_PROXY'):
+        monkeypatch.delenv(name, raising=False)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    httpd.script = []
+    httpd.requests = []
+    httpd.connections = set()
+    threading.Thread(target=httpd.serve_forever, args=(0.01,), daemon=True).start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录退避等待时长而不真正等待；随机抖动固定取上限"""
+    delays = []
+    monkeypatch.setattr(feishu_client.time, 'sleep', delays.append)
+    monkeypatch.setattr(feishu_client.random, 'uniform', lambda a, b: b)
+    return delays
+
+def test_connection_is_reused(server):
+    httpd, base = server
+    client = FeishuClient(base + '/prefix')
+    for _ in range(3):
+        result = client.request('GET', '/open-apis/task/v2/tasks', token='t-1',
+                                params={'page_size': 50, 'page_token': None})
+        assert result == {'code': 0}
+    assert client.connects == 1 and client.reuses == 2
+    assert len(httpd.connections) == 1
+    method, path, auth, _ = httpd.requests[0]
+    assert (method, path, auth) == ('GET', '/prefix/open-apis/task/v2/tasks?page_size=50', 'Bearer t-1')
+    client.close()
+
+def test_retries_stop_at_configured_limit(server, sleeps):
+    httpd, base = server
+    httpd.script = [(503, {'code': 1}, {})] * 10
+    client = FeishuClient(base, retries=2)
+    result = client.request('GET', '/open-apis/task/v2/tasks', endpoint='task.list')
+    assert result['status'] == 503
+    assert len(httpd.requests) == 3
+    assert sleeps == [0.5, 1.0]
+    stats = client.stats()['task.list']
+    assert (stats['calls'], stats['failures'], stats['retries']) == (3, 3, 2)
+    client.close()
+
+def test_backoff_is_capped(server, sleeps):
+    httpd, base = server
+    httpd.script = [(502, {}, {})] * 6
+    client = FeishuClient(base, retries=6)
+    assert client.request('GET', '/open-apis/x') == {'code': 0}
+    assert sleeps == [0.5, 1.0, 2.0, 4.0, 8.0, feishu_client.BACKOFF_MAX]
+    client.close()
+
+def test_rate_limit_follows_retry_after(server, sleeps):
+    httpd, base = server
+    httpd.script = [(429, {'code': 99991400}, {'Retry-After': '2'}),
+                    (200, {'code': 99991400}, {'x-ogw-ratelimit-reset': '0.25'})]
+    client = FeishuClient(base)
+    assert client.request('POST', '/open-apis/task/v2/tasks', body={'summary': "写周报"}) == {'code': 0}
+    assert sleeps == [2.0, 0.25]
+    assert [json.loads(body) for _, _, _, body in httpd.requests] == [{'summary': "写周报"}] * 3
+    client.close()
+
+def test_post_is_not_resent_after_server_error(server, sleeps):
+    httpd, base = server
+    httpd.script = [(500, {'code': 1}, {})]
+    client = FeishuClient(base)
+    assert client.request('POST', '/open-apis/task/v2/tasks', body={})['status'] == 500
+    assert len(httpd.requests) == 1
+    assert sleeps == []
+    client.close()
+
+def test_network_errors_are_raised_after_retries(sleeps):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]  # 关闭后该端口没有服务监听
+    client = FeishuClient(f"http://127.0.0.1:{port}", retries=2)
+    with pytest.raises(OSError):
+        client.request('GET', '/open-apis/x', endpoint='x')
+    assert client.connects == 3
+    assert len(sleeps) == 2
+    assert client.stats()['x']['failures'] == 3
+    with pytest.raises(OSError):
+        client.request('POST', '/open-apis/x', endpoint='x')
+    assert client.connects == 4
+
+def test_limiter_is_acquired_for_every_attempt(server, sleeps):
+    httpd, base = server
+    httpd.script = [(503, {}, {})]
+    class Limiter:
+        acquired = 0
+        def acquire(self):
+            self.acquired += 1
+    limiter = Limiter()
+    client = FeishuClient(base)
+    with client.limited(limiter):
+        client.request('GET', '/open-apis/x')
+    client.request('GET', '/open-apis/x')  # with 块外不限速
+    assert limiter.acquired == 2
+    client.close()
@@ -0,0 +1,35 @@
+import os, subprocess, sys
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'feishu_task.py')
+
+def run(tmp_path, *argv, stdin=''):
+    env = dict(os.environ, HOME=str(tmp_path), FEISHU_TASK_NO_DAEMON='1')
+    return subprocess.run([sys.executable, SCRIPT, *argv], input=stdin, env=env,
+                          capture_output=True, text=True, timeout=30)
+
+@pytest.mark.parametrize('argv', [[' '], ['\n帮助'], ['\n\n']])
+def test_empty_first_line_does_not_crash(tmp_path, argv):
+    proc = run(tmp_path, *argv)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip()
+    assert 'Traceback' not in proc.stderr
+
+def test_bulk_file_outside_bulk_dir_is_refused(tmp_path):
+    config = tmp_path / '.openclaw' / 'openclaw.json'
+    config.parent.mkdir()
+    config.write_text('{"channels": {"feishu": {"appId": "cli_x", "appSecret": "s3cr3t-value"}}}')
+    for name in (str(config), '../openclaw.json', '~/.openclaw/openclaw.json'):
+        proc = run(tmp_path, '批量', name)
+        assert proc.returncode == 0, proc.stderr
+        assert '找不到批量文件' in proc.stdout
+        assert 's3cr3t' not in proc.stdout
+
+def test_bulk_file_inside_bulk_dir_is_read(tmp_path):
+    bulk_dir = tmp_path / '.openclaw' / 'feishu_task_bulk'
+    bulk_dir.mkdir(parents=True)
+    (bulk_dir / 'tasks.csv').write_text('title\n写周报\n')
+    proc = run(tmp_path, '批量', 'tasks.csv')
+    # 没有配置飞书应用：文件已读取并交给批量执行
+    assert '未配置飞书应用' in proc.stdout
@@ -0,0 +1,89 @@
+import os, stat
+
+import pytest
+
+from task_cache import TaskCache, is_completed, sort_key
+
+def task(guid, updated=1, due=0, completed=0, title=None):
+    return {"guid": guid, "summary": title or f"任务{guid}", "updated_at": str(updated),
+            "due": {"timestamp": str(due)} if due else None, "completed_at": str(completed)}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = TaskCache(str(tmp_path / "tasks.db"), app_id="cli_test")
+    yield cache
+    cache.close()
+
+def test_cache_file_is_private(cache):
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+
+def test_sync_only_writes_changed_tasks(cache):
+    assert cache.synced_age() is None
+    assert cache.sync([task("a"), task("b"), task("c")]) == (3, 0)
+    changes = []
+    def on_change(updated, removed):
+        changes.append(([t["guid"] for t in updated], removed))
+    result = cache.sync([task("a"), task("b", updated=2), task("c"), task("d")], on_change=on_change)
+    assert result == (2, 0)
+    assert changes == [(["b", "d"], [])]
+    assert cache.get("b")["updated_at"] == "2"
+    assert cache.synced_age() < 5
+
+def test_missing_tasks_are_marked_deleted(cache):
+    cache.sync([task("a"), task("b")])
+    changes = []
+    assert cache.sync([task("a")], on_change=lambda u, r: changes.append((u, r))) == (0, 1)
+    assert changes == [([], ["b"])]
+    assert cache.get("b") is None
+    # 重新出现的任务恢复
+    assert cache.sync([task("a"), task("b")]) == (1, 0)
+    assert cache.get("b") is not None
+
+def test_unchanged_sync_reports_nothing(cache):
+    cache.sync([task("a")])
+    changes = []
+    assert cache.sync([task("a")], on_change=lambda u, r: changes.append((u, r))) == (0, 0)
+    assert changes == []
+
+def test_interrupted_sync_keeps_written_tasks(cache, monkeypatch):
+    monkeypatch.setattr(TaskCache, "BATCH", 2)
+    cache.sync([task("old")])
+    def pages():
+        yield task("a")
+        yield task("b")
+        raise ConnectionResetError("连接被重置")
+    with pytest.raises(ConnectionResetError):
+        cache.sync(pages())
+    # 已写入的批次保留，没拉取完时不标记删除
+    assert cache.get("a") and cache.get("b") and cache.get("old")
+
+def test_changes_are_reported_in_batches(cache, monkeypatch):
+    monkeypatch.setattr(TaskCache, "BATCH", 2)
+    batches = []
+    cache.sync([task(str(i)) for i in range(5)], on_change=lambda u, r: batches.append(len(u)))
+    assert batches == [2, 2, 1]
+
+def test_list_order_matches_sort_key(cache):
+    tasks = [task("done", due=1000, completed=5), task("no-due", updated=9), task("late", due=3000),
+             task("soon", due=2000), task("no-due-old", updated=1)]
+    cache.sync(tasks)
+    listed, open_count, done_count = cache.list()
+    assert [t["guid"] for t in listed] == ["soon", "late", "no-due", "no-due-old", "done"]
+    assert [t["guid"] for t in sorted(tasks, key=sort_key)] == [t["guid"] for t in listed]
+    assert (open_count, done_count) == (4, 1)
+    assert [t["guid"] for t in cache.list(limit=2)[0]] == ["soon", "late"]
+    assert sorted(t["guid"] for t in cache.open_tasks()) == ["late", "soon"]
+    assert is_completed(cache.get("done"))
+
+def test_switching_app_clears_cache(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    cache = TaskCache(path, app_id="cli_a")
+    cache.sync([task("a")])
+    cache.close()
+    cache = TaskCache(path, app_id="cli_a")
+    assert cache.get("a") is not None
+    cache.close()
+    cache = TaskCache(path, app_id="cli_b")
+    assert cache.get("a") is None
+    assert cache.synced_age() is None
+    cache.close()
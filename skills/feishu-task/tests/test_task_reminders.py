@@ -0,0 +1,134 @@
+import time
+
+import pytest
+
+import task_reminders
+from task_reminders import DUE_SOON_KIND, OVERDUE, REMIND, ReminderScheduler, task_events
+
+NOW = 1_800_000_000
+
+def task(guid, due, reminders=(), completed=0, assignees=()):
+    return {"guid": guid, "title": f"任务{guid}", "due": {"timestamp": str(int(due * 1000))},
+            "completed_at": str(completed),
+            "reminders": [{"relative_fire_minute": m} for m in reminders],
+            "members": [{"role": "assignee", "id": a} for a in assignees]}
+
+class FakeFeishu:
+    """替代 feishu_task：记录发送的消息，sync_tasks 时把 completed 中的任务标记为已完成"""
+    INVALID_TOKEN_CODES = {99991663}
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self.completed = []
+        self.messages = []
+        self.cache = None
+        self.listeners = []
+
+    def load_config(self):
+        return {"appId": "cli_test", "appSecret": "secret"}
+
+    def get_token(self, app_id, app_secret):
+        return "t-1"
+
+    def sync_tasks(self, token):
+        self.scheduler.apply([dict(t, completed_at="1") for t in self.completed])
+
+    def send_message(self, token, receive_id, text, id_type):
+        self.messages.append((id_type, receive_id, text))
+        return {"success": True}
+
+    def get_task_cache(self):
+        return self.cache
+
+    def add_task_listener(self, listener):
+        self.listeners.append(listener)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [float(NOW)]
+    monkeypatch.setattr(task_reminders.time, "time", lambda: now[0])
+    return now
+
+def test_task_events():
+    events = task_events(task("a", NOW + 7200, reminders=[30, 0, "x"]), NOW)
+    assert sorted(events) == [(NOW + 3600, DUE_SOON_KIND), (NOW + 5400, REMIND), (NOW + 7200, OVERDUE)]
+    # 已过去的时间点不再提醒
+    assert task_events(task("a", NOW + 60), NOW) == [(NOW + 60, OVERDUE)]
+    assert task_events(task("a", NOW + 7200, completed=1), NOW) == []
+    assert task_events({"guid": "a", "completed_at": "0"}, NOW) == []
+
+def test_reminders_pop_in_time_order(clock):
+    scheduler = ReminderScheduler("oc_main")
+    scheduler.apply([task("late", NOW + 7200), task("soon", NOW + 600), task("mid", NOW + 5000)])
+    assert scheduler.heap[0][0] == NOW + 600
+    assert scheduler._pop_due(NOW + 600) == {"soon": (OVERDUE, scheduler.tasks["soon"][1])}
+    assert list(scheduler._pop_due(NOW + 3600)) == ["mid", "late"]
+    assert scheduler._pop_due(NOW + 3600) == {}
+    assert [kind for kind, _ in scheduler._pop_due(NOW + 7200).values()] == [OVERDUE, OVERDUE]
+
+def test_most_urgent_reminder_wins(clock):
+    scheduler = ReminderScheduler("oc_main")
+    scheduler.apply([task("a", NOW + 7200, reminders=[90])])
+    kind, _ = scheduler._pop_due(NOW + 7200)["a"]
+    assert kind == OVERDUE
+
+def test_updated_and_deleted_tasks_invalidate_old_entries(clock):
+    scheduler = ReminderScheduler("oc_main")
+    scheduler.apply([task("a", NOW + 600), task("b", NOW + 600)])
+    scheduler.apply([task("a", NOW + 9000)], deleted=["b"])
+    assert scheduler.stale == 2
+    assert scheduler._pop_due(NOW + 600) == {}
+    assert scheduler.stale == 0
+    assert list(scheduler._pop_due(NOW + 9000)) == ["a"]
+    scheduler.apply([task("a", NOW + 9000, completed=1)])
+    assert scheduler.tasks == {}
+
+def test_stale_entries_are_compacted(clock):
+    scheduler = ReminderScheduler("oc_main")
+    for i in range(200):
+        scheduler.apply([task("a", NOW + 7200 + i)])
+    assert len(scheduler.heap) <= 2 * (64 + 2)
+    assert len(scheduler.heap) - scheduler.stale == 2
+
+def test_dispatch_groups_by_receiver_and_skips_completed(clock):
+    scheduler = ReminderScheduler("oc_main", assignees=True)
+    feishu = scheduler.feishu = FakeFeishu(scheduler)
+    a = task("a", NOW + 600, assignees=["ou_zhang"])
+    b = task("b", NOW + 300, assignees=["ou_zhang", "ou_li"])
+    c = task("c", NOW + 300)
+    scheduler.apply([a, b, c])
+    feishu.completed = [c]
+    clock[0] = NOW + 600
+    scheduler._dispatch(scheduler._pop_due(clock[0]))
+    sent = {receive_id: text for _, receive_id, text in feishu.messages}
+    assert sorted(sent) == ["oc_main", "ou_li", "ou_zhang"]
+    assert "任务c" not in sent["oc_main"]
+    lines = sent["oc_main"].splitlines()
+    assert lines[0] == "⏰ 任务提醒（2 个）"
+    assert [line.split("`")[1] for line in lines[1:]] == ["b", "a"]
+    assert ("open_id", "ou_li") in [(t, r) for t, r, _ in feishu.messages]
+    assert scheduler.sent == 3
+
+def test_message_is_truncated():
+    scheduler = ReminderScheduler("oc_main", max_lines=2)
+    items = [(OVERDUE, task(str(i), NOW + i)) for i in range(5)]
+    lines = scheduler.format(items).splitlines()
+    assert len(lines) == 4
+    assert lines[-1] == "……还有 3 个任务"
+
+def test_thread_wakes_for_earlier_reminder(monkeypatch):
+    monkeypatch.setattr(task_reminders, "COALESCE", 0)
+    scheduler = ReminderScheduler("oc_main", due_soon=0)
+    feishu = scheduler.feishu = FakeFeishu(scheduler)
+    scheduler.start()
+    assert feishu.listeners == [scheduler.apply]
+    scheduler.apply([task("later", time.time() + 3600)])
+    scheduler.apply([task("now", time.time() + 0.05)])
+    deadline = time.time() + 5
+    while not feishu.messages and time.time() < deadline:
+        time.sleep(0.01)
+    scheduler.stop()
+    assert not scheduler.thread.is_alive()
+    assert len(feishu.messages) == 1
+    assert "`now`" in feishu.messages[0][2]
+    assert scheduler.wakeups == 1
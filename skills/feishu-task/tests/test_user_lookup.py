@@ -0,0 +1,111 @@
+import http.client, os, stat
+
+import pytest
+
+import feishu_task
+import user_directory
+from user_directory import AmbiguousUser, UserDirectory, normalize
+
+@pytest.mark.parametrize('error', [
+    http.client.RemoteDisconnected("Remote end closed connection without response"),
+    http.client.IncompleteRead(b"", 10),
+    ConnectionResetError("连接被重置"),
+])
+def test_network_errors_while_loading_directory_return_none(monkeypatch, error):
+    def get_user_directory(token, refresh=False):
+        raise error
+    monkeypatch.setattr(feishu_task, "get_user_directory", get_user_directory)
+    assert feishu_task.get_user_id_by_name("t-test", "张三") is None
+
+USERS = [
+    {"open_id": "ou_zhang3", "name": "张三", "en_name": "San Zhang", "email": "san.zhang@example.com"},
+    {"open_id": "ou_zhang3b", "name": "张三丰", "en_name": "Sanfeng"},
+    {"open_id": "ou_li4", "name": "李四", "nickname": "Lee"},
+    {"open_id": "ou_wang", "name": "王五", "en_name": "Wang Wu"},
+    {"open_id": "ou_wang2", "name": "王五", "en_name": "Wu Wang"},
+    {"open_id": "ou_li4", "name": "重复的李四"},
+]
+
+@pytest.fixture
+def directory():
+    return UserDirectory(USERS, app_id="cli_test")
+
+def ids(users):
+    return [u["open_id"] for u in users]
+
+def test_normalize():
+    assert normalize(" Ｓａｎ·Zhang ") == normalize("san zhang") == "sanzhang"
+    assert normalize("(李四)") == "李四"
+
+@pytest.mark.parametrize("query, expected", [
+    ("ou_li4", ["ou_li4"]),
+    ("@张三", ["ou_zhang3"]),              # 原名精确匹配优先于前缀
+    ("SAN ZHANG", ["ou_zhang3"]),         # 英文名，忽略大小写和空格
+    ("san.zhang", ["ou_zhang3"]),         # 邮箱前缀
+    ("lee", ["ou_li4"]),                  # 昵称
+    ("张三丰", ["ou_zhang3b"]),
+    ("李", ["ou_li4"]),                   # 前缀
+    ("赵六", []),
+    ("", []),
+])
+def test_lookup(directory, query, expected):
+    assert ids(directory.lookup(query)) == expected
+
+def test_duplicate_open_ids_are_indexed_once(directory):
+    assert len(directory) == 5
+    assert directory.lookup("重复的李四") == []
+
+def test_resolve_ambiguous_name_lists_candidates(directory):
+    with pytest.raises(AmbiguousUser) as e:
+        directory.resolve("王五")
+    assert sorted(ids(e.value.candidates)) == ["ou_wang", "ou_wang2"]
+    with pytest.raises(AmbiguousUser):
+        directory.resolve("张")            # 前缀匹配到张三和张三丰
+    assert directory.resolve("Wu Wang") == "ou_wang2"
+    assert directory.resolve("赵六") is None
+
+def test_save_and_load(tmp_path, directory):
+    path = str(tmp_path / "users.json")
+    directory.save(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    loaded = UserDirectory.load(path, "cli_test")
+    assert len(loaded) == len(directory)
+    assert loaded.fetched == directory.fetched
+    assert loaded.resolve("lee") == "ou_li4"
+    assert UserDirectory.load(path, "cli_other") is None
+    assert UserDirectory.load(str(tmp_path / "missing.json")) is None
+
+@pytest.fixture
+def contacts(tmp_path, monkeypatch):
+    """飞书成员接口的替身：返回 members 中的成员，并记录拉取次数"""
+    state = {"members": list(USERS[:3]), "fetches": 0}
+    def list_users(token):
+        state["fetches"] += 1
+        return list(state["members"])
+    monkeypatch.setattr(feishu_task, "load_config", lambda: {"appId": "cli_test", "appSecret": "secret"})
+    monkeypatch.setattr(feishu_task, "list_users", list_users)
+    monkeypatch.setattr(feishu_task, "_directory", None)
+    monkeypatch.setattr(user_directory, "DIRECTORY_PATH", str(tmp_path / "users.json"))
+    return state
+
+def test_lookup_uses_cached_directory(contacts):
+    assert feishu_task.get_user_id_by_name("t", "张三") == "ou_zhang3"
+    assert feishu_task.get_user_id_by_name("t", "李四") == "ou_li4"
+    assert contacts["fetches"] == 1
+
+def test_miss_refreshes_stale_directory(contacts, monkeypatch):
+    assert feishu_task.get_user_id_by_name("t", "王五") is None
+    assert contacts["fetches"] == 1        # 目录刚拉取，不立即刷新
+    contacts["members"].append({"open_id": "ou_new", "name": "王五"})
+    feishu_task._directory.fetched -= user_directory.MISS_REFRESH_INTERVAL
+    assert feishu_task.get_user_id_by_name("t", "王五") == "ou_new"
+    assert contacts["fetches"] == 2
+
+def test_assign_with_ambiguous_name_asks_for_clarification(contacts, monkeypatch):
+    created = []
+    monkeypatch.setattr(feishu_task, "create_task", lambda *args, **kwargs: created.append(args))
+    result = feishu_task.execute_command("t", {"action": "assign", "member": "张", "title": "整理周报"})
+    assert not result["success"]
+    assert "匹配到多个成员" in result["message"]
+    assert "`ou_zhang3`" in result["message"] and "`ou_zhang3b`" in result["message"]
+    assert created == []
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+飞书成员目录
+完整的成员列表（分页拉取）缓存在 ~/.openclaw/feishu_users.json，超过有效期后重新拉取；
+内存中按 open_id、原名、规范化名称和前缀（含拼音，需安装 pypinyin）建立索引，
+分配任务时按名字查找成员只访问本地索引。
+"""
+
+import json, os, re, time, unicodedata
+from bisect import bisect_left
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+# 成员目录缓存文件
+DIRECTORY_PATH = os.path.expanduser("~/.openclaw/feishu_users.json")
+# 目录有效期（秒），过期后下次查找时重新拉取
+DIRECTORY_TTL = 3600
+# 查找不到时允许提前刷新的最短间隔（秒），用于及时发现新成员
+MISS_REFRESH_INTERVAL = 300
+
+_SEPARATORS = re.compile(r"[\s·・.\-_()（）]+")
+
+def normalize(name):
+    """规范化名称：全角转半角、忽略大小写和空白/分隔符"""
+    return _SEPARATORS.sub("", unicodedata.normalize("NFKC", name or "").casefold())
+
+def name_keys(user):
+    """成员的所有可查找名称（规范化后）"""
+    keys = set()
+    for field in ("name", "en_name", "nickname"):
+        key = normalize(user.get(field))
+        if key:
+            keys.add(key)
+    if lazy_pinyin and user.get("name"):
+        syllables = lazy_pinyin(user["name"])
+        keys.add(normalize("".join(syllables)))
+        keys.add(normalize("".join(s[:1] for s in syllables)))
+    email = user.get("email") or ""
+    if "@" in email:
+        keys.add(normalize(email.split("@")[0]))
+    keys.discard("")
+    return keys
+
+class AmbiguousUser(Exception):
+    """名字匹配到多个成员"""
+    def __init__(self, query, candidates):
+        super().__init__(f"{query} 匹配到 {len(candidates)} 个成员")
+        self.query = query
+        self.candidates = candidates
+
+class UserDirectory:
+    """
+    成员目录索引
+
+    用法:
+        directory = UserDirectory(users)
+        users = directory.lookup("张三")   # 按 open_id / 原名 / 规范化名称 / 前缀依次匹配
+        open_id = directory.resolve("张三")  # 唯一匹配时返回 open_id，多个匹配时抛出 AmbiguousUser
+    """
+    def __init__(self, users, fetched=None, app_id=None):
+        self.fetched = fetched or time.time()
+        self.app_id = app_id
+        self.by_open_id = {}
+        self.exact = {}          # 原名 -> [open_id]
+        self.normalized = {}     # 规范化名称（含英文名、拼音、邮箱前缀）-> [open_id]
+        for user in users:
+            open_id = user.get("open_id")
+            if not open_id or open_id in self.by_open_id:
+                continue
+            self.by_open_id[open_id] = user
+            if user.get("name"):
+                self.exact.setdefault(user["name"], []).append(open_id)
+            for key in name_keys(user):
+                self.normalized.setdefault(key, []).append(open_id)
+        # 前缀查找用的有序键
+        self.keys = sorted(self.normalized)
+
+    def __len__(self):
+        return len(self.by_open_id)
+
+    def age(self):
+        return time.time() - self.fetched
+
+    def _users(self, open_ids):
+        seen = dict.fromkeys(open_ids)
+        return [self.by_open_id[i] for i in seen]
+
+    def lookup(self, query):
+        """返回匹配的成员列表，按精确程度取第一个有结果的层级"""
+        query = (query or "").strip().lstrip("@")
+        if not query:
+            return []
+        if query in self.by_open_id:
+            return [self.by_open_id[query]]
+        if query in self.exact:
+            return self._users(self.exact[query])
+        key = normalize(query)
+        if not key:
+            return []
+        if key in self.normalized:
+            return self._users(self.normalized[key])
+        matches = []
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i].startswith(key):
+            matches.extend(self.normalized[self.keys[i]])
+            i += 1
+        return self._users(matches)
+
+    def resolve(self, query):
+        """
+        Returns:
+            唯一匹配成员的 open_id，没有匹配时返回 None
+
+        Raises:
+            AmbiguousUser: 匹配到多个成员
+        """
+        users = self.lookup(query)
+        if len(users) > 1:
+            raise AmbiguousUser(query, users)
+        return users[0]["open_id"] if users else None
+
+    # ============ 磁盘缓存 ============
+
+    def save(self, path=DIRECTORY_PATH):
+        """原子写入（权限 600），只保存成员列表，索引在加载时重建"""
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fields = ("open_id", "name", "en_name", "nickname", "email")
+        users = [{k: u[k] for k in fields if u.get(k)} for u in self.by_open_id.values()]
+        tmp = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"app_id": self.app_id, "fetched": self.fetched, "users": users}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=DIRECTORY_PATH, app_id=None):
+        """读取缓存，文件不存在、损坏或属于其他应用时返回 None"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if app_id and data.get("app_id") != app_id:
+            return None
+        return cls(data.get("users", []), data.get("fetched"), data.get("app_id"))